@@ -0,0 +1,70 @@
+"""Compare eager-loading strategies for the feed and post detail queries.
+
+Seeds a throwaway SQLite database with benchmarks/seed.py, then times
+crud.post.get_posts and crud.post.get_post (on the deepest reply thread)
+under each settings.loading_strategy.
+
+Usage (from backend/):
+    python -m benchmarks.loader_strategies --posts 2000 --replies 80000 --runs 20
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks import seed as seed_data
+from core.config import settings
+from crud import post as post_crud
+from database import Base
+
+
+def measure(session_factory, engine, fn, runs: int):
+    statements = []
+
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", _count)
+    timings = []
+    try:
+        for _ in range(runs):
+            db = session_factory()
+            try:
+                started = time.perf_counter()
+                fn(db)
+                timings.append(time.perf_counter() - started)
+            finally:
+                db.close()
+    finally:
+        event.remove(engine, "before_cursor_execute", _count)
+    return statistics.median(timings) * 1000, len(statements) / runs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    seed_data.add_arguments(parser)
+    parser.add_argument("--limit", type=int, default=20, help="feed page size")
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        dataset = seed_data.seed_from_args(engine, args)
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+        print(f"{'strategy':<10} {'feed ms':>9} {'feed q':>7} {'detail ms':>10} {'detail q':>9}")
+        for strategy in ("joined", "selectin", "subquery"):
+            settings.loading_strategy = strategy  # type: ignore
+            feed_ms, feed_q = measure(session_factory, engine, lambda db: post_crud.get_posts(db, limit=args.limit), args.runs)
+            detail_ms, detail_q = measure(session_factory, engine, lambda db: post_crud.get_post(db, dataset.deep_thread_id), args.runs)
+            print(f"{strategy:<10} {feed_ms:>9.2f} {feed_q:>7.1f} {detail_ms:>10.2f} {detail_q:>9.1f}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""Deterministic synthetic dataset shared by the benchmarks.
+
+Shaped like real traffic rather than uniform rows:
+  * posts per user and likes per post follow a Zipf-like power law, so a few users
+    and a few posts are hot and most are cold;
+  * replies cluster on the hot threads and tend to answer the latest reply, which
+    builds deep reply chains (capped at max_depth);
+  * counters (likes_count, replies_count) match the rows, as crud would keep them.
+
+The same seed always produces the same rows and ids. Every user's password is
+PASSWORD, hashed once with the configured bcrypt cost, so login does not rehash.
+
+Usage (from backend/), to fill an empty database for manual testing:
+    python -m benchmarks.seed --database-url sqlite:///./bench.db --posts 5000
+"""
+import argparse
+import itertools
+import random
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+
+import bcrypt  # type: ignore
+from sqlalchemy import create_engine, insert, text
+
+PASSWORD = "benchmark123"
+_WORDS = (
+    "fastapi sqlite postgres cache index query feed reply thread like avatar upload "
+    "latency python async worker deploy review merge bug fix release coffee weekend "
+    "music travel photo garden recipe football movie book"
+).split()
+_BATCH = 5000
+
+
+@dataclass
+class Dataset:
+    users: int
+    posts: int
+    replies: int
+    likes: int
+    max_depth: int
+    # Ids the scenarios aim at: the most liked top-level posts, the thread with the
+    # deepest reply chain and the users with the most posts
+    hot_post_ids: List[int] = field(default_factory=list)
+    deep_thread_id: int = 0
+    active_user_ids: List[int] = field(default_factory=list)
+
+    def email(self, user_id: int) -> str:
+        return f"user{user_id}@example.com"
+
+
+def _zipf_weights(n: int, exponent: float) -> List[float]:
+    # Cumulative, so rng.choices picks by bisection instead of summing n weights per draw
+    return list(itertools.accumulate(1.0 / (rank ** exponent) for rank in range(1, n + 1)))
+
+
+def _text(rng: random.Random, prefix: str) -> str:
+    return f"{prefix} " + " ".join(rng.choices(_WORDS, k=rng.randint(4, 16)))
+
+
+def _insert(conn, model, rows):
+    for start in range(0, len(rows), _BATCH):
+        conn.execute(insert(model), rows[start:start + _BATCH])
+
+
+def seed(engine, users: int = 200, posts: int = 2000, replies: int = 20000, likes: int = 50000,
+         max_depth: int = 12, skew: float = 1.1, random_seed: int = 42) -> Dataset:
+    # Insert the dataset into an empty schema (migrations/create_all already run).
+    # App modules are imported here, not at the top: benchmarks/api_latency.py sets
+    # DATABASE_URL after importing this module and before the app reads its settings.
+    import models
+    from core.config import settings
+
+    rng = random.Random(random_seed)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    hashed_password = bcrypt.hashpw(PASSWORD.encode("utf-8"), bcrypt.gensalt(rounds=settings.bcrypt_rounds)).decode("utf-8")
+
+    user_rows = [
+        {"id": i, "username": f"user{i}", "email": f"user{i}@example.com", "hashed_password": hashed_password}
+        for i in range(1, users + 1)
+    ]
+    user_ids = list(range(1, users + 1))
+    user_weights = _zipf_weights(users, skew)
+
+    # Top-level posts: authors drawn from the skewed user distribution, one second apart
+    post_rows = [
+        {"id": i, "text": _text(rng, f"post {i}"), "owner_id": owner, "parent_id": None,
+         "timestamp": start + timedelta(seconds=i), "likes_count": 0, "replies_count": 0}
+        for i, owner in zip(range(1, posts + 1), rng.choices(user_ids, cum_weights=user_weights, k=posts))
+    ]
+    rows_by_id: Dict[int, dict] = {row["id"]: row for row in post_rows}
+
+    # Which thread a post is hot in is random, not "the oldest posts are hot"
+    thread_order = list(range(1, posts + 1))
+    rng.shuffle(thread_order)
+    thread_weights = _zipf_weights(posts, skew)
+
+    depth = {post_id: 0 for post_id in thread_order}
+    latest_in_thread = {post_id: post_id for post_id in thread_order}
+    reply_rows = []
+    next_id = posts + 1
+    for root_id in rng.choices(thread_order, cum_weights=thread_weights, k=replies):
+        # Mostly answer the latest reply (conversation chains), sometimes the root
+        parent_id = latest_in_thread[root_id] if rng.random() < 0.7 else root_id
+        if depth[parent_id] >= max_depth:
+            parent_id = root_id
+        parent = rows_by_id[parent_id]
+        row = {"id": next_id, "text": _text(rng, f"reply {next_id}"),
+               "owner_id": rng.choices(user_ids, cum_weights=user_weights)[0], "parent_id": parent_id,
+               "timestamp": parent["timestamp"] + timedelta(milliseconds=next_id),
+               "likes_count": 0, "replies_count": 0}
+        parent["replies_count"] += 1
+        depth[next_id] = depth[parent_id] + 1
+        latest_in_thread[root_id] = next_id
+        rows_by_id[next_id] = row
+        reply_rows.append(row)
+        next_id += 1
+
+    # Likes: skewed over posts and over users, each (user, post) pair at most once
+    all_post_ids = thread_order + [row["id"] for row in reply_rows]
+    like_weights = _zipf_weights(len(all_post_ids), skew)
+    pairs = set()
+    like_rows = []
+    attempts = 0
+    while len(like_rows) < likes and attempts < likes * 5:
+        attempts += 1
+        pair = (rng.choices(user_ids, cum_weights=user_weights)[0], rng.choices(all_post_ids, cum_weights=like_weights)[0])
+        if pair in pairs:
+            continue
+        pairs.add(pair)
+        rows_by_id[pair[1]]["likes_count"] += 1
+        like_rows.append({"id": len(like_rows) + 1, "user_id": pair[0], "post_id": pair[1],
+                          "timestamp": start + timedelta(seconds=posts, milliseconds=len(like_rows))})
+
+    with engine.begin() as conn:
+        _insert(conn, models.User, user_rows)
+        _insert(conn, models.Post, post_rows)
+        _insert(conn, models.Post, reply_rows)  # parents always precede their replies
+        _insert(conn, models.Like, like_rows)
+        if conn.dialect.name == "postgresql":
+            # Explicit ids leave the sequences behind; move them past the seeded rows
+            for table in ("users", "posts", "likes"):
+                conn.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT MAX(id) FROM {table}))"
+                ))
+
+    deepest = max(depth, key=lambda post_id: depth[post_id])
+    root_of = {row["id"]: row["parent_id"] for row in reply_rows}
+    while deepest in root_of:
+        deepest = root_of[deepest]
+
+    posts_per_user: Dict[int, int] = {}
+    for row in itertools.chain(post_rows, reply_rows):
+        posts_per_user[row["owner_id"]] = posts_per_user.get(row["owner_id"], 0) + 1
+
+    return Dataset(
+        users=users, posts=posts, replies=len(reply_rows), likes=len(like_rows), max_depth=max(depth.values()),
+        hot_post_ids=sorted(range(1, posts + 1), key=lambda post_id: -rows_by_id[post_id]["likes_count"])[:10],
+        deep_thread_id=deepest,
+        active_user_ids=sorted(posts_per_user, key=lambda user_id: -posts_per_user[user_id])[:10],
+    )
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    # Dataset size options shared by the benchmark scripts
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--posts", type=int, default=2000, help="top-level posts")
+    parser.add_argument("--replies", type=int, default=20000, help="replies in total, across all threads")
+    parser.add_argument("--likes", type=int, default=50000)
+    parser.add_argument("--max-depth", type=int, default=12, help="deepest reply chain")
+    parser.add_argument("--seed", type=int, default=42, help="random seed")
+
+
+def seed_from_args(engine, args: argparse.Namespace) -> Dataset:
+    return seed(engine, users=args.users, posts=args.posts, replies=args.replies, likes=args.likes,
+                max_depth=args.max_depth, random_seed=args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", required=True)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    from migrations import runner as migrations
+    engine = create_engine(args.database_url)
+    migrations.upgrade(engine)
+    dataset = seed_from_args(engine, args)
+    engine.dispose()
+    print(dataset)
+
+
+if __name__ == "__main__":
+    main()
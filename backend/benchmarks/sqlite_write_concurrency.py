@@ -0,0 +1,110 @@
+"""Write throughput of several processes sharing one SQLite file.
+
+Mirrors the Dockerfile's 4 uvicorn workers: each process opens its own engine and
+runs a mix of like toggles and new posts through the crud layer. Runs once with the
+stock connection settings and once with the production profile from database.py
+(WAL + pragmas + write retries), then prints writes/sec and failed writes.
+
+Usage (from backend/):
+    python -m benchmarks.sqlite_write_concurrency --workers 4 --ops 500
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+import models, schemas
+from core.config import settings
+from crud import like as like_crud
+from crud import post as post_crud
+from database import Base, apply_sqlite_pragmas
+
+USERS = 50
+POSTS = 200
+
+
+def seed(db_path: str):
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(insert(models.User), [
+            {"id": i, "username": f"user{i}", "email": f"user{i}@example.com", "hashed_password": "x"}
+            for i in range(1, USERS + 1)
+        ])
+        conn.execute(insert(models.Post), [
+            {"id": i, "text": f"post {i}", "owner_id": 1 + i % USERS} for i in range(1, POSTS + 1)
+        ])
+    engine.dispose()
+
+
+def worker(db_path: str, tuned: bool, ops: int, worker_id: int, results):
+    settings.db_write_retries = 3 if tuned else 0
+    engine = create_engine(f"sqlite:///{db_path}", connect_args={"check_same_thread": False})
+    if tuned:
+        apply_sqlite_pragmas(engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    rng = random.Random(worker_id)
+
+    ok = failed = 0
+    db = session_factory()
+    try:
+        for _ in range(ops):
+            user_id = rng.randint(1, USERS)
+            try:
+                if rng.random() < 0.8:
+                    like_crud.toggle_like(db, user_id, rng.randint(1, POSTS))
+                else:
+                    post_crud.create_post(db, schemas.PostCreate(text="bench"), owner_id=user_id)
+                ok += 1
+            except OperationalError:
+                db.rollback()
+                failed += 1
+    finally:
+        db.close()
+        engine.dispose()
+    results.put((ok, failed))
+
+
+def run(tuned: bool, workers: int, ops: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        seed(db_path)
+        results = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(target=worker, args=(db_path, tuned, ops, i, results))
+            for i in range(workers)
+        ]
+        started = time.perf_counter()
+        for process in processes:
+            process.start()
+        totals = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - started
+
+    ok = sum(t[0] for t in totals)
+    failed = sum(t[1] for t in totals)
+    return ok / elapsed, failed, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--ops", type=int, default=500, help="writes per worker")
+    args = parser.parse_args()
+
+    print(f"{args.workers} workers x {args.ops} writes")
+    print(f"{'profile':<10} {'writes/s':>10} {'failed':>8} {'seconds':>8}")
+    for name, tuned in (("default", False), ("tuned", True)):
+        throughput, failed, elapsed = run(tuned, args.workers, args.ops)
+        print(f"{name:<10} {throughput:>10.1f} {failed:>8} {elapsed:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
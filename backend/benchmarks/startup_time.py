@@ -0,0 +1,67 @@
+"""Cold import and startup time of the app.
+
+Runs `import main` and the lifespan startup (migrations, upload directories) in a fresh
+interpreter against an empty SQLite database in a temporary directory, several times,
+and reports the best and median of each. Exits with status 1 when the best run exceeds
+the budgets; a local import takes about a second, almost all of it fastapi, sqlalchemy
+and pydantic themselves.
+
+Usage (from backend/):
+    python -m benchmarks.startup_time --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+_PROBE = """
+import json, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(main.app) as client:
+    ready = time.perf_counter()
+    status = client.get("/health/ready").status_code
+print(json.dumps({"import": imported - started, "startup": ready - imported, "ready": status}))
+"""
+
+
+def probe() -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {**os.environ, "PYTHONPATH": str(BACKEND_DIR), "DATABASE_URL": f"sqlite:///{os.path.join(tmp, 'app.db')}"}
+        result = subprocess.run([sys.executable, "-c", _PROBE], cwd=tmp, env=env, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise SystemExit(result.stderr)
+        timings = json.loads(result.stdout.strip().splitlines()[-1])
+        if timings["ready"] != 200:
+            raise SystemExit(f"/health/ready returned {timings['ready']}")
+        return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--import-budget", type=float, default=3.0, help="seconds")
+    parser.add_argument("--startup-budget", type=float, default=3.0, help="seconds")
+    args = parser.parse_args()
+
+    runs = [probe() for _ in range(args.runs)]
+    failed = False
+    for phase, budget in (("import", args.import_budget), ("startup", args.startup_budget)):
+        values = [run[phase] for run in runs]
+        best = min(values)
+        print(f"{phase:<8} best {best:.3f}s  median {statistics.median(values):.3f}s  budget {budget:.1f}s")
+        failed = failed or best > budget
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
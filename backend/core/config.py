@@ -1,6 +1,6 @@
 from pydantic_settings import BaseSettings # type: ignore
 from pydantic import ConfigDict
-from typing import List
+from typing import List, Literal
 import os
 
 class Settings(BaseSettings):
@@ -12,10 +12,70 @@ class Settings(BaseSettings):
     secret_key: str = os.getenv("SECRET_KEY", "your-secret-key-here")
     algorithm: str = "HS256"
     access_token_expire_minutes: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+    # Per-worker cache of authenticated users keyed by token subject (0 disables it).
+    # Other workers only see a profile change once their entry expires.
+    principal_cache_size: int = int(os.getenv("PRINCIPAL_CACHE_SIZE", "1024"))
+    principal_cache_ttl_seconds: float = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "30"))
+    # Password hashing (see core/passwords.py); changing the cost rehashes passwords on next login
+    bcrypt_rounds: int = int(os.getenv("BCRYPT_ROUNDS", "12"))
+    password_hash_workers: int = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+    password_hash_max_pending: int = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
     
     # Database
     database_url: str = os.getenv("DATABASE_URL", "sqlite:///./sql_app.db")
+    # Serve requests with AsyncSession on asyncpg/aiosqlite instead of the sync threadpool
+    database_async: bool = os.getenv("DATABASE_ASYNC", "false").lower() in ("1", "true", "yes")
+    # SQLite connection pragmas (ignored for other databases)
+    sqlite_journal_mode: str = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+    sqlite_synchronous: str = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    sqlite_busy_timeout_ms: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    sqlite_cache_size_kib: int = int(os.getenv("SQLITE_CACHE_SIZE_KIB", "20000"))
+    sqlite_mmap_size: int = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+    # Extra attempts for write transactions that fail with "database is locked"
+    db_write_retries: int = int(os.getenv("DB_WRITE_RETRIES", "3"))
     
+    # Feed
+    # Per-file limit for image uploads, and for a whole request body (0 disables the latter)
+    upload_max_bytes: int = int(os.getenv("UPLOAD_MAX_BYTES", str(5 * 1024 * 1024)))
+    request_max_body_bytes: int = int(os.getenv("REQUEST_MAX_BODY_BYTES", str(6 * 1024 * 1024)))
+    # How /uploads is served: "app" (FileResponse), or headers for the front proxy to send
+    # the file itself: "x-accel-redirect" (nginx internal location at upload_accel_prefix)
+    # or "x-sendfile" (absolute path)
+    upload_serve_mode: Literal["app", "x-accel-redirect", "x-sendfile"] = os.getenv("UPLOAD_SERVE_MODE", "app")  # type: ignore
+    upload_accel_prefix: str = os.getenv("UPLOAD_ACCEL_PREFIX", "/protected-uploads/")
+    # An unreferenced blob modified more recently than this is left to jobs/gc_blobs.py
+    blob_delete_grace_seconds: int = int(os.getenv("BLOB_DELETE_GRACE_SECONDS", "60"))
+    # Resized variants of uploaded images (services/image_variants.py); 0 workers = a thread
+    image_variant_widths: str = os.getenv("IMAGE_VARIANT_WIDTHS", "96,480,1080")
+    image_variant_formats: str = os.getenv("IMAGE_VARIANT_FORMATS", "webp,avif")
+    image_variant_workers: int = int(os.getenv("IMAGE_VARIANT_WORKERS", "1"))
+    reply_preview_limit: int = int(os.getenv("REPLY_PREVIEW_LIMIT", "3"))
+    # Rows fetched per round trip by the streaming export (GET /users/{user_id}/export)
+    export_batch_size: int = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+    # Bulk NDJSON import (services/bulk_import.py): POST /admin/import needs this token in
+    # X-Import-Token and is disabled while it is empty; its body may be up to
+    # bulk_import_max_body_bytes instead of request_max_body_bytes
+    bulk_import_token: str = os.getenv("BULK_IMPORT_TOKEN", "")
+    bulk_import_batch_size: int = int(os.getenv("BULK_IMPORT_BATCH_SIZE", "5000"))
+    bulk_import_max_body_bytes: int = int(os.getenv("BULK_IMPORT_MAX_BODY_BYTES", str(1024 * 1024 * 1024)))
+    # N+1 detection (core/query_tracker.py): a statement shape run this many times in one
+    # request is flagged; QUERY_TRACKER=true logs those requests (dev mode, adds overhead)
+    query_tracker: bool = os.getenv("QUERY_TRACKER", "false").lower() in ("1", "true", "yes")
+    query_repeat_threshold: int = int(os.getenv("QUERY_REPEAT_THRESHOLD", "5"))
+    # On-demand profiling of single requests (core/profiler.py): a request sent with this
+    # token in X-Profile-Token is sampled every profiling_interval_ms and its report stored
+    # in profiling_dir (newest profiling_max_reports kept); disabled while the token is empty
+    profiling_token: str = os.getenv("PROFILING_TOKEN", "")
+    profiling_interval_ms: float = float(os.getenv("PROFILING_INTERVAL_MS", "2"))
+    profiling_dir: str = os.getenv("PROFILING_DIR", "profiles")
+    profiling_max_reports: int = int(os.getenv("PROFILING_MAX_REPORTS", "100"))
+    # Eager loading used for post owners/replies (see benchmarks/loader_strategies.py)
+    loading_strategy: Literal["selectin", "joined", "subquery"] = os.getenv("LOADING_STRATEGY", "selectin")  # type: ignore
+    # Cache of the newest top-level post IDs (services/timeline.py): memory, redis or none
+    timeline_backend: Literal["memory", "redis", "none"] = os.getenv("TIMELINE_BACKEND", "memory")  # type: ignore
+    timeline_cache_size: int = int(os.getenv("TIMELINE_CACHE_SIZE", "200"))
+    timeline_redis_url: str = os.getenv("TIMELINE_REDIS_URL", "redis://localhost:6379/0")
+
     # CORS
     cors_origins: str = os.getenv("CORS_ORIGINS", '["http://localhost:5173",""https://fastapi-crud-frontend-3m7s.onrender.com""]')
     
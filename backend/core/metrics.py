@@ -0,0 +1,130 @@
+import contextvars
+import os
+import time
+import weakref
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import multiprocess
+from sqlalchemy import event
+
+# Prometheus metrics, exposed at GET /metrics.
+#
+# With several uvicorn workers every process keeps its own values; set
+# PROMETHEUS_MULTIPROC_DIR to an empty directory (wiped before the workers start, see
+# the Dockerfile) and each worker writes its values there, which /metrics, served by
+# any worker, merges for all of them. Without it the values are this process's only.
+
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+REQUESTS = Counter(
+    "http_requests_total", "HTTP requests by route template and status",
+    ["method", "route", "status"],
+)
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Time to the end of the response body",
+    ["method", "route"],
+)
+# livesum: the sum over live workers; a worker's series is dropped when it shuts down
+IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "Requests being served",
+    ["method"], multiprocess_mode="livesum",
+)
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries", "SQL statements executed per request",
+    ["route"], buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89),
+)
+REQUEST_DB_SECONDS = Histogram(
+    "http_request_db_seconds", "Time per request spent executing SQL",
+    ["route"], buckets=(.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5),
+)
+QUERY_SECONDS = Histogram(
+    "db_query_duration_seconds", "Duration of single SQL statements",
+    buckets=(.0001, .0005, .001, .0025, .005, .01, .025, .05, .1, .25, 1),
+)
+POOL_CHECKOUT_SECONDS = Histogram(
+    "db_pool_checkout_seconds", "Time to get a connection from the pool, waiting included",
+    buckets=(.0001, .0005, .001, .005, .01, .05, .1, .5, 1, 5, 30),
+)
+POOL_IN_USE = Gauge(
+    "db_pool_connections_in_use", "Connections checked out of the pool",
+    multiprocess_mode="livesum",
+)
+UPLOADS = Counter("uploads_total", "Stored uploads; deduplicated ones matched an existing blob", ["result"])
+UPLOAD_BYTES = Counter("upload_bytes_total", "Bytes received in stored uploads")
+PASSWORD_HASH_SECONDS = Histogram(
+    "password_hash_duration_seconds", "bcrypt jobs, queueing in the hashing pool included",
+    buckets=(.01, .05, .1, .25, .5, 1, 2.5, 5),
+)
+PASSWORD_HASH_REJECTED = Counter("password_hash_rejected_total", "bcrypt jobs refused with 503 (pool queue full)")
+
+@dataclass
+class RequestDbStats:
+    queries: int = 0
+    seconds: float = 0.0
+
+# Set by MetricsMiddleware for the duration of a request. The object is shared, not
+# copied, so statements run in the threadpool (run_db) still add to the request's totals.
+request_db_stats: contextvars.ContextVar[Optional[RequestDbStats]] = contextvars.ContextVar("request_db_stats", default=None)
+
+_instrumented = weakref.WeakSet()
+
+def instrument_engine(engine) -> None:
+    # Statement count/time and pool checkout metrics for a (sync) engine; idempotent
+    if engine in _instrumented:
+        return
+    _instrumented.add(engine)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["metrics_started"].pop()
+        QUERY_SECONDS.observe(elapsed)
+        stats = request_db_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.seconds += elapsed
+
+    @event.listens_for(engine, "handle_error")
+    def _on_error(context):
+        if context.connection is not None and context.connection.info.get("metrics_started"):
+            context.connection.info["metrics_started"].pop()
+
+    @event.listens_for(engine.pool, "checkout")
+    def _checkout(dbapi_connection, connection_record, connection_proxy):
+        POOL_IN_USE.inc()
+
+    @event.listens_for(engine.pool, "checkin")
+    def _checkin(dbapi_connection, connection_record):
+        POOL_IN_USE.dec()
+
+    # The pool has no event before a checkout starts, so time its internal getter:
+    # this covers waiting for a free connection and opening a new one.
+    # (engine.dispose() replaces the pool; it is only called at shutdown)
+    do_get = engine.pool._do_get
+
+    def _timed_do_get():
+        started = time.perf_counter()
+        try:
+            return do_get()
+        finally:
+            POOL_CHECKOUT_SECONDS.observe(time.perf_counter() - started)
+
+    engine.pool._do_get = _timed_do_get
+
+def render() -> Tuple[bytes, str]:
+    # (body, content type) of the /metrics response
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+def worker_exited() -> None:
+    # Drop this worker's live gauges from the shared directory (lifespan shutdown)
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(os.getpid())
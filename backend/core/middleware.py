@@ -0,0 +1,172 @@
+import json
+import secrets
+import time
+from typing import Dict, Optional
+import anyio
+from fastapi import HTTPException
+from core import metrics, profiler, query_tracker
+
+class RequestTooLarge(HTTPException):
+    def __init__(self, max_body_bytes: int):
+        super().__init__(
+            status_code=413,
+            detail=f"Request body exceeds {max_body_bytes} bytes.",
+        )
+
+class BodySizeLimitMiddleware:
+    # Pure ASGI middleware: rejects a request body over max_body_bytes while it streams in,
+    # so an oversized upload is cut off before it is spooled to disk by the form parser.
+    # A declared Content-Length over the limit is refused without reading anything.
+    # path_limits gives individual paths (exact match) a limit of their own.
+    def __init__(self, app, max_body_bytes: int, path_limits: Optional[Dict[str, int]] = None):
+        self.app = app
+        self.max_body_bytes = max_body_bytes
+        self.path_limits = path_limits or {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        max_body_bytes = self.path_limits.get(scope["path"], self.max_body_bytes)
+        if max_body_bytes <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > max_body_bytes:
+            await self._reject(send, max_body_bytes)
+            return
+
+        received = 0
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_body_bytes:
+                    # Surfaces as a normal 413 through FastAPI's exception handlers
+                    raise RequestTooLarge(max_body_bytes)
+            return message
+
+        async def tracking_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except RequestTooLarge:
+            if response_started:
+                raise
+            await self._reject(send, max_body_bytes)
+
+    async def _reject(self, send, max_body_bytes: int):
+        body = json.dumps({"detail": RequestTooLarge(max_body_bytes).detail}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()), (b"connection", b"close")],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+class MetricsMiddleware:
+    # Pure ASGI middleware recording, per request: latency to the end of the body, status,
+    # the in-flight gauge and the SQL statements it ran (core/metrics.py). Pure ASGI so the
+    # endpoint runs in this task's context and sees request_db_stats.
+    # Routes are labelled by their template (/posts/{post_id}), unmatched paths as one label.
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+
+        async def recording_send(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        stats = metrics.RequestDbStats()
+        token = metrics.request_db_stats.set(stats)
+        in_progress = metrics.IN_PROGRESS.labels(method)
+        in_progress.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, recording_send)
+        finally:
+            elapsed = time.perf_counter() - started
+            in_progress.dec()
+            metrics.request_db_stats.reset(token)
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            metrics.REQUESTS.labels(method, route, str(status_code)).inc()
+            metrics.REQUEST_SECONDS.labels(method, route).observe(elapsed)
+            metrics.REQUEST_QUERIES.labels(route).observe(stats.queries)
+            metrics.REQUEST_DB_SECONDS.labels(route).observe(stats.seconds)
+
+class QueryTrackerMiddleware:
+    # Dev mode (QUERY_TRACKER=true): records the statements of each request and logs the
+    # ones repeated often enough to look like N+1, with the code that issued them
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        recorder = query_tracker.QueryRecorder()
+        token = query_tracker.current_recorder.set(recorder)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            query_tracker.current_recorder.reset(token)
+            query_tracker.warn_repeated(recorder, f"{scope['method']} {scope['path']}")
+
+class ProfilingMiddleware:
+    # Profiles the requests that carry X-Profile-Token equal to token (core/profiler.py):
+    # samples its stacks and records its SQL, answers with X-Profile-Id and stores the
+    # report once the response is sent. Other requests only pay the header lookup; a wrong
+    # token is ignored like a missing one.
+    def __init__(self, app, token: str, interval_ms: float):
+        self.app = app
+        self.token = token.encode()
+        self.interval = interval_ms / 1000
+
+    def _requested(self, scope) -> bool:
+        for name, value in scope["headers"]:
+            if name == b"x-profile-token":
+                return secrets.compare_digest(value, self.token)
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile = profiler.RequestProfile(scope["method"], scope["path"], self.interval)
+        status_code = 500
+
+        async def profiled_send(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = list(message.get("headers", [])) + [(b"x-profile-id", profile.id.encode())]
+                message = {**message, "headers": headers}
+            await send(message)
+
+        token = profiler.current_profile.set(profile)
+        profile.start()
+        try:
+            await self.app(scope, receive, profiled_send)
+        finally:
+            profile.stop()
+            profiler.current_profile.reset(token)
+            await anyio.to_thread.run_sync(profiler.save, profile, status_code)
@@ -0,0 +1,33 @@
+import base64
+from datetime import datetime
+from typing import Tuple
+
+def encode_cursor(timestamp: datetime, row_id: int) -> str:
+    # Opaque keyset cursor: base64 of "<iso timestamp>|<id>"
+    raw = f"{timestamp.isoformat()}|{row_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    # Raises ValueError if the cursor was not produced by encode_cursor
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8")
+        timestamp, row_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except (UnicodeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+
+def encode_rank_cursor(rank: float, row_id: int) -> str:
+    # Keyset cursor over (rank, id) of ranked results; float.hex keeps the rank exact
+    raw = f"{rank.hex()}|{row_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_rank_cursor(cursor: str) -> Tuple[float, int]:
+    # Raises ValueError if the cursor was not produced by encode_rank_cursor
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8")
+        rank, row_id = raw.rsplit("|", 1)
+        return float.fromhex(rank), int(row_id)
+    except (UnicodeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
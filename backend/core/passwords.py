@@ -0,0 +1,112 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional
+
+import bcrypt # type: ignore
+from fastapi import HTTPException, status
+
+from . import metrics
+from .config import settings
+
+# bcrypt runs in a dedicated process pool so a burst of logins neither holds the GIL
+# nor occupies the threadpool that serves every other (sync) endpoint.
+# The pool is bounded: once password_hash_max_pending jobs are queued, new ones get 503.
+
+_executor: Optional[Executor] = None
+_executor_lock = threading.Lock()
+_pending = 0
+_stats_lock = threading.Lock()
+hash_stats = {"count": 0, "seconds_total": 0.0, "rejected": 0}
+
+def _hashpw(password: bytes, rounds: int) -> str:
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds=rounds)).decode('utf-8')
+
+def _checkpw(password: bytes, hashed_password: bytes) -> bool:
+    return bcrypt.checkpw(password, hashed_password)
+
+def _get_executor() -> Executor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            if settings.password_hash_workers > 0:
+                _executor = ProcessPoolExecutor(max_workers=settings.password_hash_workers)
+            else:
+                _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bcrypt")
+        return _executor
+
+def _discard_broken(executor: Executor) -> None:
+    # A worker that died (OOM kill, segfault) breaks the whole pool for good; drop it so
+    # the next job starts a fresh one
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+def shutdown_executor() -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+async def _run(fn, *args):
+    global _pending
+    with _stats_lock:
+        if _pending >= settings.password_hash_max_pending:
+            hash_stats["rejected"] += 1
+            metrics.PASSWORD_HASH_REJECTED.inc()
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many authentication requests, try again later",
+                headers={"Retry-After": "1"},
+            )
+        _pending += 1
+
+    started = time.perf_counter()
+    try:
+        executor = _get_executor()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+        except BrokenProcessPool:
+            _discard_broken(executor)
+            return await asyncio.get_running_loop().run_in_executor(_get_executor(), fn, *args)
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics.PASSWORD_HASH_SECONDS.observe(elapsed)
+        with _stats_lock:
+            _pending -= 1
+            hash_stats["count"] += 1
+            hash_stats["seconds_total"] += elapsed
+
+async def hash_password(password: str) -> str:
+    return await _run(_hashpw, password.encode('utf-8')[:72], settings.bcrypt_rounds)
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await _run(_checkpw, plain_password.encode('utf-8')[:72], hashed_password.encode('utf-8'))
+
+def hash_passwords(passwords: List[str]) -> List[str]:
+    # Blocking batch variant for bulk imports (services/bulk_import.py): spreads the hashes
+    # over the pool's workers and bypasses the pending limit, which guards request traffic
+    started = time.perf_counter()
+    encoded = [password.encode('utf-8')[:72] for password in passwords]
+    executor = _get_executor()
+    try:
+        hashed = list(executor.map(_hashpw, encoded, [settings.bcrypt_rounds] * len(encoded)))
+    except BrokenProcessPool:
+        _discard_broken(executor)
+        hashed = list(_get_executor().map(_hashpw, encoded, [settings.bcrypt_rounds] * len(encoded)))
+    with _stats_lock:
+        hash_stats["count"] += len(hashed)
+        hash_stats["seconds_total"] += time.perf_counter() - started
+    return hashed
+
+def needs_rehash(hashed_password: str) -> bool:
+    # bcrypt hashes look like $2b$<cost>$<salt+hash>
+    try:
+        return int(hashed_password.split("$")[2]) != settings.bcrypt_rounds
+    except (IndexError, ValueError):
+        return True
@@ -0,0 +1,193 @@
+import contextvars
+import json
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+import weakref
+
+from sqlalchemy import event
+
+from core.config import settings
+
+# On-demand profiling of single requests in production (core/middleware.ProfilingMiddleware).
+# A request sent with X-Profile-Token: <PROFILING_TOKEN> gets an X-Profile-Id header and,
+# once it has finished, a report under PROFILING_DIR:
+#
+#   <id>.folded  sampled stacks in the folded format ("outer;inner;leaf count"), ready for
+#                flamegraph.pl, speedscope or inferno
+#   <id>.json    request, timings, the SQL timeline (offset, duration, thread, statement)
+#                and the same folded stacks
+#
+# Reports are fetched with GET /admin/profiles/{id} (same header). A sampler thread reads
+# the stacks of the threads working on the request every PROFILING_INTERVAL_MS: the event
+# loop thread, and threadpool threads while they run the request's database.run_db calls.
+# Other requests served by the event loop at the same moment can appear in its samples.
+# Requests without the header pay one header lookup, a contextvar read per run_db call
+# and per SQL statement.
+
+PROFILE_ID = re.compile(r"^[0-9a-f]{32}$")
+_APP_ROOT = Path(__file__).resolve().parent.parent
+
+current_profile: contextvars.ContextVar[Optional["RequestProfile"]] = contextvars.ContextVar("current_profile", default=None)
+
+def _frame_label(frame) -> str:
+    filename = frame.f_code.co_filename
+    if "site-packages" in filename:
+        filename = filename.split("site-packages", 1)[1].lstrip("/\\")
+    elif filename.startswith(str(_APP_ROOT)):
+        filename = Path(filename).relative_to(_APP_ROOT).as_posix()
+    else:
+        filename = Path(filename).name
+    return f"{filename}:{frame.f_code.co_name}"
+
+def _fold(frame) -> str:
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+class RequestProfile:
+    def __init__(self, method: str, path: str, interval: float):
+        self.id = uuid.uuid4().hex
+        self.method = method
+        self.path = path
+        self.interval = interval
+        self.started_at = datetime.now(timezone.utc)
+        self.samples = 0
+        self.stacks: Counter = Counter()
+        self.sql: List[dict] = []
+        self._threads: Dict[int, int] = {}  # thread ident -> nesting depth
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, name=f"profiler-{self.id[:8]}", daemon=True)
+        self._started = 0.0
+        self._elapsed = 0.0
+
+    def start(self):
+        self._started = time.perf_counter()
+        self.enter_thread()
+        self._sampler.start()
+
+    def stop(self):
+        self._stop.set()
+        self._sampler.join()
+        self.leave_thread()
+        self._elapsed = time.perf_counter() - self._started
+
+    def enter_thread(self):
+        ident = threading.get_ident()
+        with self._lock:
+            self._threads[ident] = self._threads.get(ident, 0) + 1
+
+    def leave_thread(self):
+        ident = threading.get_ident()
+        with self._lock:
+            depth = self._threads.get(ident, 0) - 1
+            if depth > 0:
+                self._threads[ident] = depth
+            else:
+                self._threads.pop(ident, None)
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            with self._lock:
+                idents = list(self._threads)
+            for ident in idents:
+                frame = frames.get(ident)
+                if frame is not None:
+                    self.stacks[_fold(frame)] += 1
+            self.samples += 1
+
+    def record_sql(self, statement: str, started: float, elapsed: float):
+        self.sql.append({
+            "offset_ms": round((started - self._started) * 1000, 3),
+            "duration_ms": round(elapsed * 1000, 3),
+            "thread": threading.current_thread().name,
+            "statement": statement,
+        })
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def report(self, status_code: int) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status": status_code,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round(self._elapsed * 1000, 3),
+            "interval_ms": round(self.interval * 1000, 3),
+            "samples": self.samples,
+            "sql_count": len(self.sql),
+            "sql_ms": round(sum(query["duration_ms"] for query in self.sql), 3),
+            "sql": self.sql,
+            "folded": self.folded(),
+        }
+
+def in_worker(fn):
+    # fn, or when the calling request is profiled, fn wrapped so the threadpool thread that
+    # runs it is sampled while it does (database.run_db)
+    profile = current_profile.get()
+    if profile is None:
+        return fn
+
+    def profiled(*args, **kwargs):
+        profile.enter_thread()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profile.leave_thread()
+    return profiled
+
+_instrumented = weakref.WeakSet()
+
+def instrument_engine(engine) -> None:
+    # SQL timeline of profiled requests; idempotent
+    if engine in _instrumented:
+        return
+    _instrumented.add(engine)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None and current_profile.get() is not None:
+            context._profile_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_execute(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_profile_started", None)
+        profile = current_profile.get()
+        if started is not None and profile is not None:
+            profile.record_sql(statement, started, time.perf_counter() - started)
+
+def _report_dir() -> Path:
+    return Path(settings.profiling_dir)
+
+def save(profile: RequestProfile, status_code: int) -> None:
+    # Write the report files, then drop the oldest beyond profiling_max_reports
+    directory = _report_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / f"{profile.id}.folded").write_text(profile.folded())
+    (directory / f"{profile.id}.json").write_text(json.dumps(profile.report(status_code), indent=2))
+
+    reports = sorted(directory.glob("*.json"), key=lambda path: path.stat().st_mtime, reverse=True)
+    for stale in reports[settings.profiling_max_reports:]:
+        stale.unlink(missing_ok=True)
+        stale.with_suffix(".folded").unlink(missing_ok=True)
+
+def load(profile_id: str, suffix: str = ".json") -> Optional[str]:
+    # Contents of a stored report, or None (unknown or malformed id)
+    if not PROFILE_ID.match(profile_id):
+        return None
+    try:
+        return (_report_dir() / f"{profile_id}{suffix}").read_text()
+    except FileNotFoundError:
+        return None
@@ -0,0 +1,158 @@
+import contextvars
+import logging
+import re
+import sys
+import threading
+from collections import Counter
+from contextlib import ContextDecorator, contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+import weakref
+
+from sqlalchemy import event
+
+from core.config import settings
+
+# Records the SQL statements of a unit of work (a request, a test block) together with the
+# app code that issued them, and flags N+1 patterns: the same statement shape executed
+# again and again, e.g. one SELECT per post instead of one for all of them.
+#
+#   tests:     with query_budget(8): client.get(...)   (tests/conftest.py: query_budget)
+#   dev mode:  QUERY_TRACKER=true logs a warning per request with repeated statements
+#              (core/middleware.QueryTrackerMiddleware)
+
+logger = logging.getLogger(__name__)
+
+_APP_ROOT = Path(__file__).resolve().parent.parent
+_THIS_FILE = str(Path(__file__).resolve())
+
+# Bound parameters in any paramstyle; an IN list of them collapses to one
+_PARAM = r"(?:\?|%\(\w+\)s|%s|\$\d+|:\w+)"
+_IN_LIST = re.compile(rf"\(\s*{_PARAM}(?:\s*,\s*{_PARAM})*\s*\)")
+_NUMBER = re.compile(r"\b\d+\b")
+_SPACE = re.compile(r"\s+")
+
+def statement_shape(statement: str) -> str:
+    # The statement with literals and parameter lists normalized, so "the same query with
+    # different values" compares equal
+    shape = _SPACE.sub(" ", statement).strip()
+    shape = _IN_LIST.sub("(?)", shape)
+    return _NUMBER.sub("?", shape)
+
+def _call_site() -> str:
+    # file:line (function) of the innermost app frame, i.e. the crud/service code that ran
+    # the statement, skipping SQLAlchemy, other libraries and this module
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename != _THIS_FILE and filename.startswith(str(_APP_ROOT)) and "site-packages" not in filename:
+            relative = Path(filename).relative_to(_APP_ROOT).as_posix()
+            return f"{relative}:{frame.f_lineno} ({frame.f_code.co_name})"
+        frame = frame.f_back
+    return "<unknown>"
+
+@dataclass
+class RecordedQuery:
+    statement: str
+    shape: str
+    call_site: str
+
+class QueryRecorder:
+    def __init__(self):
+        self.queries: List[RecordedQuery] = []
+
+    def record(self, statement: str):
+        self.queries.append(RecordedQuery(statement, statement_shape(statement), _call_site()))
+
+    @property
+    def count(self) -> int:
+        return len(self.queries)
+
+    def repeated(self, threshold: int) -> List[Tuple[RecordedQuery, int]]:
+        # (first occurrence, count) of every shape executed at least threshold times
+        if threshold <= 0:
+            return []
+        counts = Counter(query.shape for query in self.queries)
+        first = {}
+        for query in self.queries:
+            first.setdefault(query.shape, query)
+        return [(first[shape], count) for shape, count in counts.most_common() if count >= threshold]
+
+    def report(self) -> str:
+        return "\n".join(f"  {i}. {query.call_site}: {query.statement}" for i, query in enumerate(self.queries, 1))
+
+# Recorders fed by every statement on an instrumented engine, whatever thread runs it
+# (a TestClient request is served on another thread than the test)
+_active: List[QueryRecorder] = []
+_active_lock = threading.Lock()
+# The recorder of the current request (dev mode middleware)
+current_recorder: contextvars.ContextVar[Optional[QueryRecorder]] = contextvars.ContextVar("current_recorder", default=None)
+
+_instrumented = weakref.WeakSet()
+
+def instrument_engine(engine) -> None:
+    # Idempotent; statements are only inspected while a recorder is listening
+    if engine in _instrumented:
+        return
+    _instrumented.add(engine)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        recorder = current_recorder.get()
+        if recorder is not None:
+            recorder.record(statement)
+        if _active:
+            with _active_lock:
+                for recorder in _active:
+                    recorder.record(statement)
+
+@contextmanager
+def track() -> Iterator[QueryRecorder]:
+    # Record every statement on the instrumented engines while the block runs
+    recorder = QueryRecorder()
+    with _active_lock:
+        _active.append(recorder)
+    try:
+        yield recorder
+    finally:
+        with _active_lock:
+            _active.remove(recorder)
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+class query_budget(ContextDecorator):
+    # Fail (AssertionError) when the block or decorated function runs more than max_queries
+    # statements, or repeats one statement shape max_repeats times or more (N+1)
+    def __init__(self, max_queries: int, max_repeats: Optional[int] = None):
+        self.max_queries = max_queries
+        self.max_repeats = settings.query_repeat_threshold if max_repeats is None else max_repeats
+        self.recorder: Optional[QueryRecorder] = None
+
+    def __enter__(self) -> QueryRecorder:
+        self._tracking = track()
+        self.recorder = self._tracking.__enter__()
+        return self.recorder
+
+    def __exit__(self, *exc_info):
+        self._tracking.__exit__(*exc_info)
+        if exc_info[0] is not None:
+            return False
+        recorder = self.recorder
+        if recorder.count > self.max_queries:  # type: ignore
+            raise QueryBudgetExceeded(
+                f"{recorder.count} queries, budget {self.max_queries}:\n{recorder.report()}"  # type: ignore
+            )
+        repeated = recorder.repeated(self.max_repeats)  # type: ignore
+        if repeated:
+            query, count = repeated[0]
+            raise QueryBudgetExceeded(
+                f"N+1: {count} executions of one statement from {query.call_site}: {query.shape}\n{recorder.report()}"  # type: ignore
+            )
+        return False
+
+def warn_repeated(recorder: QueryRecorder, label: str) -> None:
+    # Dev mode: log each repeated statement shape of a request with the code that ran it
+    for query, count in recorder.repeated(settings.query_repeat_threshold):
+        logger.warning("Possible N+1 in %s: %d executions from %s: %s", label, count, query.call_site, query.shape)
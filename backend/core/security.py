@@ -1,17 +1,15 @@
 from datetime import datetime, timedelta, timezone
 from jose import JWTError, jwt # pyright: ignore[reportMissingModuleSource]
 from typing import Optional
-import bcrypt # type: ignore
 from .config import settings
 from fastapi.security import HTTPAuthorizationCredentials
 import models
-from sqlalchemy.orm import Session
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+from .cache import TTLCache
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return bcrypt.checkpw(plain_password.encode('utf-8')[:72], hashed_password.encode('utf-8'))
-
-def get_password_hash(password: str) -> str:
-    return bcrypt.hashpw(password.encode('utf-8')[:72], bcrypt.gensalt()).decode('utf-8')
+# Authenticated users by token subject (email), stored as column snapshots
+principal_cache = TTLCache(maxsize=settings.principal_cache_size, ttl=settings.principal_cache_ttl_seconds)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
@@ -31,4 +29,24 @@ def decode_token(credentials: HTTPAuthorizationCredentials, db: Session) -> Opti
     except JWTError:
         return None
 
-    return db.query(models.User).filter(models.User.email == email).first()
+    snapshot = principal_cache.get(email)
+    if snapshot is not None:
+        return _attach_user(db, snapshot)
+
+    user = db.query(models.User).filter(models.User.email == email).first()
+    if user is not None:
+        principal_cache.set(email, {attr.key: getattr(user, attr.key) for attr in inspect(models.User).column_attrs})
+    return user
+
+def invalidate_principal(*emails: Optional[str]) -> None:
+    # Must be called whenever a user row changes, with both the old and new email if it changed
+    for email in emails:
+        if email:
+            principal_cache.pop(email)
+
+def _attach_user(db: Session, snapshot: dict) -> models.User:
+    # Rebuild the user from the cached columns and attach it to this session without a SELECT,
+    # so routes can still modify and commit it like a freshly loaded instance
+    user = models.User(**snapshot)
+    make_transient_to_detached(user)
+    return db.merge(user, load=False)
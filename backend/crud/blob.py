@@ -0,0 +1,56 @@
+from collections import Counter
+from typing import List, Optional
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+import models
+
+# Reference counts of content-addressed uploads (services/uploads.py).
+# Every post image and avatar holds one reference; acquire/release run inside the
+# transaction of the write that adds or drops the reference, the caller commits.
+
+BLOB_URL_PREFIX = "/uploads/blobs/"
+
+def blob_key(url: Optional[str]) -> Optional[str]:
+    # "/uploads/blobs/ab/cd/<sha256>.png" -> "ab/cd/<sha256>.png"; None for any other URL
+    if not url or not url.startswith(BLOB_URL_PREFIX):
+        return None
+    return url[len(BLOB_URL_PREFIX):]
+
+def acquire(db: Session, url: Optional[str]):
+    # Add a reference to the blob behind url (no-op for non-blob URLs)
+    key = blob_key(url)
+    if key is None:
+        return
+    if _change_ref_count(db, key, 1):
+        return
+    try:
+        with db.begin_nested():
+            db.add(models.Blob(key=key, ref_count=1))
+    except IntegrityError:
+        # A concurrent first upload of the same content inserted the row
+        _change_ref_count(db, key, 1)
+
+def release(db: Session, *urls: Optional[str]) -> List[str]:
+    # Drop one reference per URL; returns the URLs of blobs nobody references any more,
+    # whose rows are deleted here and whose files the caller unlinks after commit
+    keys = Counter(key for key in map(blob_key, urls) if key is not None)
+    if not keys:
+        return []
+    for key, count in keys.items():
+        _change_ref_count(db, key, -count)
+    unreferenced = [row.key for row in db.query(models.Blob.key).filter(
+        models.Blob.key.in_(keys), models.Blob.ref_count <= 0
+    )]
+    if unreferenced:
+        db.query(models.Blob).filter(models.Blob.key.in_(unreferenced)).delete(synchronize_session=False)
+    return [BLOB_URL_PREFIX + key for key in unreferenced]
+
+def get_keys(db: Session, keys: List[str]) -> List[str]:
+    # The subset of keys that still have a row (used by the orphan sweep)
+    return [row.key for row in db.query(models.Blob.key).filter(models.Blob.key.in_(keys))]
+
+def _change_ref_count(db: Session, key: str, delta: int) -> int:
+    return db.query(models.Blob).filter(models.Blob.key == key).update(
+        {models.Blob.ref_count: models.Blob.ref_count + delta},
+        synchronize_session=False
+    )
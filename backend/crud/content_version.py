@@ -0,0 +1,52 @@
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+import models
+
+# Keys of the global content versions in app_state
+POSTS = "posts"  # any post, reply or like write
+USERS = "users"  # any change to what is shown about a user (username, avatar)
+TIMELINE = "timeline"  # top-level posts added or removed (services/timeline.py)
+VARIANTS = "variants"  # image variants finished, srcsets changed (services/image_variants.py)
+
+def _increment(db: Session, key: str, now: datetime) -> Optional[int]:
+    # The incremented version, as written by this transaction; None if the row is missing
+    return db.execute(
+        update(models.AppState).where(models.AppState.key == key)
+        .values(version=models.AppState.version + 1, updated_at=now)
+        .returning(models.AppState.version)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+
+def _insert_ignore(db: Session, key: str, now: datetime):
+    # INSERT of a version row that does nothing if the row exists (SQLite and PostgreSQL)
+    if db.get_bind().dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert
+    return insert(models.AppState).values(key=key, version=0, updated_at=now).on_conflict_do_nothing(index_elements=["key"])
+
+def bump_version(db: Session, *keys: str) -> Dict[str, int]:
+    # Increment the given versions; call inside the write's transaction, before commit.
+    # Returns {key: new version}: the version this write produced, which a concurrent
+    # writer cannot change (re-reading it after commit may see theirs).
+    now = datetime.now(timezone.utc)
+    versions = {}
+    for key in keys:
+        version = _increment(db, key, now)
+        if version is None:
+            # First write of this key: create the row, tolerating a concurrent first
+            # writer (a plain INSERT would fail one of them with an IntegrityError)
+            db.execute(_insert_ignore(db, key, now))
+            version = _increment(db, key, now)
+        versions[key] = version  # type: ignore
+    return versions
+
+def get_versions(db: Session, *keys: str) -> Dict[str, Tuple[int, Optional[datetime]]]:
+    # {key: (version, updated_at)} in one query; keys never written yet are (0, None)
+    rows = db.query(models.AppState).filter(models.AppState.key.in_(keys)).all()
+    versions: Dict[str, Tuple[int, Optional[datetime]]] = {key: (0, None) for key in keys}
+    for row in rows:
+        versions[row.key] = (row.version, row.updated_at)  # type: ignore
+    return versions
@@ -1,6 +1,10 @@
 from sqlalchemy.orm import Session
+from typing import Iterable, Optional, Set
 import models
+from database import retry_on_locked
+from crud import content_version
 
+@retry_on_locked
 def toggle_like(db: Session, user_id: int, post_id: int):
     # Toggle like for a post by a user
     db_like = db.query(models.Like).filter(
@@ -10,11 +14,34 @@ def toggle_like(db: Session, user_id: int, post_id: int):
 
     if db_like:
         db.delete(db_like)
+        _change_likes_count(db, post_id, -1)
+        content_version.bump_version(db, content_version.POSTS)
         db.commit()
         return False  # Like removed
     else:
         new_like = models.Like(user_id=user_id, post_id=post_id)
         db.add(new_like)
+        _change_likes_count(db, post_id, 1)
+        content_version.bump_version(db, content_version.POSTS)
         db.commit()
         db.refresh(new_like)
-        return True  # Like added
\ No newline at end of file
+        return True  # Like added
+
+def _change_likes_count(db: Session, post_id: int, delta: int):
+    # Atomic in-database increment, safe against concurrent toggles
+    db.query(models.Post).filter(models.Post.id == post_id).update(
+        {models.Post.likes_count: models.Post.likes_count + delta},
+        synchronize_session=False
+    )
+
+def get_liked_post_ids(db: Session, user_id: Optional[int], post_ids: Iterable[int]) -> Set[int]:
+    # Which of the given posts/replies the user has liked, in one query.
+    # Served by the (user_id, post_id) unique index of _user_post_like_uc.
+    post_ids = list(post_ids)
+    if user_id is None or not post_ids:
+        return set()
+    rows = db.query(models.Like.post_id).filter(
+        models.Like.user_id == user_id,
+        models.Like.post_id.in_(post_ids)
+    ).all()
+    return {row.post_id for row in rows}
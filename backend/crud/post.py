@@ -1,46 +1,188 @@
-from sqlalchemy.orm import Session, joinedload
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.orm import Session, aliased, joinedload, selectinload, subqueryload
 import models, schemas
+from core.config import settings
+from database import retry_on_locked
+from crud import blob as blob_crud
+from crud import content_version
+
+_LOADERS = {"selectin": selectinload, "joined": joinedload, "subquery": subqueryload}
+
+def _eager(*path):
+    # Eager-load a relationship path. Collections use the configured strategy
+    # (settings.loading_strategy); many-to-one links such as Post.owner are always joined,
+    # since a join to a single row does not multiply the result set.
+    option = None
+    for attr in path:
+        strategy = settings.loading_strategy if attr.property.uselist else "joined"
+        loader = _LOADERS[strategy] if option is None else getattr(option, f"{strategy}load")
+        option = loader(attr)
+    return option
 
 def get_post(db: Session, post_id: int):
     # Get a post by ID
     return db.query(models.Post).options(
-        joinedload(models.Post.owner),
-        joinedload(models.Post.likes),
-        joinedload(models.Post.replies).joinedload(models.Post.owner),
-        joinedload(models.Post.replies).joinedload(models.Post.likes)
+        _eager(models.Post.owner),
+        _eager(models.Post.replies, models.Post.owner)
     ).filter(models.Post.id == post_id).first()
 
-def get_posts(db: Session, skip: int = 0, limit: int = 100):
-    # Get list of posts with information about their owners and comments
-    return db.query(models.Post).options(
-        joinedload(models.Post.owner),
-        joinedload(models.Post.likes),
-        joinedload(models.Post.replies).joinedload(models.Post.owner),
-        joinedload(models.Post.replies).joinedload(models.Post.likes)
-    ).filter(models.Post.parent_id == None).order_by(models.Post.timestamp.desc()).offset(skip).limit(limit).all()
-
-def create_post(db: Session, post: schemas.PostCreate, owner_id: int, parent_id: int | None = None):
-    # Create a new post record
+def get_posts(db: Session, skip: int = 0, limit: int = 100, cursor: Optional[Tuple[datetime, int]] = None):
+    # Get list of top-level posts with their owners (replies are fetched with get_reply_previews).
+    # With a (timestamp, id) cursor the page starts right after that post (keyset pagination),
+    # which is served by ix_posts_parent_timestamp_id instead of scanning `skip` rows.
+    query = db.query(models.Post).options(
+        _eager(models.Post.owner)
+    ).filter(models.Post.parent_id == None).order_by(models.Post.timestamp.desc(), models.Post.id.desc())
+
+    if cursor is not None:
+        cursor_timestamp, cursor_id = cursor
+        query = query.filter(or_(
+            models.Post.timestamp < cursor_timestamp,
+            and_(models.Post.timestamp == cursor_timestamp, models.Post.id < cursor_id)
+        ))
+    else:
+        query = query.offset(skip)
+
+    return query.limit(limit).all()
+
+def get_top_level_post_ids(db: Session, limit: int) -> List[int]:
+    # Newest top-level post IDs in feed order, read from ix_posts_parent_timestamp_id alone
+    rows = db.query(models.Post.id).filter(models.Post.parent_id == None).order_by(
+        models.Post.timestamp.desc(), models.Post.id.desc()
+    ).limit(limit).all()
+    return [row.id for row in rows]
+
+def get_posts_by_ids(db: Session, post_ids: List[int]):
+    # Hydrate posts by primary key, returned in the order of post_ids
+    if not post_ids:
+        return []
+    posts = db.query(models.Post).options(_eager(models.Post.owner)).filter(models.Post.id.in_(post_ids)).all()
+    by_id = {post.id: post for post in posts}
+    return [by_id[post_id] for post_id in post_ids if post_id in by_id]
+
+def get_thread_version(db: Session, post_id: int) -> Tuple[Optional[datetime], int]:
+    # Newest updated_at and row count over a post and its replies (PK + parent_id index).
+    # Any edit, like or reply added/removed in the thread changes one of the two.
+    return db.query(func.max(models.Post.updated_at), func.count(models.Post.id)).filter(
+        or_(models.Post.id == post_id, models.Post.parent_id == post_id)
+    ).one()  # type: ignore
+
+def get_reply_previews(db: Session, post_ids: List[int], per_post: int) -> Dict[int, List[models.Post]]:
+    # Get the first `per_post` replies of each post in one query (ROW_NUMBER per thread)
+    if not post_ids or per_post <= 0:
+        return {}
+
+    ranked = select(
+        models.Post.id,
+        func.row_number().over(
+            partition_by=models.Post.parent_id,
+            order_by=(models.Post.timestamp, models.Post.id)
+        ).label("position")
+    ).where(models.Post.parent_id.in_(post_ids)).subquery()
+
+    replies = db.query(models.Post).options(_eager(models.Post.owner)).join(
+        ranked, ranked.c.id == models.Post.id
+    ).filter(ranked.c.position <= per_post).order_by(models.Post.timestamp, models.Post.id).all()
+
+    previews: Dict[int, List[models.Post]] = {}
+    for reply in replies:
+        previews.setdefault(reply.parent_id, []).append(reply)  # type: ignore
+    return previews
+
+def get_replies(db: Session, post_id: int, limit: int = 20, cursor: Optional[Tuple[datetime, int]] = None):
+    # Get a page of replies to a post, oldest first, starting after the (timestamp, id) cursor
+    query = db.query(models.Post).options(_eager(models.Post.owner)).filter(models.Post.parent_id == post_id)
+
+    if cursor is not None:
+        cursor_timestamp, cursor_id = cursor
+        query = query.filter(or_(
+            models.Post.timestamp > cursor_timestamp,
+            and_(models.Post.timestamp == cursor_timestamp, models.Post.id > cursor_id)
+        ))
+
+    return query.order_by(models.Post.timestamp, models.Post.id).limit(limit).all()
+
+@retry_on_locked
+def create_post(db: Session, post: schemas.PostCreate, owner_id: int, parent_id: int | None = None) -> Tuple[models.Post, Optional[int]]:
+    # Create a new post record; returns it and, for a top-level post, the timeline version
+    # its transaction produced (for services/timeline.py)
     db_post = models.Post(**post.model_dump(), owner_id=owner_id, parent_id=parent_id)
     db.add(db_post)
+    blob_crud.acquire(db, post.image_url)
+    timeline_version = None
+    if parent_id is not None:
+        _change_replies_count(db, parent_id, 1)
+        content_version.bump_version(db, content_version.POSTS)
+    else:
+        versions = content_version.bump_version(db, content_version.POSTS, content_version.TIMELINE)
+        timeline_version = versions[content_version.TIMELINE]
     db.commit()
     db.refresh(db_post)
-    return db_post
+    return db_post, timeline_version
 
+@retry_on_locked
 def update_post(db: Session, post_id: int, text: str):
     # Update the text of an existing post
     db_post = db.query(models.Post).filter(models.Post.id == post_id).first()
     if db_post:
         # here is pylance false positive, because db_post.text is definitely a string
         db_post.text = text  # type: ignore FIX THAT!!!
+        content_version.bump_version(db, content_version.POSTS)
         db.commit()
         db.refresh(db_post)
     return db_post
 
-def delete_post(db: Session, post_id: int):
-    # Delete a post by ID
+@retry_on_locked
+def delete_post(db: Session, post_id: int) -> Tuple[List[str], Optional[int]]:
+    # Delete a post by ID together with its replies (ORM cascade).
+    # Returns the image URLs that are no longer referenced, to be unlinked after commit,
+    # and for a top-level post the timeline version its transaction produced.
     db_post = db.query(models.Post).filter(models.Post.id == post_id).first()
+    released: List[str] = []
+    timeline_version = None
     if db_post:
+        released = blob_crud.release(db, *_thread_image_urls(db_post))
+        if db_post.parent_id is not None:
+            _change_replies_count(db, db_post.parent_id, -1)  # type: ignore
+            content_version.bump_version(db, content_version.POSTS)
+        else:
+            versions = content_version.bump_version(db, content_version.POSTS, content_version.TIMELINE)
+            timeline_version = versions[content_version.TIMELINE]
         db.delete(db_post)
         db.commit()
-    return
+    return released, timeline_version
+
+def _thread_image_urls(db_post: models.Post) -> List[str]:
+    # Image URLs of a post and all replies below it (the same rows the cascade deletes)
+    urls = [db_post.image_url] if db_post.image_url else []
+    for reply in db_post.replies:
+        urls.extend(_thread_image_urls(reply))
+    return urls  # type: ignore
+
+def _change_replies_count(db: Session, post_id: int, delta: int):
+    # Atomic in-database increment, safe against concurrent replies
+    db.query(models.Post).filter(models.Post.id == post_id).update(
+        {models.Post.replies_count: models.Post.replies_count + delta},
+        synchronize_session=False
+    )
+
+@retry_on_locked
+def recount_post_counters(db: Session, post_ids: Optional[List[int]] = None, id_range: Optional[Tuple[int, int]] = None) -> int:
+    # Recompute likes_count/replies_count from the likes and posts tables (repair job,
+    # and the deferred counter pass of services/bulk_import.py over an inclusive id range)
+    reply = aliased(models.Post)
+    likes_count = select(func.count(models.Like.id)).where(models.Like.post_id == models.Post.id).scalar_subquery()
+    replies_count = select(func.count(reply.id)).where(reply.parent_id == models.Post.id).scalar_subquery()
+
+    stmt = update(models.Post).values(likes_count=likes_count, replies_count=replies_count)
+    if post_ids is not None:
+        stmt = stmt.where(models.Post.id.in_(post_ids))
+    if id_range is not None:
+        stmt = stmt.where(models.Post.id.between(*id_range))
+
+    result = db.execute(stmt.execution_options(synchronize_session=False))
+    content_version.bump_version(db, content_version.POSTS)
+    db.commit()
+    return result.rowcount  # type: ignore
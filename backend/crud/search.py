@@ -0,0 +1,55 @@
+import re
+from typing import List, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+# Ranked full-text search over posts and replies (index DDL in models.create_search_index).
+# Results are ordered by (rank, id) ascending, lower rank = better match: FTS5's bm25
+# already works that way, for PostgreSQL ts_rank_cd is negated.
+
+_SQLITE_SEARCH = """
+    SELECT rowid AS id, rank FROM posts_fts
+    WHERE posts_fts MATCH :match {after}
+    ORDER BY rank, rowid LIMIT :limit
+"""
+
+_POSTGRES_SEARCH = """
+    SELECT id, rank FROM (
+        SELECT posts.id, -ts_rank_cd(posts.search_vector, query)::float8 AS rank
+        FROM posts, websearch_to_tsquery('simple', :query) AS query
+        WHERE posts.search_vector @@ query
+    ) AS ranked
+    WHERE true {after}
+    ORDER BY rank, id LIMIT :limit
+"""
+
+def to_fts5_query(query: str) -> Optional[str]:
+    # Every word becomes a quoted phrase (all must match), so FTS5 operators and quotes in
+    # user input are plain text instead of syntax errors
+    words = re.findall(r"\w+", query)
+    if not words:
+        return None
+    return " ".join(f'"{word}"' for word in words)
+
+def search_post_ids(db: Session, query: str, limit: int, after: Optional[Tuple[float, int]] = None) -> List[Tuple[int, float]]:
+    # [(post_id, rank)] of the best matches after the (rank, id) keyset cursor
+    params = {"limit": limit}
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        match = to_fts5_query(query)
+        if match is None:
+            return []
+        sql, params["match"] = _SQLITE_SEARCH, match
+        id_column = "rowid"
+    elif dialect == "postgresql":
+        sql, params["query"] = _POSTGRES_SEARCH, query
+        id_column = "id"
+    else:
+        raise NotImplementedError(f"Full-text search is not available on {dialect}")
+
+    after_clause = ""
+    if after is not None:
+        after_clause = f"AND (rank > :rank OR (rank = :rank AND {id_column} > :after_id))"
+        params["rank"], params["after_id"] = after
+    rows = db.execute(text(sql.format(after=after_clause)), params).all()
+    return [(row.id, row.rank) for row in rows]
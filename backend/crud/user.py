@@ -1,7 +1,11 @@
-from sqlalchemy.orm import Session
-from typing import TYPE_CHECKING, Optional
+from sqlalchemy import select
+from sqlalchemy.orm import Session, joinedload
+from typing import TYPE_CHECKING, Iterator, Optional, Sequence
 import schemas
-from core.security import verify_password, get_password_hash
+from crud import like as like_crud
+from core import passwords
+from core.security import invalidate_principal
+from database import DbSession, retry_on_locked, run_db
 
 if TYPE_CHECKING:
     import models
@@ -24,114 +28,142 @@ def get_users(db: Session, skip: int = 0, limit: int = 100):
     # Get list of users with pagination
     return db.query(models.User).offset(skip).limit(limit).all()
 
-def create_user(db: Session, user: schemas.UserCreate):
-    # Create a new user record
-    hashed_password = get_password_hash(user.password)  # type: ignore
-    db_user = models.User(username=user.username, email=user.email, avatar_url=user.avatar_url, hashed_password=hashed_password)
+async def create_user(db: DbSession, user: schemas.UserCreate):
+    # Create a new user record (bcrypt runs in the password hashing pool)
+    hashed_password = await passwords.hash_password(user.password)
+    return await run_db(db, _insert_user, user, hashed_password)
+
+@retry_on_locked
+def _insert_user(db: Session, user: schemas.UserCreate, hashed_password: str):
+    db_user = models.User(username=user.username, email=user.email, hashed_password=hashed_password)
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
     return db_user
 
-def authenticate_user(db: Session, email: str, password: str):
+async def authenticate_user(db: DbSession, email: str, password: str):
     # Authenticate user by email and password
-    user = get_user_by_email(db, email)
+    user = await run_db(db, get_user_by_email, email)
     if user is None:
         return False
-    if not verify_password(password, user.hashed_password):  # type: ignore
+    if not await passwords.verify_password(password, user.hashed_password):  # type: ignore
         return False
+    if passwords.needs_rehash(user.hashed_password):  # type: ignore
+        # Cost factor changed since this hash was made: upgrade it transparently
+        await run_db(db, _save_password_hash, user, await passwords.hash_password(password))
     return user
 
+@retry_on_locked
+def _save_password_hash(db: Session, user: models.User, hashed_password: str):
+    user.hashed_password = hashed_password  # type: ignore
+    db.commit()
+    invalidate_principal(user.email)  # type: ignore
+    db.refresh(user)
+
 def get_user_posts(db: Session, user_id: int, current_user: Optional[models.User] = None):
-    # Get posts created by a specific user
-    posts = db.query(models.Post).filter(
+    # Get posts created by a specific user.
+    # Set-based: one query for the posts, one for all their replies (with owners joined)
+    # and one for the viewer's likes, no matter how many posts the user has.
+    posts = db.query(models.Post).options(joinedload(models.Post.owner)).filter(
         models.Post.owner_id == user_id,
         models.Post.parent_id == None
     ).order_by(models.Post.timestamp.desc()).all()
 
+    post_ids = [post.id for post in posts]
+    replies = []
+    if post_ids:
+        replies = db.query(models.Post).options(joinedload(models.Post.owner)).filter(
+            models.Post.parent_id.in_(post_ids)
+        ).order_by(models.Post.timestamp).all()
+
+    replies_by_post = {}
+    for reply in replies:
+        replies_by_post.setdefault(reply.parent_id, []).append(reply)
+
+    liked_ids = like_crud.get_liked_post_ids(db, getattr(current_user, 'id', None), post_ids + [reply.id for reply in replies])
+
     posts_data = []
     for post in posts:
-        is_liked = False
-        if current_user:
-            is_liked = db.query(models.Like).filter(
-                models.Like.post_id == post.id,
-                models.Like.user_id == current_user.id
-            ).first() is not None
-        
-        replies = db.query(models.Post).filter(models.Post.parent_id == post.id).all()
         replies_data = []
-        for reply in replies:
-            reply_is_liked = False
-            if current_user:
-                reply_is_liked = db.query(models.Like).filter(
-                    models.Like.post_id == reply.id,
-                    models.Like.user_id == current_user.id
-                ).first() is not None
-            
+        for reply in replies_by_post.get(post.id, []):
             replies_data.append({
                 "id": reply.id,
                 "text": reply.text,
+                "image_url": reply.image_url,
                 "timestamp": reply.timestamp,
-                "owner": {
-                    "id": reply.owner.id,
-                    "username": reply.owner.username,
-                    "email": reply.owner.email,
-                    "avatar_url": reply.owner.avatar_url
-                },
-                "likes_count": db.query(models.Like).filter(models.Like.post_id == reply.id).count(),
-                "is_liked": reply_is_liked
+                "owner": _owner_data(reply.owner),
+                "likes_count": reply.likes_count,
+                "is_liked_by_user": reply.id in liked_ids
             })
 
-
         posts_data.append({
             "id": post.id,
             "text": post.text,
+            "image_url": post.image_url,
             "timestamp": post.timestamp,
-            "owner": {
-                "id": post.owner.id,
-                "username": post.owner.username,
-                "email": post.owner.email,
-                "avatar_url": post.owner.avatar_url
-            },
-            "likes_count": db.query(models.Like).filter(models.Like.post_id == post.id).count(),
+            "owner": _owner_data(post.owner),
+            "likes_count": post.likes_count,
+            "replies_count": post.replies_count,
             "replies": replies_data,
-            "is_liked_by_user": is_liked,
+            "is_liked_by_user": post.id in liked_ids,
         })
     return posts_data
 
 def get_user_replies(db: Session, user_id: int, current_user: Optional[models.User] = None):
     """Отримати коментарі користувача з is_liked_by_user"""
-    comments = db.query(models.Post).filter(
+    comments = db.query(models.Post).options(joinedload(models.Post.owner)).filter(
         models.Post.owner_id == user_id,
         models.Post.parent_id != None
     ).all()
-    
+
+    liked_ids = like_crud.get_liked_post_ids(db, getattr(current_user, 'id', None), [comment.id for comment in comments])
+
     comments_data = []
     for comment in comments:
-        is_liked = False
-        if current_user:
-            is_liked = db.query(models.Like).filter(
-                models.Like.post_id == comment.id,
-                models.Like.user_id == current_user.id
-            ).first() is not None
-        
         comments_data.append({
             "id": comment.id,
             "text": comment.text,
+            "image_url": comment.image_url,
             "timestamp": comment.timestamp,
-            "owner": {
-                "id": comment.owner.id,
-                "username": comment.owner.username,
-                "email": comment.owner.email,
-                "avatar_url": comment.owner.avatar_url
-            },
+            "owner": _owner_data(comment.owner),
             "parent_id": comment.parent_id,
-            "likes_count": db.query(models.Like).filter(models.Like.post_id == comment.id).count(),
-            "is_liked_by_user": is_liked  
+            "likes_count": comment.likes_count,
+            "is_liked_by_user": comment.id in liked_ids
         })
     
     return comments_data
 
+def iter_user_posts(db: Session, user_id: int, after_id: int = 0, batch_size: int = 500) -> Iterator[Sequence]:
+    # Posts and replies of a user by ascending id, batch_size rows at a time.
+    # Plain rows (no ORM objects, no identity map) fetched with yield_per, which uses a
+    # server-side cursor on PostgreSQL, so memory does not grow with the account.
+    statement = select(
+        models.Post.id, models.Post.parent_id, models.Post.text, models.Post.image_url,
+        models.Post.timestamp, models.Post.likes_count, models.Post.replies_count,
+    ).where(
+        models.Post.owner_id == user_id,
+        models.Post.id > after_id,
+    ).order_by(models.Post.id).execution_options(yield_per=batch_size)
+    return db.execute(statement).partitions()
+
+def iter_user_likes(db: Session, user_id: int, after_id: int = 0, batch_size: int = 500) -> Iterator[Sequence]:
+    # Likes given by a user by ascending id, batched like iter_user_posts
+    statement = select(
+        models.Like.id, models.Like.post_id, models.Like.timestamp,
+    ).where(
+        models.Like.user_id == user_id,
+        models.Like.id > after_id,
+    ).order_by(models.Like.id).execution_options(yield_per=batch_size)
+    return db.execute(statement).partitions()
+
+def _owner_data(owner: models.User) -> dict:
+    return {
+        "id": owner.id,
+        "username": owner.username,
+        "email": owner.email,
+        "avatar_url": owner.avatar_url
+    }
+
 def check_is_username_taken(db: Session, username: str) -> bool:
     # Check if a username is already taken
     user = get_user_by_name(db, username)
@@ -1,5 +1,14 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+import asyncio
+import functools
+import random
+import time
+from typing import Union
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from starlette.concurrency import run_in_threadpool
+from core import profiler
 from core.config import settings
 
 SQLALCHEMY_DATABASE_URL = settings.database_url
@@ -10,6 +19,83 @@ connect_args = {"check_same_thread": False} if SQLALCHEMY_DATABASE_URL.startswit
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL, connect_args=connect_args
 )
+
+def apply_sqlite_pragmas(target_engine):
+    # Production SQLite profile: WAL lets readers run alongside the single writer,
+    # busy_timeout makes writers wait for the lock instead of failing immediately
+    @event.listens_for(target_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA journal_mode={settings.sqlite_journal_mode}")
+        cursor.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+        cursor.execute(f"PRAGMA cache_size={-int(settings.sqlite_cache_size_kib)}")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}")
+        cursor.close()
+
+if SQLALCHEMY_DATABASE_URL.startswith("sqlite"):
+    apply_sqlite_pragmas(engine)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
+
+# Either flavour of session a request can get from dependencies.get_db
+DbSession = Union[Session, AsyncSession]
+
+def to_async_url(url: str) -> str:
+    # sqlite:///x.db -> sqlite+aiosqlite:///x.db, postgresql://... -> postgresql+asyncpg://...
+    if url.startswith("sqlite:"):
+        return url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+    if url.startswith("postgres://"):
+        return url.replace("postgres://", "postgresql+asyncpg://", 1)
+    if url.startswith("postgresql://") or url.startswith("postgresql+psycopg2://"):
+        return "postgresql+asyncpg://" + url.split("://", 1)[1]
+    return url
+
+# Async mode (DATABASE_ASYNC=true): requests get an AsyncSession on an asyncpg/aiosqlite engine
+async_engine = None
+AsyncSessionLocal = None
+if settings.database_async:
+    async_engine = create_async_engine(to_async_url(SQLALCHEMY_DATABASE_URL))
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    if SQLALCHEMY_DATABASE_URL.startswith("sqlite"):
+        apply_sqlite_pragmas(async_engine.sync_engine)
+
+async def run_db(db: DbSession, fn, *args, **kwargs):
+    # Run sync crud/service code, fn(session, *args, **kwargs), against either session flavour.
+    # An AsyncSession runs it via run_sync, so the driver I/O is awaited on the event loop;
+    # a plain Session runs it in the threadpool, exactly like a sync endpoint would.
+    # fn must return fully loaded data: lazy loads outside of it fail in async mode.
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args, **kwargs)
+    return await run_in_threadpool(profiler.in_worker(fn), db, *args, **kwargs)
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+def retry_on_locked(fn):
+    # Retry a crud write, fn(db, ...), when SQLite reports "database is locked".
+    # A deferred transaction that read before writing can get SQLITE_BUSY without waiting
+    # on busy_timeout, so the whole unit is rolled back and re-run with a short backoff.
+    # In async mode fn runs on the event loop thread (run_db -> run_sync), where sleeping
+    # would stall every request of the worker: there it is re-run at once, and the retried
+    # statements wait on busy_timeout in the driver's thread instead.
+    @functools.wraps(fn)
+    def wrapper(db, *args, **kwargs):
+        attempt = 0
+        while True:
+            try:
+                return fn(db, *args, **kwargs)
+            except OperationalError as e:
+                if "database is locked" not in str(e) or attempt >= settings.db_write_retries:
+                    raise
+                db.rollback()
+                if not _on_event_loop():
+                    time.sleep(0.01 * (2 ** attempt) + random.uniform(0, 0.01))
+                attempt += 1
+    return wrapper
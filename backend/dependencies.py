@@ -1,11 +1,12 @@
 from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from sqlalchemy.orm import Session
+from core.config import settings
 from core.security import decode_token
+from database import DbSession, run_db
 import models
 
-def get_db():
+def get_sync_db():
     from database import SessionLocal
     db = SessionLocal()
     try:
@@ -13,16 +14,24 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    from database import AsyncSessionLocal
+    async with AsyncSessionLocal() as db:  # type: ignore
+        yield db
+
+# Routes depend on get_db; DATABASE_ASYNC selects which session flavour it yields
+get_db = get_async_db if settings.database_async else get_sync_db
+
 # HTTPBearer з auto_error=False дозволяє None (опціональна авторизація)
 security_optional = HTTPBearer(auto_error=False)
 # HTTPBearer з auto_error=True викидає помилку якщо немає токену (обов'язкова авторизація)
 security_required = HTTPBearer(auto_error=True)
 
-def get_current_user(
+async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security_required),
-    db: Session = Depends(get_db)
+    db: DbSession = Depends(get_db)
 ) -> models.User:
-    user = decode_token(credentials, db)
+    user = await run_db(db, lambda session: decode_token(credentials, session))
     
     if user is None:
         raise HTTPException(
@@ -33,14 +42,14 @@ def get_current_user(
     
     return user
 
-def get_current_user_optional(
+async def get_current_user_optional(
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security_optional),
-    db: Session = Depends(get_db)
+    db: DbSession = Depends(get_db)
 ) -> Optional[models.User]:
     if credentials is None:
         return None
     
-    return decode_token(credentials, db)
+    return await run_db(db, lambda session: decode_token(credentials, session))
 
 # Alias for get_current_user
-get_current_active_user = get_current_user
\ No newline at end of file
+get_current_active_user = get_current_user
@@ -0,0 +1,35 @@
+# Bulk import of users, posts, replies and likes from an NDJSON file (format described
+# in services/bulk_import.py), batched executemany inserts with counters recomputed once.
+# Usage (from backend/): python -m jobs.bulk_import data.ndjson [--batch-size 5000]
+#                        python -m jobs.bulk_import - < data.ndjson
+import argparse
+import json
+import sys
+
+from core import passwords
+from core.config import settings
+from database import SessionLocal
+from services import bulk_import
+
+def _progress(stats: bulk_import.ImportStats):
+    print(f"{stats.rows} rows, {stats.rows_per_second:.0f} rows/s", file=sys.stderr)
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import NDJSON content")
+    parser.add_argument("path", help="NDJSON file, - for stdin")
+    parser.add_argument("--batch-size", type=int, default=settings.bulk_import_batch_size)
+    parser.add_argument("--quiet", action="store_true", help="no progress output")
+    args = parser.parse_args()
+
+    source = sys.stdin.buffer if args.path == "-" else open(args.path, "rb")
+    db = SessionLocal()
+    try:
+        stats = bulk_import.import_lines(db, source, args.batch_size, progress=None if args.quiet else _progress)
+        print(json.dumps(stats.as_dict(), indent=2))
+    finally:
+        db.close()
+        source.close()
+        passwords.shutdown_executor()
+
+if __name__ == "__main__":
+    main()
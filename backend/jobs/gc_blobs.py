@@ -0,0 +1,50 @@
+# Sweep job for uploads/blobs: removes files that no post or user references, i.e. that
+# have no row in the blobs table (uploads whose request failed, or deletes that fell
+# inside the grace period), and stale .incoming temp files.
+# Usage (from backend/): python -m jobs.gc_blobs [--dry-run]
+import argparse
+import time
+
+from core.config import settings
+from crud import blob as blob_crud
+from database import SessionLocal
+from services import image_variants
+from services.uploads import BLOB_ROOT
+
+BATCH_SIZE = 500
+
+def sweep(db, dry_run: bool = False) -> int:
+    cutoff = time.time() - max(settings.blob_delete_grace_seconds, 3600)
+    candidates = {
+        path.relative_to(BLOB_ROOT).as_posix(): path
+        for path in BLOB_ROOT.glob("*/*/*") if path.is_file() and path.stat().st_mtime < cutoff
+    }
+    keys = list(candidates)
+    referenced = set()
+    for start in range(0, len(keys), BATCH_SIZE):
+        referenced.update(blob_crud.get_keys(db, keys[start:start + BATCH_SIZE]))
+
+    orphans = [key for key in keys if key not in referenced]
+    if not dry_run:
+        for key in orphans:
+            candidates[key].unlink(missing_ok=True)
+            image_variants.remove_variants(blob_crud.BLOB_URL_PREFIX + key)
+        for temp in (BLOB_ROOT / ".incoming").glob("*.part"):
+            if temp.stat().st_mtime < cutoff:
+                temp.unlink(missing_ok=True)
+    return len(orphans)
+
+def main():
+    parser = argparse.ArgumentParser(description="Remove unreferenced upload blobs")
+    parser.add_argument("--dry-run", action="store_true", help="only count the orphans")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        removed = sweep(db, dry_run=args.dry_run)
+        print(f"{'Found' if args.dry_run else 'Removed'} {removed} unreferenced blobs")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
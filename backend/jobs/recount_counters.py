@@ -0,0 +1,15 @@
+# Repair job for the denormalized Post.likes_count / Post.replies_count columns.
+# Usage (from backend/): python -m jobs.recount_counters
+from database import SessionLocal
+from crud import post as post_crud
+
+def main():
+    db = SessionLocal()
+    try:
+        updated = post_crud.recount_post_counters(db)
+        print(f"Recounted counters for {updated} posts")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
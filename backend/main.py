@@ -1,63 +1,131 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
+import anyio
 import json
+import logging
 import os
+import time
 
-from routers import likes, posts, users
+from routers import admin, likes, posts, uploads, users
 from core.config import settings
+from core.middleware import BodySizeLimitMiddleware, MetricsMiddleware, ProfilingMiddleware, QueryTrackerMiddleware
+from core import metrics, passwords, profiler, query_tracker
 from routers import auth
 
-import models
-from database import engine
+import database
+from migrations import runner as migrations
+from services import image_variants
+from services.uploads import prepare_upload_dirs
 
-models.Base.metadata.create_all(bind=engine)
+logger = logging.getLogger(__name__)
 
-app = FastAPI(
-    title=settings.api_title,
-    version=settings.api_version
-)
+# Importing this module only builds the app: no database access, no files, no output.
+# Everything that touches the outside world runs in the lifespan hook below, once per worker.
+
+def _parse_cors_origins(cors_origins_env: str) -> list:
+    # Support both JSON array and comma-separated string
+    try:
+        # Try parsing as JSON array first
+        cors_origins = json.loads(cors_origins_env)
+        if not isinstance(cors_origins, list):
+            cors_origins = [cors_origins_env]
+    except (json.JSONDecodeError, TypeError):
+        # If not JSON, try comma-separated or single value
+        if "," in cors_origins_env:
+            cors_origins = [origin.strip() for origin in cors_origins_env.split(",")]
+        else:
+            cors_origins = [cors_origins_env]
 
-# Parse CORS origins - support both JSON array and comma-separated string
-cors_origins_env = os.getenv("CORS_ORIGINS", settings.cors_origins)
+    # Strip trailing slashes from all origins (CORS is strict about exact matches)
+    cors_origins = [origin.rstrip('/') for origin in cors_origins]
 
-try:
-    # Try parsing as JSON array first
-    cors_origins = json.loads(cors_origins_env)
-    if not isinstance(cors_origins, list):
-        cors_origins = [cors_origins_env]
-except (json.JSONDecodeError, TypeError):
-    # If not JSON, try comma-separated or single value
-    if "," in cors_origins_env:
-        cors_origins = [origin.strip() for origin in cors_origins_env.split(",")]
-    else:
-        cors_origins = [cors_origins_env]
+    # Always include localhost for development
+    if "http://localhost:5173" not in cors_origins:
+        cors_origins.extend(["http://localhost:5173", "http://127.0.0.1:5173"])
+    return cors_origins
 
-# Strip trailing slashes from all origins (CORS is strict about exact matches)
-cors_origins = [origin.rstrip('/') for origin in cors_origins]
+cors_origins = _parse_cors_origins(os.getenv("CORS_ORIGINS", settings.cors_origins))
 
-# Always include localhost for development
-if "http://localhost:5173" not in cors_origins:
-    cors_origins.extend(["http://localhost:5173", "http://127.0.0.1:5173"])
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    started = time.perf_counter()
+    engines = [database.engine] + ([database.async_engine.sync_engine] if database.async_engine is not None else [])
+    for engine in engines:
+        metrics.instrument_engine(engine)
+        if settings.query_tracker:
+            query_tracker.instrument_engine(engine)
+        if settings.profiling_token:
+            profiler.instrument_engine(engine)
+    await anyio.to_thread.run_sync(migrations.upgrade, database.engine)
+    await anyio.to_thread.run_sync(prepare_upload_dirs)
+    app.state.ready = True
+    logger.info("Ready in %.2fs, CORS allowed origins: %s", time.perf_counter() - started, cors_origins)
+    yield
+    app.state.ready = False
+    passwords.shutdown_executor()
+    image_variants.shutdown_executor()
+    metrics.worker_exited()
+    database.engine.dispose()
+    if database.async_engine is not None:
+        await database.async_engine.dispose()
 
-print(f"🌍 CORS allowed origins: {cors_origins}")  # Debug log
+app = FastAPI(
+    title=settings.api_title,
+    version=settings.api_version,
+    lifespan=lifespan,
+)
+app.state.ready = False
 
+# Added before CORS so that CORS wraps it: a 413 must carry the CORS headers too, or the
+# browser reports an opaque network error instead of "file too large"
+app.add_middleware(
+    BodySizeLimitMiddleware,
+    max_body_bytes=settings.request_max_body_bytes,
+    path_limits={"/admin/import": settings.bulk_import_max_body_bytes},
+)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=cors_origins,
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Profile-Id"],
 )
+if settings.query_tracker:
+    app.add_middleware(QueryTrackerMiddleware)
+if settings.profiling_token:
+    app.add_middleware(ProfilingMiddleware, token=settings.profiling_token, interval_ms=settings.profiling_interval_ms)
+# Outermost, so requests rejected by the middlewares above are counted too
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(users.router)
 app.include_router(auth.router)
 app.include_router(likes.router)
 app.include_router(posts.router)
-
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+app.include_router(uploads.router)
+app.include_router(admin.router)
 
 # Start page
 @app.get("/")
 def read_root():
-    return {"message": "Welcome to the FastAPI CRUD application!"}
\ No newline at end of file
+    return {"message": "Welcome to the FastAPI CRUD application!"}
+
+# Liveness: the process serves requests
+@app.get("/health/live", include_in_schema=False)
+def health_live():
+    return {"status": "ok"}
+
+# Readiness: startup (migrations, upload directories) has finished; 503 until then
+@app.get("/health/ready", include_in_schema=False)
+def health_ready(response: Response):
+    if not app.state.ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+        return {"status": "starting"}
+    return {"status": "ready"}
+
+# Prometheus metrics of all workers (see core/metrics.py)
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
@@ -0,0 +1,7 @@
+# Baseline: create every table of the current models that does not exist yet.
+# On databases made by the old create_all at startup this only adds the new tables
+# (app_state, blobs); the columns those databases miss are added by 0002.
+import models
+
+def upgrade(connection):
+    models.Base.metadata.create_all(connection)
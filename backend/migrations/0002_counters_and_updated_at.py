@@ -0,0 +1,27 @@
+# Denormalized counters and updated_at columns for databases created before them,
+# with the counters filled in from the likes and posts tables.
+from sqlalchemy import inspect
+
+_COLUMNS = {
+    "posts": [
+        ("likes_count", "INTEGER NOT NULL DEFAULT 0"),
+        ("replies_count", "INTEGER NOT NULL DEFAULT 0"),
+        ("updated_at", "TIMESTAMP"),
+    ],
+    "users": [("updated_at", "TIMESTAMP")],
+}
+
+def upgrade(connection):
+    added = False
+    for table, columns in _COLUMNS.items():
+        existing = {column["name"] for column in inspect(connection).get_columns(table)}
+        for name, ddl in columns:
+            if name not in existing:
+                connection.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}")
+                added = True
+    if added:
+        connection.exec_driver_sql(
+            "UPDATE posts SET "
+            "likes_count = (SELECT count(*) FROM likes WHERE likes.post_id = posts.id), "
+            "replies_count = (SELECT count(*) FROM posts AS replies WHERE replies.parent_id = posts.id)"
+        )
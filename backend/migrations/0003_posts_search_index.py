@@ -0,0 +1,6 @@
+# Full-text search index (FTS5 table + triggers on SQLite, tsvector + GIN on PostgreSQL),
+# backfilled from existing posts.
+import models
+
+def upgrade(connection):
+    models.create_search_index(connection)
@@ -0,0 +1,21 @@
+# Composite indexes for the queries crud/ actually runs, and the btree on posts.text
+# dropped (it cannot serve word or substring search, posts_fts does; it only slowed writes).
+#
+#   ix_posts_parent_timestamp_id     feed, reply previews, reply pages, timeline rebuild
+#   ix_posts_owner_parent_timestamp  profile posts and replies (owner_id = ? AND parent_id ...)
+#   ix_likes_post_id                 likes of a post, counter recount, cascade deletes
+#
+# On PostgreSQL the indexes are built CONCURRENTLY, so writes continue during the build.
+transactional = False
+
+_INDEXES = [
+    ("ix_posts_parent_timestamp_id", "posts", "parent_id, timestamp, id"),
+    ("ix_posts_owner_parent_timestamp", "posts", "owner_id, parent_id, timestamp"),
+    ("ix_likes_post_id", "likes", "post_id"),
+]
+
+def upgrade(connection):
+    concurrently = "CONCURRENTLY " if connection.dialect.name == "postgresql" else ""
+    for name, table, columns in _INDEXES:
+        connection.exec_driver_sql(f"CREATE INDEX {concurrently}IF NOT EXISTS {name} ON {table} ({columns})")
+    connection.exec_driver_sql(f"DROP INDEX {concurrently}IF EXISTS ix_posts_text")
@@ -0,0 +1,106 @@
+"""Versioned schema migrations.
+
+Each migration is a module migrations/NNNN_<name>.py with
+
+    def upgrade(connection): ...       # required
+    transactional = True               # optional; False for PostgreSQL CREATE INDEX
+                                       # CONCURRENTLY and other statements that must
+                                       # run outside a transaction (autocommit)
+
+Applied versions are recorded in schema_migrations. A transactional migration inserts
+its version row first, in the same transaction as its DDL: a second worker upgrading
+at the same moment blocks on that row and then skips the migration instead of running
+it twice. Non-transactional migrations run under a PostgreSQL advisory lock.
+
+Migrations must be idempotent (IF NOT EXISTS, inspector checks): the baseline creates
+missing tables from the current models, so a fresh database may already have what a
+later migration adds.
+
+Usage (from backend/):
+    python -m migrations.runner            # apply pending migrations
+    python -m migrations.runner --status   # list applied and pending versions
+"""
+import argparse
+import importlib
+import logging
+from pathlib import Path
+from typing import List, Set
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table, func, insert, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = Path(__file__).parent
+_ADVISORY_LOCK_ID = 4_725_001  # arbitrary, shared by all workers of this app
+
+_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations", _metadata,
+    Column("version", String, primary_key=True),
+    Column("applied_at", DateTime, server_default=func.now()),
+)
+
+def available_versions() -> List[str]:
+    return sorted(path.stem for path in MIGRATIONS_DIR.glob("[0-9][0-9][0-9][0-9]_*.py"))
+
+def applied_versions(engine: Engine) -> Set[str]:
+    _metadata.create_all(engine)
+    with engine.connect() as connection:
+        return set(connection.execute(select(schema_migrations.c.version)).scalars())
+
+def _apply(engine: Engine, version: str) -> bool:
+    module = importlib.import_module(f"migrations.{version}")
+    if getattr(module, "transactional", True):
+        try:
+            with engine.begin() as connection:
+                connection.execute(insert(schema_migrations).values(version=version))
+                module.upgrade(connection)
+        except IntegrityError:
+            return False  # applied by another worker in the meantime
+        return True
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        postgres = connection.dialect.name == "postgresql"
+        if postgres:
+            connection.exec_driver_sql(f"SELECT pg_advisory_lock({_ADVISORY_LOCK_ID})")
+        try:
+            if connection.execute(select(schema_migrations.c.version).where(schema_migrations.c.version == version)).first():
+                return False
+            module.upgrade(connection)
+            connection.execute(insert(schema_migrations).values(version=version))
+            return True
+        finally:
+            if postgres:
+                connection.exec_driver_sql(f"SELECT pg_advisory_unlock({_ADVISORY_LOCK_ID})")
+
+def upgrade(engine: Engine) -> List[str]:
+    # Apply every pending migration in order; returns the versions applied by this call
+    applied = applied_versions(engine)
+    done = []
+    for version in available_versions():
+        if version in applied:
+            continue
+        if _apply(engine, version):
+            logger.info("Applied migration %s", version)
+            done.append(version)
+    return done
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply database migrations")
+    parser.add_argument("--status", action="store_true", help="only list applied and pending versions")
+    args = parser.parse_args()
+
+    from database import engine
+
+    if args.status:
+        applied = applied_versions(engine)
+        for version in available_versions():
+            print(f"{'applied' if version in applied else 'pending'}  {version}")
+        return
+    done = upgrade(engine)
+    print(f"Applied {len(done)} migrations" + (f": {', '.join(done)}" if done else ""))
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,11 @@
 from datetime import datetime, timezone
-from sqlalchemy import Column, ForeignKey, Integer, String, DateTime, UniqueConstraint
+from sqlalchemy import Column, ForeignKey, Index, Integer, String, DateTime, UniqueConstraint, event
 from sqlalchemy.orm import relationship
 from database import Base
 
+def _utcnow():
+    return datetime.now(timezone.utc)
+
 class User(Base):
     __tablename__ = "users"
 
@@ -11,6 +14,7 @@ class User(Base):
     email = Column(String, unique=True, index=True)
     hashed_password = Column(String, nullable=False)
     avatar_url = Column(String, nullable=True)
+    updated_at = Column(DateTime, default=_utcnow, onupdate=_utcnow)
 
     # User relationships
     posts = relationship("Post", back_populates="owner", cascade="all, delete-orphan")
@@ -21,11 +25,16 @@ class Post(Base):
     __tablename__ = "posts"
 
     id = Column(Integer, primary_key=True, index=True)
-    text = Column(String, index=True)
+    text = Column(String)  # searched through posts_fts / search_vector, see below
     image_url = Column(String, nullable=True)
     timestamp = Column(DateTime, default=lambda: datetime.now(timezone.utc))
     owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     parent_id = Column(Integer, ForeignKey("posts.id"), nullable=True)
+    # Denormalized counters, kept in sync by crud/like.py and crud/post.py
+    likes_count = Column(Integer, nullable=False, default=0, server_default="0")
+    replies_count = Column(Integer, nullable=False, default=0, server_default="0")
+    # Bumped by every UPDATE of the row (text, counters), drives ETag/Last-Modified
+    updated_at = Column(DateTime, default=_utcnow, onupdate=_utcnow)
 
     # Post relationships
     owner = relationship("User", back_populates="posts")
@@ -33,6 +42,15 @@ class Post(Base):
     replies = relationship("Post", back_populates="parent", cascade="all, delete-orphan", order_by="Post.timestamp")
     likes = relationship("Like", back_populates="post", cascade="all, delete-orphan")
 
+    # Index plan of the hot queries, shipped to existing databases by migrations/0004
+    __table_args__ = (
+        # Feed keyset pagination (WHERE parent_id IS NULL ORDER BY timestamp DESC, id DESC),
+        # reply previews and reply pages (WHERE parent_id IN (...) ORDER BY timestamp)
+        Index('ix_posts_parent_timestamp_id', 'parent_id', 'timestamp', 'id'),
+        # Profile posts and replies (WHERE owner_id = ? AND parent_id ... ORDER BY timestamp)
+        Index('ix_posts_owner_parent_timestamp', 'owner_id', 'parent_id', 'timestamp'),
+    )
+
 
 class Like(Base):
     __tablename__ = "likes"
@@ -46,4 +64,70 @@ class Like(Base):
     user = relationship("User", back_populates="likes")
     post = relationship("Post", back_populates="likes")
 
-    __table_args__ = (UniqueConstraint('user_id', 'post_id', name='_user_post_like_uc'),)
+    __table_args__ = (
+        UniqueConstraint('user_id', 'post_id', name='_user_post_like_uc'),
+        # Likes of a post; the unique pair above only serves lookups by user_id
+        Index('ix_likes_post_id', 'post_id'),
+    )
+
+
+class AppState(Base):
+    # Global content versions ("posts", "users") bumped in the same transaction as writes
+    __tablename__ = "app_state"
+
+    key = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=_utcnow, onupdate=_utcnow)
+
+
+class Blob(Base):
+    # Content-addressed upload under uploads/blobs/, shared by every post and user that
+    # references it; the file is removed once ref_count drops to zero (crud/blob.py)
+    __tablename__ = "blobs"
+
+    key = Column(String, primary_key=True)  # "ab/cd/<sha256>.<ext>"
+    ref_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=_utcnow)
+
+
+# Full-text index over posts.text, searched by crud/search.py.
+# SQLite: FTS5 external-content table posts_fts (rowid = posts.id) kept in sync by triggers,
+# so every write path (ORM cascades, bulk inserts, raw SQL) maintains it.
+# PostgreSQL: generated tsvector column posts.search_vector with a GIN index.
+_SQLITE_SEARCH_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5("
+    "text, content='posts', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS posts_fts_ai AFTER INSERT ON posts BEGIN "
+    "INSERT INTO posts_fts(rowid, text) VALUES (new.id, new.text); END",
+    "CREATE TRIGGER IF NOT EXISTS posts_fts_ad AFTER DELETE ON posts BEGIN "
+    "INSERT INTO posts_fts(posts_fts, rowid, text) VALUES ('delete', old.id, old.text); END",
+    "CREATE TRIGGER IF NOT EXISTS posts_fts_au AFTER UPDATE OF text ON posts BEGIN "
+    "INSERT INTO posts_fts(posts_fts, rowid, text) VALUES ('delete', old.id, old.text); "
+    "INSERT INTO posts_fts(rowid, text) VALUES (new.id, new.text); END",
+]
+_POSTGRES_SEARCH_DDL = [
+    "ALTER TABLE posts ADD COLUMN IF NOT EXISTS search_vector tsvector "
+    "GENERATED ALWAYS AS (to_tsvector('simple', coalesce(text, ''))) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_posts_search_vector ON posts USING GIN (search_vector)",
+]
+
+def create_search_index(connection):
+    # Idempotent; when posts_fts is new on an existing posts table it is backfilled
+    if connection.dialect.name == "sqlite":
+        exists = connection.exec_driver_sql("SELECT 1 FROM sqlite_master WHERE name = 'posts_fts'").first()
+        for statement in _SQLITE_SEARCH_DDL:
+            connection.exec_driver_sql(statement)
+        if not exists:
+            connection.exec_driver_sql("INSERT INTO posts_fts(posts_fts) VALUES ('rebuild')")
+    elif connection.dialect.name == "postgresql":
+        for statement in _POSTGRES_SEARCH_DDL:
+            connection.exec_driver_sql(statement)
+
+@event.listens_for(Post.__table__, "after_create")
+def _create_search_index(target, connection, **kw):
+    create_search_index(connection)
+
+@event.listens_for(Post.__table__, "before_drop")
+def _drop_search_index(target, connection, **kw):
+    if connection.dialect.name == "sqlite":
+        connection.exec_driver_sql("DROP TABLE IF EXISTS posts_fts")
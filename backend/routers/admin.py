@@ -0,0 +1,74 @@
+import secrets
+
+import anyio
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from fastapi.responses import PlainTextResponse, Response
+from typing import AsyncIterator, List, Literal, Optional
+
+from core import profiler
+from core.config import settings
+from database import DbSession, run_db
+from dependencies import get_db
+from services import bulk_import
+
+router = APIRouter(prefix="/admin", tags=["Admin"])
+
+def require_import_token(x_import_token: Optional[str] = Header(None)):
+    # The endpoint does not exist unless BULK_IMPORT_TOKEN is set
+    if not settings.bulk_import_token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_import_token is None or not secrets.compare_digest(x_import_token, settings.bulk_import_token):
+        raise HTTPException(status_code=401, detail="Invalid import token")
+
+def require_profiling_token(x_profile_token: Optional[str] = Header(None)):
+    # Same secret as for profiling a request; no endpoint while PROFILING_TOKEN is empty
+    if not settings.profiling_token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_profile_token is None or not secrets.compare_digest(x_profile_token, settings.profiling_token):
+        raise HTTPException(status_code=401, detail="Invalid profiling token")
+
+async def _batches(request: Request, size: int) -> AsyncIterator[List[bytes]]:
+    # Lines of the streamed request body, size at a time
+    batch: List[bytes] = []
+    tail = b""
+    async for chunk in request.stream():
+        lines = (tail + chunk).split(b"\n")
+        tail = lines.pop()
+        batch.extend(lines)
+        while len(batch) >= size:
+            yield batch[:size]
+            batch = batch[size:]
+    if tail:
+        batch.append(tail)
+    if batch:
+        yield batch
+
+# Bulk import of NDJSON content (format in services/bulk_import.py), read as it streams in.
+# For very large files prefer the CLI: python -m jobs.bulk_import
+@router.post("/import", dependencies=[Depends(require_import_token)])
+async def import_ndjson(request: Request, db: DbSession = Depends(get_db)):
+    importer = bulk_import.BulkImporter()
+    try:
+        async for lines in _batches(request, settings.bulk_import_batch_size):
+            records = importer.parse(lines)
+            await anyio.to_thread.run_sync(importer.hash_passwords, records)
+            await run_db(db, importer.write_batch, records)
+    finally:
+        # Also after an error or a client disconnect: the batches already committed
+        # still need their counters recomputed
+        with anyio.CancelScope(shield=True):
+            stats = await run_db(db, importer.finish)
+    return stats.as_dict()
+
+# Report of a profiled request (core/profiler.py), by the X-Profile-Id it was answered with:
+# JSON with the SQL timeline, or format=folded for flamegraph tools, e.g.
+#   curl -H "X-Profile-Token: ..." ".../admin/profiles/<id>?format=folded" | flamegraph.pl > profile.svg
+@router.get("/profiles/{profile_id}", dependencies=[Depends(require_profiling_token)])
+async def get_profile(profile_id: str, format: Literal["json", "folded"] = "json"):
+    suffix = ".folded" if format == "folded" else ".json"
+    content = await anyio.to_thread.run_sync(profiler.load, profile_id, suffix)
+    if content is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "folded":
+        return PlainTextResponse(content)
+    return Response(content, media_type="application/json")
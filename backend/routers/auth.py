@@ -1,9 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
 import schemas
+from database import DbSession
 from dependencies import get_db, get_current_active_user
 import models
-from crud.user import get_user_by_name, get_user_by_email, create_user, authenticate_user
+from crud.user import authenticate_user
+from services import user_service
 from datetime import timedelta
 from core.security import create_access_token
 from core.config import settings
@@ -13,21 +14,13 @@ router = APIRouter(prefix="/auth", tags=["Authentication"])
 
 # Create new user (registration)
 @router.post("/register", response_model=schemas.User)
-def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user_by_name = get_user_by_name(db, user.username)
-    if db_user_by_name:
-        raise HTTPException(status_code=400, detail="Username already registered")
-    
-    db_user_by_email = get_user_by_email(db, user.email)
-    if db_user_by_email:
-        raise HTTPException(status_code=400, detail="Email already registered")
-
-    return create_user(db, user)
+async def register(user: schemas.UserCreate, db: DbSession = Depends(get_db)):
+    return await user_service.create_user_with_validation(db, user)
 
 # User login to get access token
 @router.post("/login", response_model=schemas.Token)
-def login(form_data: schemas.LoginForm, db: Session = Depends(get_db)):
-    user = authenticate_user(db, form_data.email, form_data.password)
+async def login(form_data: schemas.LoginForm, db: DbSession = Depends(get_db)):
+    user = await authenticate_user(db, form_data.email, form_data.password)
     if not user:
         raise HTTPException(status_code=400, detail="Invalid email or password")
     access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
@@ -40,4 +33,4 @@ def login(form_data: schemas.LoginForm, db: Session = Depends(get_db)):
 # Get info about the current user
 @router.get("/me", response_model=schemas.User)
 def read_users_me(current_user: models.User = Depends(get_current_active_user)):
-    return current_user
+    return user_service.user_data(current_user)
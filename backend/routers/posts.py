@@ -1,127 +1,82 @@
-from datetime import datetime
-import os
-import shutil
-from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Query, Request, Response, UploadFile, status
 from typing import List, Optional
 
 import models, schemas
-from dependencies import get_current_user, get_current_user, get_current_user_optional, get_db
-from crud import post as post_crud
-from services import post_service
+from core.etag import is_not_modified, not_modified, set_validators
+from database import DbSession, run_db
+from dependencies import get_current_user, get_current_user_optional, get_db
+from services import post_service, uploads
 
 router = APIRouter(prefix="/posts", tags=["Posts"])
 
-# Endpoint to get a list of posts with their owners and comments
+# Endpoint to get a list of posts with their owners and comments.
+# Pass the X-Next-Cursor header of the previous page as `cursor` to get the next one.
 @router.get("/", response_model=List[schemas.Post])
-def get_posts(skip: int = 0, limit: int = 100, current_user: Optional[models.User] = Depends(get_current_user_optional), db: Session = Depends(get_db)):
-    return post_service.get_posts_with_metadata(db, current_user, skip, limit)
+async def get_posts(request: Request, response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, current_user: Optional[models.User] = Depends(get_current_user_optional), db: DbSession = Depends(get_db)):
+    viewer_id = getattr(current_user, 'id', None)
+    etag, last_modified = await run_db(db, post_service.get_feed_validators, viewer_id, skip, limit, cursor)
+    if is_not_modified(request, etag, last_modified):
+        return not_modified(etag, last_modified)
+
+    posts, next_cursor = await run_db(db, post_service.get_posts_with_metadata, current_user, skip, limit, cursor)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    set_validators(response, etag, last_modified)
+    return posts
            
+# Endpoint to search posts and replies by their text, best matches first.
+# Declared before /{post_id} so "search" is not taken for an ID.
+@router.get("/search", response_model=List[schemas.SearchResult])
+async def search_posts(response: Response, q: str = Query(..., min_length=1, max_length=200), limit: int = Query(20, ge=1, le=100), cursor: Optional[str] = None, current_user: Optional[models.User] = Depends(get_current_user_optional), db: DbSession = Depends(get_db)):
+    results, next_cursor = await run_db(db, post_service.search_posts, current_user, q, limit, cursor)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return results
+
 # Endpoint to get a specific post by ID
 @router.get("/{post_id}", response_model=schemas.Post)
-def get_post(post_id: int, current_user: Optional[models.User] = Depends(get_current_user_optional), db: Session = Depends(get_db)):
-    post = post_crud.get_post(db, post_id)
-    if post is None:
-        raise HTTPException(status_code=404, detail="Post not found")
-    return {
-        "id": post.id,
-        "text": post.text,
-        "image_url": post.image_url,
-        "timestamp": post.timestamp,
-        "owner": post.owner,
-        "replies": [
-            schemas.PostReply(
-                id=reply.id,
-                text=reply.text,
-                timestamp=reply.timestamp,
-                owner=reply.owner,
-                likes_count=len(reply.likes),
-                is_liked_by_user=any(like.user_id == current_user.id for like in reply.likes) if current_user else False
-            ) for reply in post.replies
-        ],
-        "likes_count": len(post.likes),
-        "is_liked_by_user": any(like.user_id == current_user.id for like in post.likes) if current_user else False
-    }
+async def get_post(post_id: int, request: Request, response: Response, current_user: Optional[models.User] = Depends(get_current_user_optional), db: DbSession = Depends(get_db)):
+    etag, last_modified = await run_db(db, post_service.get_post_validators, post_id, getattr(current_user, 'id', None))
+    if etag is not None:
+        if is_not_modified(request, etag, last_modified):
+            return not_modified(etag, last_modified)
+        set_validators(response, etag, last_modified)
+    return await run_db(db, post_service.get_post_with_metadata, post_id, current_user)
+
+# Endpoint to page through all replies of a post, oldest first.
+# Pass the X-Next-Cursor header of the previous page as `cursor` to get the next one.
+@router.get("/{post_id}/replies", response_model=List[schemas.PostReply])
+async def get_replies(post_id: int, response: Response, limit: int = Query(20, ge=1, le=100), cursor: Optional[str] = None, current_user: Optional[models.User] = Depends(get_current_user_optional), db: DbSession = Depends(get_db)):
+    replies, next_cursor = await run_db(db, post_service.get_replies_with_metadata, post_id, current_user, limit, cursor)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return replies
 
 # Endpoint to create a new post
 @router.post("/", response_model=schemas.Post, status_code=status.HTTP_201_CREATED)
-def create_post(text: str = Form(...), current_user: schemas.User = Depends(get_current_user), db: Session = Depends(get_db), image: UploadFile = File(None)):
-    image_url = None
-
-    if image and image.filename:
-        allowed_extensions = {".png", ".jpg", ".jpeg", ".gif", ".webp"}
-        file_extension = os.path.splitext(image.filename)[1].lower()
-
-        if file_extension not in allowed_extensions:
-            raise HTTPException(status_code=400, detail=f"Invalid image format. Allowed formats: {', '.join(allowed_extensions)}")
-
-        unique_filename = f"post_{current_user.id}_{int(datetime.now().timestamp())}{file_extension}"
-        file_path = os.path.join("uploads", unique_filename)
-
-        os.makedirs("uploads", exist_ok=True)
-
-        try:
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(image.file, buffer)
-            image_url = f"/uploads/{unique_filename}"
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to upload image: {str(e)}")
-
+async def create_post(text: str = Form(...), current_user: models.User = Depends(get_current_user), db: DbSession = Depends(get_db), image: UploadFile = File(None)):
+    image_url = await uploads.save_image(image)
     post_data = schemas.PostCreate(text=text, image_url=image_url)
-    return post_crud.create_post(db, post_data, owner_id=current_user.id, parent_id=None)
+    return await run_db(db, post_service.create_post, post_data, current_user.id, None)
 
 # Endpoint to create a reply to a post
 @router.post("/{post_id}/replies", response_model=schemas.Post, status_code=status.HTTP_201_CREATED)
-def create_reply(post_id: int, text: str = Form(...), current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db), image: UploadFile = File(None)):
-    parent_post = post_crud.get_post(db, post_id)
-    if parent_post is None:
-        raise HTTPException(status_code=404, detail="Parent post not found")
-
-    image_url = None
-
-    if image and image.filename:
-        allowed_extensions = {".png", ".jpg", ".jpeg", ".gif", ".webp"}
-        file_extension = os.path.splitext(image.filename)[1].lower()
-
-        if file_extension not in allowed_extensions:
-            raise HTTPException(status_code=400, detail=f"Invalid image format. Allowed formats: {', '.join(allowed_extensions)}")
-
-        unique_filename = f"reply_{current_user.id}_{int(datetime.now().timestamp())}{file_extension}"
-        file_path = os.path.join("uploads", unique_filename)
-
-        os.makedirs("uploads", exist_ok=True)
-
-        try:
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(image.file, buffer)
-            image_url = f"/uploads/{unique_filename}"
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to upload image: {str(e)}")
+async def create_reply(post_id: int, text: str = Form(...), current_user: models.User = Depends(get_current_user), db: DbSession = Depends(get_db), image: UploadFile = File(None)):
+    await run_db(db, post_service.ensure_post_exists, post_id, "Parent post not found")
 
+    image_url = await uploads.save_image(image)
     reply_data = schemas.PostCreate(text=text, image_url=image_url)
-    return post_crud.create_post(db, reply_data, owner_id=current_user.id, parent_id=post_id) # type: ignore
+    return await run_db(db, post_service.create_post, reply_data, current_user.id, post_id)
 
 # Endpoint to update an existing post
 @router.put("/{post_id}", response_model=schemas.Post)
-def update_post(post_id: int, text: str = Form(...), db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    db_post = post_crud.get_post(db, post_id)
-    if db_post is None:
-        raise HTTPException(status_code=404, detail="Post not found")
-    
-    if getattr(db_post, 'owner_id') != getattr(current_user, 'id'):
-        raise HTTPException(status_code=403, detail="Not authorized to update this post")
-
-    return post_crud.update_post(db, post_id, text)
+async def update_post(post_id: int, text: str = Form(...), db: DbSession = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+    return await run_db(db, post_service.update_post, post_id, text, current_user.id)
 
 
 @router.delete("/{post_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_post(post_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    db_post = post_crud.get_post(db, post_id)
-
-    if db_post is None:
-        raise HTTPException(status_code=404, detail="Post not found")
-    
-    if getattr(db_post, 'owner_id') != getattr(current_user, 'id'):
-        raise HTTPException(status_code=403, detail="Not authorized to delete this post")
-    post_crud.delete_post(db, post_id)
-    return
\ No newline at end of file
+async def delete_post(post_id: int, db: DbSession = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+    released = await run_db(db, post_service.delete_post, post_id, current_user.id)
+    for image_url in released:
+        await uploads.remove_upload(image_url)
+    return
@@ -0,0 +1,82 @@
+import mimetypes
+import os
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from pathlib import Path
+from typing import Optional
+
+import anyio
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import FileResponse
+
+from core.config import settings
+from core.etag import is_not_modified
+from crud import blob as blob_crud
+from services import image_variants
+from services.uploads import UPLOAD_ROOT
+
+# Serves /uploads in place of StaticFiles, with caching headers that fit the files:
+# content-addressed blobs and their variants never change under their URL, so they are
+# sent as immutable for a year with their hash as a strong ETag; anything else (uploads
+# from before the blob store) must be revalidated. Range requests get 206 from FileResponse.
+#
+# UPLOAD_SERVE_MODE=x-accel-redirect (nginx) or x-sendfile (Apache, lighttpd) hands the
+# bytes to the front proxy: the worker only resolves the path and sets the headers.
+
+router = APIRouter(prefix="/uploads", tags=["Uploads"])
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "public, no-cache"
+# Paths under uploads/ whose files are content-addressed
+_IMMUTABLE_PREFIXES = (blob_crud.BLOB_URL_PREFIX.removeprefix("/uploads/"), f"{image_variants.VARIANTS_DIR}/blobs/")
+
+mimetypes.add_type("image/webp", ".webp")
+mimetypes.add_type("image/avif", ".avif")
+
+def _resolve(file_path: str) -> Optional[Path]:
+    # The file under uploads/ that file_path names, or None (hidden parts, traversal, missing)
+    if any(part.startswith(".") for part in Path(file_path).parts):
+        return None
+    root = UPLOAD_ROOT.resolve()
+    path = (root / file_path).resolve()
+    if root not in path.parents or not path.is_file():
+        return None
+    return path
+
+def _cache_headers(file_path: str, stat: os.stat_result) -> dict:
+    if file_path.startswith(_IMMUTABLE_PREFIXES):
+        # Blob names are sha256 hex (variants add _<width>), so the name is the validator
+        etag = f'"{Path(file_path).name.split(".")[0]}"'
+        cache_control = IMMUTABLE
+    else:
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        cache_control = REVALIDATE
+    return {
+        "ETag": etag,
+        "Last-Modified": format_datetime(datetime.fromtimestamp(int(stat.st_mtime), timezone.utc), usegmt=True),
+        "Cache-Control": cache_control,
+        "X-Content-Type-Options": "nosniff",
+    }
+
+@router.api_route("/{file_path:path}", methods=["GET", "HEAD"], include_in_schema=False)
+async def serve_upload(file_path: str, request: Request):
+    path = await anyio.to_thread.run_sync(_resolve, file_path)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    stat = await anyio.Path(path).stat()
+    headers = _cache_headers(file_path, stat)
+
+    last_modified = datetime.fromtimestamp(int(stat.st_mtime), timezone.utc)
+    if is_not_modified(request, headers["ETag"], last_modified):
+        return Response(status_code=304, headers=headers)
+
+    if settings.upload_serve_mode == "x-accel-redirect":
+        media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+        headers["X-Accel-Redirect"] = settings.upload_accel_prefix.rstrip("/") + "/" + Path(file_path).as_posix()
+        return Response(headers=headers, media_type=media_type)
+    if settings.upload_serve_mode == "x-sendfile":
+        media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+        headers["X-Sendfile"] = str(path)
+        return Response(headers=headers, media_type=media_type)
+
+    return FileResponse(path, headers=headers, stat_result=stat)
@@ -1,112 +1,90 @@
+import anyio
+import logging
 from datetime import timedelta
-from fastapi import APIRouter, Depends, status, HTTPException, File, UploadFile
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, status, HTTPException, File, Request, Response, UploadFile
+from fastapi.responses import StreamingResponse
 from typing import List, Optional
-from crud import user as user_crud
 import models, schemas
+from database import DbSession, run_db
 from dependencies import get_current_user, get_current_user_optional, get_db
-from services import user_service
+from services import user_service, uploads
 from core.security import create_access_token
-import shutil
-from pathlib import Path
-import uuid
-
-UPLOAD_DIR = Path("uploads/avatars")
-UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+from core.etag import is_not_modified, not_modified, set_validators
 
 router = APIRouter(prefix="/users", tags=["Users"])
+logger = logging.getLogger(__name__)
 
 # Endpoint to get a list of users
 @router.get("/", response_model=List[schemas.User])
-def get_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    users = user_crud.get_users(db, skip=skip, limit=limit)
-    return users
+async def get_users(skip: int = 0, limit: int = 100, db: DbSession = Depends(get_db)):
+    return await run_db(db, user_service.get_users, skip=skip, limit=limit)
 
 # Endpoint to create a new user
 @router.post("/", response_model=schemas.User, status_code=status.HTTP_201_CREATED)
-def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    return user_service.create_user_with_validation(db, user)
+async def create_user(user: schemas.UserCreate, db: DbSession = Depends(get_db)):
+    return await user_service.create_user_with_validation(db, user)
 
 @router.get("/{user_id}", response_model=schemas.UserProfile)
-def get_user_profile(
+async def get_user_profile(
     user_id: int,
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: DbSession = Depends(get_db),
     current_user: Optional[models.User] = Depends(get_current_user_optional)  # ✅ ДОДАТИ
 ):
-    user = user_crud.get_user(db, user_id=user_id)
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    posts = user_crud.get_user_posts(db, user_id=user_id, current_user=current_user) or []
-    comments = user_crud.get_user_replies(db, user_id=user_id, current_user=current_user) or []
-
-    return {
-        "id": user.id,
-        "username": user.username,
-        "email": user.email,
-        "avatar_url": user.avatar_url,
-        "posts": posts,
-        "comments": comments,
-        "posts_count": len(posts),
-        "comments_count": len(comments)
-    }
+    etag, last_modified = await run_db(db, user_service.get_profile_validators, user_id, getattr(current_user, 'id', None))
+    if is_not_modified(request, etag, last_modified):
+        return not_modified(etag, last_modified)
+
+    profile = await run_db(db, user_service.get_user_profile, user_id, current_user)
+    set_validators(response, etag, last_modified)
+    return profile
+
+# Stream all posts, replies and likes of the signed-in user as NDJSON.
+# Resume an interrupted download with after=<kind>:<id> of the last line received.
+@router.get("/{user_id}/export")
+async def export_user_data(
+    user_id: int,
+    after: Optional[str] = None,
+    current_user: models.User = Depends(get_current_user)
+):
+    if current_user.id != user_id:
+        raise HTTPException(status_code=403, detail="You can only export your own data")
+    section, after_id = user_service.parse_export_cursor(after)
+    return StreamingResponse(
+        user_service.iter_user_export(user_id, section, after_id),
+        media_type=user_service.EXPORT_MEDIA_TYPE,
+        headers={
+            "Content-Disposition": f'attachment; filename="user-{user_id}.ndjson"',
+            "Cache-Control": "no-store",
+        },
+    )
 
 @router.get("/me", response_model=schemas.User)
 def get_current_user_profile(
     current_user: models.User = Depends(get_current_user)
 ):
     """Get current user's profile"""
-    return {
-        "id": current_user.id,
-        "username": current_user.username,
-        "email": current_user.email,
-        "avatar_url": current_user.avatar_url
-    }
+    return user_service.user_data(current_user)
 
 @router.put("/me")
-def update_profile_me(
+async def update_profile_me(
     user_update: schemas.UserUpdate,  # ✅ JSON body
-    db: Session = Depends(get_db),
+    db: DbSession = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
     """Update current user's profile"""
-    print(f"🔍 Received update: {user_update}")  # ✅ Debug log
-    print(f"📝 Current user: id={current_user.id}, username={current_user.username}")
-    
+    logger.debug("Profile update for user %s: %s", current_user.id, user_update.model_dump(exclude_none=True))
 
-    if user_update.username:
-        if user_crud.check_is_username_taken(db, user_update.username):
-            raise HTTPException(status_code=400, detail="Username already taken")
-        setattr(current_user, 'username', user_update.username)
-
-    # ✅ Update email if provided
-    email_changed = False
-    if user_update.email:
-        # Check if email is already registered
-        if user_crud.check_is_email_registered(db, user_update.email):
-            raise HTTPException(status_code=400, detail="Email already taken")
-        setattr(current_user, 'email', user_update.email)
-        email_changed = True
-    
-    # ✅ IMPORTANT: commit changes to the DB
-    db.commit()
-    db.refresh(current_user)
+    email_changed = await run_db(db, user_service.update_profile, current_user, user_update)
 
     new_token = None
     if email_changed:
         # Generate a new access token with the updated email
         new_token = create_access_token(data={"sub": current_user.email}, expires_delta=timedelta(minutes=60))
-        print(f"🔑 Generated new token for updated email: {new_token}")
-    
-    print(f"✅ User updated in DB: username={current_user.username}, email={current_user.email}")
-    
+
     return {
-        "user": {
-            "id": current_user.id,
-            "username": current_user.username,
-            "email": current_user.email,
-            "avatar_url": current_user.avatar_url
-        },
+        "user": await anyio.to_thread.run_sync(user_service.user_data, current_user),
         "access_token": new_token,
         "token_type": "bearer" if new_token else None
     }
@@ -115,63 +93,31 @@ def update_profile_me(
 async def upload_avatar(
     file: UploadFile = File(...),
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: DbSession = Depends(get_db)
 ):
-    # Check file type
-    allowed_types = ["image/jpeg", "image/png", "image/gif"]
-    if file.content_type not in allowed_types:
-        raise HTTPException(status_code=400, detail="Invalid file type. Only JPEG, PNG, and GIF are allowed.")
-    
-    # Check file size (limit to 5MB)
-    file.file.seek(0, 2)  # Move to end of file
-    file_size = file.file.tell()
-    file.file.seek(0)  # Reset to start
-    if file_size > 5 * 1024 * 1024:
-        raise HTTPException(status_code=400, detail="File size exceeds 5MB limit.")
-    
-    # Generate unique filename
-    if not file.filename:
+    avatar_url = await uploads.save_image(file, allowed_types=uploads.AVATAR_TYPES)
+    if avatar_url is None:
         raise HTTPException(status_code=400, detail="Filename is missing.")
-    file_extention = Path(file.filename).suffix
-    unique_filename = f"{uuid.uuid4()}{file_extention}"
-    file_path = UPLOAD_DIR / unique_filename
-
-    # Delete old avatar if exists
-    avatar_url = getattr(current_user, 'avatar_url', None)
-    if avatar_url:
-        old_file = Path(avatar_url.replace("/uploads/", "uploads/"))
-        if old_file.exists():
-            old_file.unlink()
 
-    # Save new avatar file
-    with file_path.open("wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-
-    # Update user's avatar URL in the database
-    avatar_url = f"/uploads/avatars/{unique_filename}"
-    setattr(current_user, 'avatar_url', avatar_url)
-    db.commit()
-    db.refresh(current_user)
+    # Point the user at the new avatar, then delete the old file unless it is still in use
+    released = await run_db(db, user_service.set_avatar_url, current_user, avatar_url)
+    for url in released:
+        await uploads.remove_upload(url)
 
     return {"avatar_url": avatar_url, "message": "Avatar uploaded successfully."}
 
 @router.delete("/me/avatar")
-def delete_avatar(
+async def delete_avatar(
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: DbSession = Depends(get_db)
 ):
     avatar_url = getattr(current_user, 'avatar_url', None)
     if not avatar_url:
         raise HTTPException(status_code=400, detail="No avatar to delete.")
     
-    # Delete the avatar file
-    file_path = Path(avatar_url.replace("/uploads/", "uploads/"))
-    if file_path.exists():
-        file_path.unlink()
-    
-    # Remove avatar URL from user profile
-    setattr(current_user, 'avatar_url', None)
-    db.commit()
-    db.refresh(current_user)
+    # Remove avatar URL from user profile, then delete the file unless it is still in use
+    released = await run_db(db, user_service.set_avatar_url, current_user, None)
+    for url in released:
+        await uploads.remove_upload(url)
 
-    return {"message": "Avatar deleted successfully."}
\ No newline at end of file
+    return {"message": "Avatar deleted successfully."}
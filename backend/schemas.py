@@ -2,7 +2,17 @@ from __future__ import annotations
 
 from pydantic import BaseModel, ConfigDict, EmailStr, Field
 from datetime import datetime
-from typing import Optional, List
+from typing import Dict, Optional, List
+
+# --- Image variants (response-only: resized variants by MIME type, in srcset syntax,
+# empty until services/image_variants.py has generated them; filled in by the services,
+# so serialization never touches the disk) ---
+
+class AvatarSrcset(BaseModel):
+    avatar_srcset: Dict[str, str] = {}
+
+class ImageSrcset(BaseModel):
+    image_srcset: Dict[str, str] = {}
 
 # --- User schemas ---
 
@@ -15,14 +25,17 @@ class UserBase(BaseModel):
         description="URL of the user's avatar image"
     )
 
-class UserCreate(UserBase):
+class UserCreate(BaseModel):
+    # No avatar_url: avatars are only set by POST /users/me/avatar, which stores the file
+    username: str
+    email: EmailStr
     password: str = Field(
         min_length=8,
         examples=["strongpassword123"],
         description="Password for the user account"
-    )   # for creating a new user, all fields are inherited from UserBase
+    )
 
-class UserProfile(UserBase):
+class UserProfile(UserBase, AvatarSrcset):
     id: int
     posts: List[Post] = []
     comments: List[PostReply] = []
@@ -42,14 +55,13 @@ class UserResponse(BaseModel):
 class UserUpdate(BaseModel):
     username: Optional[str] = None
     email: Optional[EmailStr] = None
-    avatar_url: Optional[str] = None
 
 class UserUpdateResponse(BaseModel):
     user: User
     access_token: Optional[str] = None
     token_type: Optional[str] = None
 
-class User(UserBase):
+class User(UserBase, AvatarSrcset):
     id: int
 
     model_config = ConfigDict(from_attributes=True)
@@ -72,7 +84,7 @@ class PostBase(BaseModel):
 class PostCreate(PostBase):
     pass   # owner_id will be provided separately
 
-class PostReply(PostBase):
+class PostReply(PostBase, ImageSrcset):
     id: int
     timestamp: datetime
     owner: User 
@@ -81,13 +93,17 @@ class PostReply(PostBase):
 
     model_config = ConfigDict(from_attributes=True)
 
-class Post(PostBase):
+class SearchResult(PostReply):
+    parent_id: Optional[int] = None  # set for replies, the thread to open
+
+class Post(PostBase, ImageSrcset):
     id: int
     timestamp: datetime
     image_url: Optional[str] = None
     owner: User   # Nested user schema
     replies: List[PostReply] = []  # List of replies to this post
     likes_count: int = 0  # Number of likes for the post
+    replies_count: int = 0  # Number of replies to the post
     is_liked_by_user: bool = False  # Whether the current user liked this post
 
     model_config = ConfigDict(from_attributes=True)
@@ -0,0 +1,281 @@
+import json
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from sqlalchemy import insert, or_, select
+from sqlalchemy.orm import Session
+
+from core import passwords
+from crud import blob as blob_crud
+from crud import content_version
+from crud import post as post_crud
+import models
+
+# Bulk ingestion of users, posts, replies and likes from NDJSON, one object per line:
+#
+#   {"kind": "user",  "id": "u1", "username": "ann", "email": "ann@example.com",
+#    "hashed_password": "$2b$12$..."}            (or "password": "...", hashed here)
+#   {"kind": "post",  "id": "p1", "owner_id": "u1", "text": "...", "image_url": null,
+#    "timestamp": "2024-01-01T10:00:00+00:00"}
+#   {"kind": "reply", "id": "p2", "owner_id": "u1", "parent_id": "p1", "text": "..."}
+#   {"kind": "like",  "user_id": "u1", "post_id": "p2"}
+#
+# The "id"s are keys of the source system; rows get new database ids and the links
+# (owner, parent, like target) are remapped. A user whose email already exists is
+# merged into the existing account. Rows are written per batch with one executemany
+# INSERT per table (RETURNING the new ids, in parameter order), instead of one commit
+# per row. A post or like whose owner or parent has not been imported yet waits until
+# it has, so files need not be ordered. Like and reply counters are not touched while
+# inserting: finish() recomputes them once over the imported id range.
+
+MAX_ERRORS = 20
+RECOUNT_BATCH = 50_000
+
+_REQUIRED = {
+    "user": ("id", "username", "email"),
+    "post": ("id", "owner_id", "text"),
+    "reply": ("id", "owner_id", "parent_id", "text"),
+    "like": ("user_id", "post_id"),
+}
+
+# Source ids are the keys of dicts and sets, so only strings and numbers are accepted
+_ID_FIELDS = ("id", "owner_id", "parent_id", "user_id", "post_id")
+_STRING_FIELDS = ("username", "email", "password", "hashed_password", "text", "image_url", "avatar_url")
+
+Line = Union[str, bytes]
+
+@dataclass
+class ImportStats:
+    users: int = 0
+    posts: int = 0
+    replies: int = 0
+    likes: int = 0
+    skipped: int = 0
+    errors: List[str] = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def rows(self) -> int:
+        return self.users + self.posts + self.replies + self.likes
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def error(self, message: str):
+        self.skipped += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append(message)
+
+    def as_dict(self) -> dict:
+        return {
+            "users": self.users, "posts": self.posts, "replies": self.replies, "likes": self.likes,
+            "rows": self.rows, "skipped": self.skipped, "errors": self.errors,
+            "seconds": round(self.seconds, 3), "rows_per_second": round(self.rows_per_second, 1),
+        }
+
+def _timestamp(value: Any) -> datetime:
+    if value is None:
+        return datetime.now(timezone.utc)
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+class BulkImporter:
+    # Feed it batches: parse() -> hash_passwords() -> write_batch(db), then finish(db).
+    # hash_passwords blocks on bcrypt and must run off the event loop; the other steps
+    # are plain sync crud code (run_db from the API, directly from jobs/bulk_import.py).
+    def __init__(self):
+        self.stats = ImportStats()
+        self._started = time.perf_counter()
+        self._line = 0
+        self._users: Dict[Any, int] = {}  # source id -> users.id
+        self._posts: Dict[Any, int] = {}  # source id -> posts.id
+        self._likes: Set[Tuple[int, int]] = set()
+        self._pending_posts: List[dict] = []  # waiting for their owner or parent
+        self._pending_likes: List[dict] = []  # waiting for their user or post
+        self._first_post_id: Optional[int] = None
+        self._last_post_id: Optional[int] = None
+
+    def parse(self, lines: Iterable[Line]) -> List[dict]:
+        # Valid records of the given lines; malformed ones are counted as skipped
+        records = []
+        for raw in lines:
+            self._line += 1
+            if not raw.strip():
+                continue
+            try:
+                record = json.loads(raw)
+                kind = record.get("kind")
+                if kind not in _REQUIRED:
+                    raise ValueError(f"unknown kind {kind!r}")
+                missing = [name for name in _REQUIRED[kind] if record.get(name) is None]
+                if kind == "user" and not (record.get("hashed_password") or record.get("password")):
+                    missing.append("password")
+                if missing:
+                    raise ValueError(f"missing {', '.join(missing)}")
+                for name in _ID_FIELDS:
+                    value = record.get(name)
+                    if value is not None and (isinstance(value, bool) or not isinstance(value, (str, int))):
+                        raise ValueError(f"{name} must be a string or an integer")
+                for name in _STRING_FIELDS:
+                    if record.get(name) is not None and not isinstance(record[name], str):
+                        raise ValueError(f"{name} must be a string")
+                record["timestamp"] = _timestamp(record.get("timestamp"))
+            except (ValueError, TypeError, AttributeError) as e:
+                self.stats.error(f"line {self._line}: {e}")
+                continue
+            record["line"] = self._line
+            records.append(record)
+        return records
+
+    def hash_passwords(self, records: List[dict]):
+        # bcrypt for users that come with a plain password, spread over the hashing pool
+        plain = [record for record in records if record["kind"] == "user" and not record.get("hashed_password")]
+        if plain:
+            for record, hashed in zip(plain, passwords.hash_passwords([record["password"] for record in plain])):
+                record["hashed_password"] = hashed
+
+    def write_batch(self, db: Session, records: List[dict]):
+        # Insert one batch in a single transaction
+        users = [record for record in records if record["kind"] == "user"]
+        posts = self._pending_posts + [record for record in records if record["kind"] in ("post", "reply")]
+        likes = self._pending_likes + [record for record in records if record["kind"] == "like"]
+        if users:
+            self._insert_users(db, users)
+        self._pending_posts = self._insert_posts(db, posts)
+        self._pending_likes = self._insert_likes(db, likes)
+        content_version.bump_version(db, content_version.POSTS, content_version.USERS, content_version.TIMELINE)
+        db.commit()
+        self.stats.seconds = time.perf_counter() - self._started
+
+    def finish(self, db: Session) -> ImportStats:
+        # Report what never got its dependencies, then recompute the deferred counters.
+        # Also call it when the import aborts: a batch that failed half-way is rolled back,
+        # the committed ones still get their counters.
+        db.rollback()
+        for record in self._pending_posts:
+            self.stats.error(f"line {record['line']}: unknown owner or parent")
+        for record in self._pending_likes:
+            self.stats.error(f"line {record['line']}: unknown user or post")
+        self._pending_posts, self._pending_likes = [], []
+
+        if self._first_post_id is not None and self._last_post_id is not None:
+            for start in range(self._first_post_id, self._last_post_id + 1, RECOUNT_BATCH):
+                post_crud.recount_post_counters(db, id_range=(start, min(start + RECOUNT_BATCH - 1, self._last_post_id)))
+        self.stats.seconds = time.perf_counter() - self._started
+        return self.stats
+
+    def _insert_users(self, db: Session, records: List[dict]):
+        emails = {record["email"] for record in records}
+        usernames = {record["username"] for record in records}
+        existing = db.execute(select(models.User.id, models.User.email, models.User.username).where(
+            or_(models.User.email.in_(emails), models.User.username.in_(usernames))
+        )).all()
+        ids_by_email = {row.email: row.id for row in existing}
+        taken_usernames = {row.username for row in existing}
+
+        new: Dict[str, dict] = {}  # email -> record to insert
+        aliases = []  # records whose email comes earlier in this batch
+        for record in records:
+            if record["email"] in ids_by_email:
+                self._users[record["id"]] = ids_by_email[record["email"]]
+            elif record["email"] in new:
+                aliases.append(record)
+            elif record["username"] in taken_usernames:
+                self.stats.error(f"line {record['line']}: username {record['username']!r} is taken")
+            else:
+                taken_usernames.add(record["username"])
+                new[record["email"]] = record
+        if not new:
+            return
+
+        ids = db.scalars(insert(models.User).returning(models.User.id, sort_by_parameter_order=True), [
+            {"username": record["username"], "email": record["email"], "hashed_password": record["hashed_password"],
+             "avatar_url": record.get("avatar_url"), "updated_at": record["timestamp"]}
+            for record in new.values()
+        ]).all()
+        for record, user_id in zip(new.values(), ids):
+            ids_by_email[record["email"]] = user_id
+            self._users[record["id"]] = user_id
+            blob_crud.acquire(db, record.get("avatar_url"))
+        for record in aliases:
+            self._users[record["id"]] = ids_by_email[record["email"]]
+        self.stats.users += len(new)
+
+    def _insert_posts(self, db: Session, records: List[dict]) -> List[dict]:
+        # Inserts in rounds: each round takes the records whose owner and parent are known,
+        # so a reply chain inside one batch needs one round per level. Returns the rest.
+        waiting = records
+        while waiting:
+            ready, later, seen = [], [], set()
+            for record in waiting:
+                parent = record.get("parent_id")
+                if record["id"] in self._posts or record["id"] in seen:
+                    self.stats.error(f"line {record['line']}: duplicate post id {record['id']!r}")
+                elif record["owner_id"] not in self._users or (parent is not None and parent not in self._posts):
+                    later.append(record)
+                else:
+                    seen.add(record["id"])
+                    ready.append(record)
+            if not ready:
+                return later
+
+            ids = db.scalars(insert(models.Post).returning(models.Post.id, sort_by_parameter_order=True), [
+                {"text": record["text"], "image_url": record.get("image_url"), "timestamp": record["timestamp"],
+                 "owner_id": self._users[record["owner_id"]],
+                 "parent_id": self._posts[record["parent_id"]] if record.get("parent_id") is not None else None}
+                for record in ready
+            ]).all()
+            for record, post_id in zip(ready, ids):
+                self._posts[record["id"]] = post_id
+                blob_crud.acquire(db, record.get("image_url"))
+                if record.get("parent_id") is None:
+                    self.stats.posts += 1
+                else:
+                    self.stats.replies += 1
+            self._first_post_id = min(ids) if self._first_post_id is None else min(self._first_post_id, *ids)
+            self._last_post_id = max(ids) if self._last_post_id is None else max(self._last_post_id, *ids)
+            waiting = later
+        return []
+
+    def _insert_likes(self, db: Session, records: List[dict]) -> List[dict]:
+        rows, later = [], []
+        for record in records:
+            user_id, post_id = self._users.get(record["user_id"]), self._posts.get(record["post_id"])
+            if user_id is None or post_id is None:
+                later.append(record)
+            elif (user_id, post_id) in self._likes:
+                self.stats.error(f"line {record['line']}: duplicate like")
+            else:
+                self._likes.add((user_id, post_id))
+                rows.append({"user_id": user_id, "post_id": post_id, "timestamp": record["timestamp"]})
+        if rows:
+            db.execute(insert(models.Like), rows)
+            self.stats.likes += len(rows)
+        return later
+
+def batched(lines: Iterable[Line], size: int) -> Iterable[List[Line]]:
+    batch: List[Line] = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def import_lines(db: Session, lines: Iterable[Line], batch_size: int, progress=None) -> ImportStats:
+    # Synchronous driver (CLI, tests); progress(stats) is called after every batch
+    importer = BulkImporter()
+    try:
+        for batch in batched(lines, batch_size):
+            records = importer.parse(batch)
+            importer.hash_passwords(records)
+            importer.write_batch(db, records)
+            if progress is not None:
+                progress(importer.stats)
+    finally:
+        stats = importer.finish(db)
+    return stats
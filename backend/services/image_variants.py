@@ -0,0 +1,191 @@
+import importlib.util
+import json
+import logging
+import os
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from core.cache import TTLCache
+from core.config import settings
+from crud import content_version
+from database import SessionLocal, retry_on_locked
+
+# Pillow is optional (without it no variants are made) and only imported where images
+# are processed, so importing the app does not pay for it
+PILLOW_AVAILABLE = importlib.util.find_spec("PIL") is not None
+
+# Resized WebP/AVIF variants of uploaded images, generated in a process pool off the
+# request path and cached on disk next to the originals:
+#
+#   /uploads/avatars/abc.png -> uploads/variants/avatars/abc_96.webp, abc_96.avif, ...
+#                               uploads/variants/avatars/abc.json  (manifest, written last)
+#
+# Until the manifest exists the API simply returns no srcset and clients use image_url.
+
+logger = logging.getLogger(__name__)
+
+VARIANTS_DIR = "variants"
+MIME_TYPES = {"webp": "image/webp", "avif": "image/avif"}
+
+_executor: Optional[Executor] = None
+_executor_lock = threading.Lock()
+# Manifests never change once written, so lookups are memoized. Misses (variants still
+# pending, Pillow absent, uploads older than the variant pipeline) are remembered briefly
+# so serializing a page does not hit the disk for every image; a finished job stores its
+# manifest right away.
+_manifests = TTLCache(maxsize=4096, ttl=3600)
+_missing = TTLCache(maxsize=4096, ttl=10)
+# The content_version.VARIANTS version this process last saw (observe_version)
+_seen_version = 0
+
+def _widths() -> List[int]:
+    return sorted(int(width) for width in settings.image_variant_widths.split(",") if width.strip())
+
+def _formats() -> List[str]:
+    return [fmt.strip() for fmt in settings.image_variant_formats.split(",") if fmt.strip()]
+
+def _variant_stem(url: str) -> Path:
+    # /uploads/<dir>/<name>.<ext> -> uploads/variants/<dir>/<name>
+    relative = Path(url.lstrip("/")).relative_to("uploads")
+    return Path("uploads", VARIANTS_DIR, relative.with_suffix(""))
+
+def _format_supported(fmt: str) -> bool:
+    from PIL import features
+    try:
+        return bool(features.check(fmt))
+    except ValueError:  # feature unknown to this Pillow version
+        return False
+
+def generate_variants(source: str, stem: str, widths: List[int], formats: List[str]) -> Dict[str, List[int]]:
+    # Runs in the worker process: write <stem>_<width>.<fmt> for every width below the
+    # original's (or one at its own width for small images), then the manifest.
+    from PIL import Image, ImageOps
+
+    stem_path = Path(stem)
+    stem_path.parent.mkdir(parents=True, exist_ok=True)
+    with Image.open(source) as opened:
+        image = ImageOps.exif_transpose(opened)
+        image = image.convert("RGBA" if "A" in image.getbands() or "transparency" in image.info else "RGB")
+
+        sizes = [width for width in widths if width < image.width] or [image.width]
+        manifest: Dict[str, List[int]] = {}
+        for fmt in formats:
+            if not _format_supported(fmt):
+                continue
+            for width in sizes:
+                height = max(1, round(image.height * width / image.width))
+                target = stem_path.with_name(f"{stem_path.name}_{width}.{fmt}")
+                temp = target.with_name(f".{target.name}.part")
+                image.resize((width, height), Image.LANCZOS).save(temp, format=fmt.upper(), quality=80)
+                os.replace(temp, target)
+            manifest[fmt] = sizes
+
+    manifest_path = stem_path.with_suffix(".json")
+    temp = manifest_path.with_name(f".{manifest_path.name}.part")
+    temp.write_text(json.dumps(manifest))
+    os.replace(temp, manifest_path)
+    return manifest
+
+def _get_executor() -> Executor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            if settings.image_variant_workers > 0:
+                _executor = ProcessPoolExecutor(max_workers=settings.image_variant_workers)
+            else:
+                _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="image-variants")
+        return _executor
+
+def shutdown_executor(wait: bool = False) -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=wait, cancel_futures=not wait)
+            _executor = None
+
+def _job_done(url: str, future: Future) -> None:
+    if future.cancelled():
+        return
+    if future.exception() is not None:
+        logger.warning("Image variants for %s failed: %s", url, future.exception())
+        return
+    manifest = _load_manifest(url)
+    if manifest is not None:
+        _manifests.set(url, manifest)
+        # Responses that showed this image without a srcset must not stay valid
+        # under their old ETags
+        db = SessionLocal()
+        try:
+            _bump_version(db)
+        except SQLAlchemyError:
+            logger.warning("Could not bump the variants version for %s", url, exc_info=True)
+        finally:
+            db.close()
+
+@retry_on_locked
+def _bump_version(db) -> None:
+    content_version.bump_version(db, content_version.VARIANTS)
+    db.commit()
+
+def observe_version(version: int) -> None:
+    # Call with the VARIANTS version a request read (the ETag validators): a change means a
+    # job finished, possibly in another worker process, so remembered misses may be stale
+    global _seen_version
+    if version != _seen_version:
+        _seen_version = version
+        _missing.clear()
+
+def schedule(url: Optional[str]) -> Optional[Future]:
+    # Queue variant generation for a freshly saved /uploads/... image; returns immediately
+    if not PILLOW_AVAILABLE or not url or not _widths():
+        return None
+    source = Path(url.lstrip("/")).resolve()
+    stem = _variant_stem(url).resolve()
+    future = _get_executor().submit(generate_variants, str(source), str(stem), _widths(), _formats())
+    future.add_done_callback(lambda done: _job_done(url, done))
+    return future
+
+def _load_manifest(url: str) -> Optional[Dict[str, str]]:
+    stem = _variant_stem(url)
+    try:
+        manifest = json.loads(stem.with_suffix(".json").read_text())
+    except (OSError, ValueError):
+        return None
+    url_stem = "/" + stem.as_posix()
+    return {
+        MIME_TYPES.get(fmt, f"image/{fmt}"): ", ".join(f"{url_stem}_{width}.{fmt} {width}w" for width in widths)
+        for fmt, widths in manifest.items()
+    }
+
+def srcset(url: Optional[str]) -> Dict[str, str]:
+    # {"image/webp": "/uploads/variants/..._96.webp 96w, ...", ...} for the variants on disk
+    if not url or not url.startswith("/uploads/") or url.startswith(f"/uploads/{VARIANTS_DIR}/"):
+        return {}
+    cached = _manifests.get(url)
+    if cached is not None:
+        return cached
+    if _missing.get(url) is not None:
+        return {}
+
+    result = _load_manifest(url)
+    if result is None:
+        _missing.set(url, True)
+        return {}
+    _manifests.set(url, result)
+    return result
+
+def remove_variants(url: Optional[str]) -> None:
+    # Delete the variants and manifest of an image that is being removed
+    if not url or not url.startswith("/uploads/"):
+        return
+    stem = _variant_stem(url)
+    _manifests.pop(url)
+    _missing.pop(url)
+    if stem.parent.is_dir():
+        for path in stem.parent.glob(f"{stem.name}_[0-9]*"):
+            path.unlink(missing_ok=True)
+    stem.with_suffix(".json").unlink(missing_ok=True)
@@ -0,0 +1,20 @@
+from typing import List
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+import models, schemas
+from crud import like as like_crud
+
+def toggle_like(db: Session, post_id: int, user_id: int) -> dict:
+    db_post = db.get(models.Post, post_id)
+    if db_post is None:
+        raise HTTPException(status_code=404, detail="Post not found")
+
+    is_liked = like_crud.toggle_like(db, user_id, post_id)
+    db.refresh(db_post)
+    return {"is_liked_by_user": is_liked, "likes_count": db_post.likes_count}
+
+def get_likes(db: Session, post_id: int) -> List[schemas.Like]:
+    db_post = db.get(models.Post, post_id)
+    if db_post is None:
+        raise HTTPException(status_code=404, detail="Post not found")
+    return [schemas.Like.model_validate(like) for like in db_post.likes]
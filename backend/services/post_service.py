@@ -1,57 +1,174 @@
+from datetime import datetime
 from fastapi import HTTPException
 from sqlalchemy.orm import Session
 from crud import user as user_crud
 import models, schemas
-from typing import List, Optional
+from typing import List, Optional, Set, Tuple
 from crud import post as post_crud
+from crud import like as like_crud
+from crud import content_version
+from crud import search as search_crud
+from services import image_variants, timeline
+from services.user_service import user_data
+from core.etag import latest, make_etag
+from core.config import settings
+from core.pagination import decode_cursor, decode_rank_cursor, encode_cursor, encode_rank_cursor
 
-def get_posts_with_metadata(db: Session, current_user: Optional[models.User], skip: int = 0, limit: int = 100) -> List[dict]:
-    posts = post_crud.get_posts(db, skip=skip, limit=limit)
-    current_user_id: Optional[int] = getattr(current_user, 'id', None) if current_user is not None else None
-
-    result = []
-    for post in posts:
-        post_dict = {
-            "id": post.id,
-            "text": post.text,
-            "timestamp": post.timestamp,
-            "owner": post.owner,
-            "image_url": post.image_url,
-            "replies": [
-                schemas.PostReply(
-                    id=reply.id,
-                    text=reply.text,
-                    timestamp=reply.timestamp,
-                    owner=reply.owner,
-                    likes_count=len(reply.likes),
-                    is_liked_by_user=any(like.user_id == current_user_id for like in reply.likes) if current_user_id is not None else False
-                ) for reply in post.replies
-            ],
-            "likes_count": len(post.likes),
-            "is_liked_by_user": any(like.user_id == current_user_id for like in post.likes) if current_user_id is not None else False
-        }
-        result.append(post_dict)
-
-    return result
-
-def delete_post(db: Session, post_id: int, current_user_id: int):
-    # Check ownership before deletion
-    db_post = post_crud.get_post(db, post_id)
+def get_posts_with_metadata(db: Session, current_user: Optional[models.User], skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+    # Returns the page and the cursor of the next page (None when this page is the last one).
+    # Each post carries only the first settings.reply_preview_limit replies plus replies_count;
+    # the rest of a thread is paged through get_replies_with_metadata.
+    decoded_cursor = _decode_cursor(cursor)
+    # The first pages come from the timeline cache: an ID list plus a primary-key hydrate
+    page_ids = timeline.get_page_ids(db, skip, limit) if decoded_cursor is None else None
+    if page_ids is not None:
+        posts = post_crud.get_posts_by_ids(db, page_ids)
+    else:
+        posts = post_crud.get_posts(db, skip=skip, limit=limit, cursor=decoded_cursor)
+    previews = post_crud.get_reply_previews(db, [post.id for post in posts], settings.reply_preview_limit)
+
+    page_ids = [post.id for post in posts] + [reply.id for replies in previews.values() for reply in replies]
+    liked_ids = like_crud.get_liked_post_ids(db, getattr(current_user, 'id', None), page_ids)
+    result = [_post_to_dict(post, previews.get(post.id, []), liked_ids) for post in posts]
+
+    return result, _next_cursor(posts, limit)
+
+def get_post_with_metadata(db: Session, post_id: int, current_user: Optional[models.User]) -> dict:
+    post = post_crud.get_post(db, post_id)
+    if post is None:
+        raise HTTPException(status_code=404, detail="Post not found")
+    page_ids = [post.id] + [reply.id for reply in post.replies]
+    liked_ids = like_crud.get_liked_post_ids(db, getattr(current_user, 'id', None), page_ids)
+    return _post_to_dict(post, post.replies, liked_ids)
+
+def get_replies_with_metadata(db: Session, post_id: int, current_user: Optional[models.User], limit: int = 20, cursor: Optional[str] = None) -> Tuple[List[schemas.PostReply], Optional[str]]:
+    # Returns a page of replies (oldest first) and the cursor of the next page
+    ensure_post_exists(db, post_id)
+
+    replies = post_crud.get_replies(db, post_id, limit=limit, cursor=_decode_cursor(cursor))
+    liked_ids = like_crud.get_liked_post_ids(db, getattr(current_user, 'id', None), [reply.id for reply in replies])
+    return [_reply_to_schema(reply, liked_ids) for reply in replies], _next_cursor(replies, limit)
+
+def search_posts(db: Session, current_user: Optional[models.User], query: str, limit: int = 20, cursor: Optional[str] = None) -> Tuple[List[schemas.SearchResult], Optional[str]]:
+    # Posts and replies matching query, best first, and the cursor of the next page
+    try:
+        after = decode_rank_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    hits = search_crud.search_post_ids(db, query, limit, after)
+    posts = post_crud.get_posts_by_ids(db, [post_id for post_id, _ in hits])
+    liked_ids = like_crud.get_liked_post_ids(db, getattr(current_user, 'id', None), [post.id for post in posts])
+
+    results = [_search_result(post, liked_ids) for post in posts]
+    next_cursor = encode_rank_cursor(hits[-1][1], hits[-1][0]) if limit > 0 and len(hits) == limit else None
+    return results, next_cursor
+
+def get_feed_validators(db: Session, viewer_id: Optional[int], skip: int, limit: int, cursor: Optional[str]):
+    # (etag, last_modified) of a feed page, from the global versions only (no post rows loaded)
+    versions = content_version.get_versions(db, content_version.POSTS, content_version.USERS, content_version.VARIANTS)
+    image_variants.observe_version(versions[content_version.VARIANTS][0])
+    etag = make_etag("feed", skip, limit, cursor, viewer_id, settings.reply_preview_limit,
+                     *(version for version, _ in versions.values()))
+    return etag, latest(*(updated_at for _, updated_at in versions.values()))
+
+def get_post_validators(db: Session, post_id: int, viewer_id: Optional[int]):
+    # (etag, last_modified) of a post detail, or (None, None) if the post does not exist
+    thread_updated_at, thread_rows = post_crud.get_thread_version(db, post_id)
+    if not thread_rows:
+        return None, None
+    versions = content_version.get_versions(db, content_version.USERS, content_version.VARIANTS)
+    image_variants.observe_version(versions[content_version.VARIANTS][0])
+    etag = make_etag("post", post_id, viewer_id, thread_updated_at, thread_rows,
+                     *(version for version, _ in versions.values()))
+    return etag, latest(thread_updated_at, *(updated_at for _, updated_at in versions.values()))
+
+def _decode_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, int]]:
+    if not cursor:
+        return None
+    try:
+        return decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _next_cursor(rows: List[models.Post], limit: int) -> Optional[str]:
+    # A full page means there may be more rows after the last one
+    if limit > 0 and len(rows) == limit:
+        return encode_cursor(rows[-1].timestamp, rows[-1].id)  # type: ignore
+    return None
+
+def _reply_to_schema(reply: models.Post, liked_ids: Set[int]) -> schemas.PostReply:
+    return schemas.PostReply(
+        id=reply.id,
+        text=reply.text,
+        image_url=reply.image_url,
+        image_srcset=image_variants.srcset(reply.image_url),  # type: ignore
+        timestamp=reply.timestamp,
+        owner=user_data(reply.owner),
+        likes_count=reply.likes_count,
+        is_liked_by_user=reply.id in liked_ids
+    )
+
+def _search_result(post: models.Post, liked_ids: Set[int]) -> schemas.SearchResult:
+    return schemas.SearchResult(
+        id=post.id,
+        text=post.text,
+        image_url=post.image_url,
+        image_srcset=image_variants.srcset(post.image_url),  # type: ignore
+        timestamp=post.timestamp,
+        owner=user_data(post.owner),
+        likes_count=post.likes_count,
+        is_liked_by_user=post.id in liked_ids,
+        parent_id=post.parent_id
+    )
+
+def _post_to_dict(post: models.Post, replies: List[models.Post], liked_ids: Set[int]) -> dict:
+    return {
+        "id": post.id,
+        "text": post.text,
+        "timestamp": post.timestamp,
+        "owner": user_data(post.owner),
+        "image_url": post.image_url,
+        "image_srcset": image_variants.srcset(post.image_url),  # type: ignore
+        "replies": [_reply_to_schema(reply, liked_ids) for reply in replies],
+        "likes_count": post.likes_count,
+        "replies_count": post.replies_count,
+        "is_liked_by_user": post.id in liked_ids
+    }
+
+def delete_post(db: Session, post_id: int, current_user_id: int) -> List[str]:
+    # Check ownership before deletion; returns the image URLs to unlink
+    db_post = db.get(models.Post, post_id)
     if not db_post:
         raise HTTPException(status_code=404, detail="Post not found")
     
     if db_post.owner_id != current_user_id:  # type: ignore
         raise HTTPException(status_code=403, detail="Not authorized to delete this post")
     
-    post_crud.delete_post(db, post_id)
+    released, timeline_version = post_crud.delete_post(db, post_id)
+    if timeline_version is not None:
+        timeline.on_post_deleted(post_id, timeline_version)
+    return released
 
 def update_post(db: Session, post_id: int, new_text: str, current_user_id: int):
     # Check ownership before update
-    db_post = post_crud.get_post(db, post_id)
+    db_post = db.get(models.Post, post_id)
     if not db_post:
         raise HTTPException(status_code=404, detail="Post not found")
     
     if db_post.owner_id != current_user_id:  # type: ignore
         raise HTTPException(status_code=403, detail="Not authorized to update this post")
     
-    return post_crud.update_post(db, post_id, new_text)
\ No newline at end of file
+    db_post = post_crud.update_post(db, post_id, new_text)
+    page_ids = [db_post.id] + [reply.id for reply in db_post.replies]  # type: ignore
+    return _post_to_dict(db_post, db_post.replies, like_crud.get_liked_post_ids(db, current_user_id, page_ids))  # type: ignore
+
+def ensure_post_exists(db: Session, post_id: int, detail: str = "Post not found"):
+    if db.get(models.Post, post_id) is None:
+        raise HTTPException(status_code=404, detail=detail)
+
+def create_post(db: Session, post: schemas.PostCreate, owner_id: int, parent_id: Optional[int] = None) -> dict:
+    # Create a post or, with parent_id, a reply
+    db_post, timeline_version = post_crud.create_post(db, post, owner_id=owner_id, parent_id=parent_id)
+    if timeline_version is not None:
+        timeline.on_post_created(db_post.id, timeline_version)  # type: ignore
+    return _post_to_dict(db_post, [], set())
\ No newline at end of file
@@ -0,0 +1,175 @@
+import logging
+import threading
+from typing import List, Optional, Tuple
+from sqlalchemy.orm import Session
+from core.config import settings
+from crud import content_version
+from crud import post as post_crud
+
+# Cache of the newest top-level post IDs, so the first feed pages are an ID-list read
+# plus a primary-key hydrate instead of the ORDER BY timestamp query.
+#
+# Entries are tagged with the "timeline" content version, which create/delete of
+# top-level posts bump in their transaction. A backend only applies push/remove when it
+# is exactly one version behind; otherwise (another worker wrote in between) it drops its
+# state and the next read rebuilds it from the database. That keeps per-worker memory
+# caches correct across the uvicorn workers; the Redis backend is shared by all of them.
+# A backend failure (Redis down) is a cache miss: reads fall back to the database, and a
+# push/remove that did not apply leaves the cache a version behind, so it gets rebuilt.
+
+logger = logging.getLogger(__name__)
+
+# (version, ids newest first, complete: ids hold the whole timeline)
+TimelineState = Tuple[int, List[int], bool]
+
+class MemoryTimelineBackend:
+    # Exceptions of the backend that mean "cache unavailable"
+    errors: Tuple[type, ...] = ()
+
+    def __init__(self, size: int):
+        self.size = size
+        self._state: Optional[TimelineState] = None
+        self._lock = threading.Lock()
+
+    def load(self) -> Optional[TimelineState]:
+        with self._lock:
+            return self._state
+
+    def store(self, version: int, ids: List[int], complete: bool):
+        with self._lock:
+            self._state = (version, list(ids[:self.size]), complete and len(ids) <= self.size)
+
+    def push(self, post_id: int, version: int):
+        with self._lock:
+            if self._state is None or self._state[0] != version - 1:
+                self._state = None
+                return
+            _, ids, complete = self._state
+            ids = [post_id] + ids
+            if len(ids) > self.size:
+                ids, complete = ids[:self.size], False
+            self._state = (version, ids, complete)
+
+    def remove(self, post_id: int, version: int):
+        with self._lock:
+            if self._state is None or self._state[0] != version - 1:
+                self._state = None
+                return
+            _, ids, complete = self._state
+            self._state = (version, [i for i in ids if i != post_id], complete)
+
+    def clear(self):
+        with self._lock:
+            self._state = None
+
+class RedisTimelineBackend:
+    # Works against any Redis-protocol server (Redis, Valkey, KeyDB, or fakeredis locally)
+    def __init__(self, size: int, url: str, prefix: str = "timeline", client=None):
+        import redis  # optional dependency, only needed for TIMELINE_BACKEND=redis
+        if client is None:
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.errors = (redis.RedisError,)
+        self.size = size
+        self.ids_key = f"{prefix}:ids"
+        self.meta_key = f"{prefix}:meta"
+
+    def load(self) -> Optional[TimelineState]:
+        pipe = self.client.pipeline(transaction=True)
+        pipe.hgetall(self.meta_key)
+        pipe.lrange(self.ids_key, 0, -1)
+        meta, ids = pipe.execute()
+        if not meta:
+            return None
+        return int(meta[b"version"]), [int(i) for i in ids], meta[b"complete"] == b"1"
+
+    def store(self, version: int, ids: List[int], complete: bool):
+        ids = ids[:self.size]
+        pipe = self.client.pipeline(transaction=True)
+        pipe.delete(self.ids_key, self.meta_key)
+        if ids:
+            pipe.rpush(self.ids_key, *ids)
+        pipe.hset(self.meta_key, mapping={"version": version, "complete": int(complete and len(ids) <= self.size)})
+        pipe.execute()
+
+    def push(self, post_id: int, version: int):
+        self._update(version, lambda pipe: (
+            pipe.lpush(self.ids_key, post_id),
+            pipe.ltrim(self.ids_key, 0, self.size - 1),
+        ), grows=True)
+
+    def remove(self, post_id: int, version: int):
+        self._update(version, lambda pipe: pipe.lrem(self.ids_key, 0, post_id), grows=False)
+
+    def clear(self):
+        self.client.delete(self.ids_key, self.meta_key)
+
+    def _update(self, version: int, apply, grows: bool):
+        # Optimistic transaction: only one version step is applied, anything else resets
+        import redis
+        with self.client.pipeline(transaction=True) as pipe:
+            try:
+                pipe.watch(self.meta_key, self.ids_key)
+                meta = pipe.hgetall(self.meta_key)
+                if not meta or int(meta[b"version"]) != version - 1:
+                    pipe.multi()
+                    pipe.delete(self.ids_key, self.meta_key)
+                    pipe.execute()
+                    return
+                full = pipe.llen(self.ids_key) >= self.size
+                pipe.multi()
+                apply(pipe)
+                pipe.hset(self.meta_key, "version", version)
+                if grows and full:
+                    pipe.hset(self.meta_key, "complete", 0)
+                pipe.execute()
+            except redis.WatchError:
+                self.client.delete(self.ids_key, self.meta_key)
+
+def _create_backend():
+    if settings.timeline_backend == "memory":
+        return MemoryTimelineBackend(settings.timeline_cache_size)
+    if settings.timeline_backend == "redis":
+        return RedisTimelineBackend(settings.timeline_cache_size, settings.timeline_redis_url)
+    return None
+
+backend = _create_backend()
+
+def get_page_ids(db: Session, skip: int, limit: int) -> Optional[List[int]]:
+    # IDs of a feed page from the cache, or None when the page is not covered by it
+    if backend is None or skip + limit > settings.timeline_cache_size:
+        return None
+
+    version = content_version.get_versions(db, content_version.TIMELINE)[content_version.TIMELINE][0]
+    try:
+        state = backend.load()
+        if state is None or state[0] != version:
+            ids = post_crud.get_top_level_post_ids(db, limit=settings.timeline_cache_size + 1)
+            state = (version, ids[:settings.timeline_cache_size], len(ids) <= settings.timeline_cache_size)
+            backend.store(*state)
+    except backend.errors:
+        logger.warning("Timeline cache unavailable, reading the feed from the database", exc_info=True)
+        return None
+
+    _, ids, complete = state
+    if skip + limit > len(ids) and not complete:
+        return None
+    return ids[skip:skip + limit]
+
+def on_post_created(post_id: int, version: int):
+    # Call after a top-level post is committed, with the timeline version its transaction
+    # produced (crud.post.create_post)
+    if backend is not None:
+        try:
+            backend.push(post_id, version)
+        except backend.errors:
+            logger.warning("Timeline cache unavailable, post %s not pushed", post_id, exc_info=True)
+
+def on_post_deleted(post_id: int, version: int):
+    # Call after a top-level post is deleted and committed, with the timeline version its
+    # transaction produced (crud.post.delete_post)
+    if backend is not None:
+        try:
+            backend.remove(post_id, version)
+        except backend.errors:
+            logger.warning("Timeline cache unavailable, post %s not removed", post_id, exc_info=True)
@@ -0,0 +1,147 @@
+import hashlib
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Optional
+
+import anyio
+from fastapi import HTTPException, UploadFile
+
+from core import metrics
+from core.config import settings
+from crud import blob as blob_crud
+from services import image_variants
+
+# Shared upload handling for post, reply and avatar images.
+# The upload is copied chunk by chunk with async file I/O, the byte limit is checked as
+# chunks arrive, the type comes from the file's magic bytes (not its name or the
+# client's Content-Type), and the file only appears under its final name once complete.
+#
+# Files are content-addressed: the name is the SHA-256 of the bytes, computed while
+# streaming, so identical uploads share one file (uploads/blobs/ab/cd/<sha256>.<ext>)
+# and a URL never changes meaning. crud/blob.py counts the references to each file.
+
+UPLOAD_ROOT = Path("uploads")
+BLOB_ROOT = UPLOAD_ROOT / "blobs"
+CHUNK_SIZE = 64 * 1024
+
+# Accepted image types, by the extension they are stored with
+IMAGE_TYPES = {".png", ".jpg", ".gif", ".webp"}
+AVATAR_TYPES = {".png", ".jpg", ".gif"}
+
+_SIGNATURES: Dict[bytes, str] = {
+    b"\x89PNG\r\n\x1a\n": ".png",
+    b"\xff\xd8\xff": ".jpg",
+    b"GIF87a": ".gif",
+    b"GIF89a": ".gif",
+}
+
+def prepare_upload_dirs() -> None:
+    # Called once at startup (main.lifespan), not at import
+    (BLOB_ROOT / ".incoming").mkdir(parents=True, exist_ok=True)
+
+def sniff_image_type(head: bytes) -> Optional[str]:
+    # Extension of the image format the first bytes belong to, or None
+    for signature, extension in _SIGNATURES.items():
+        if head.startswith(signature):
+            return extension
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return ".webp"
+    return None
+
+def _too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"File size exceeds {max_bytes // (1024 * 1024)}MB limit.",
+    )
+
+def _blob_key(digest: str, extension: str) -> str:
+    # Sharded by the first two byte pairs so no directory grows past 65536 entries
+    return f"{digest[:2]}/{digest[2:4]}/{digest}{extension}"
+
+def _place_blob(temp_path: Path, final_path: Path) -> bool:
+    # Move a finished upload into the store; False when the content was already stored
+    try:
+        os.utime(final_path)  # marks the blob as in use for remove_upload's grace period
+    except FileNotFoundError:
+        pass  # not stored, or removed by blob GC just now: store this copy
+    else:
+        temp_path.unlink(missing_ok=True)
+        return False
+    final_path.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(temp_path, final_path)
+    return True
+
+async def save_image(upload: Optional[UploadFile], allowed_types=IMAGE_TYPES, max_bytes: Optional[int] = None) -> Optional[str]:
+    # Store an uploaded image in the blob store and return its URL (None when no file was sent).
+    # The caller records the reference with crud.blob.acquire in the write that uses the URL.
+    if upload is None or not upload.filename:
+        return None
+    max_bytes = max_bytes or settings.upload_max_bytes
+
+    head = await upload.read(CHUNK_SIZE)
+    extension = sniff_image_type(head)
+    if extension not in allowed_types:
+        raise HTTPException(status_code=400, detail=f"Invalid image format. Allowed formats: {', '.join(sorted(allowed_types))}")
+
+    incoming = BLOB_ROOT / ".incoming"
+    await anyio.Path(incoming).mkdir(parents=True, exist_ok=True)
+    temp_path = incoming / f"{uuid.uuid4().hex}.part"
+
+    size = 0
+    digest = hashlib.sha256()
+    try:
+        async with await anyio.open_file(temp_path, "wb") as buffer:
+            chunk = head
+            while chunk:
+                size += len(chunk)
+                if size > max_bytes:
+                    raise _too_large(max_bytes)
+                digest.update(chunk)
+                await buffer.write(chunk)
+                chunk = await upload.read(CHUNK_SIZE)
+        key = _blob_key(digest.hexdigest(), extension)  # type: ignore
+        stored = await anyio.to_thread.run_sync(_place_blob, temp_path, BLOB_ROOT / key)
+    except BaseException:
+        await anyio.Path(temp_path).unlink(missing_ok=True)
+        raise
+
+    url = blob_crud.BLOB_URL_PREFIX + key
+    metrics.UPLOADS.labels("stored" if stored else "deduplicated").inc()
+    metrics.UPLOAD_BYTES.inc(size)
+    if stored:
+        image_variants.schedule(url)
+    return url
+
+def is_legacy_avatar(url: Optional[str]) -> bool:
+    # A pre-blob avatar: a file directly in uploads/avatars, owned by one user only.
+    # The path is resolved, so "/uploads/avatars/../blobs/..." (a shared blob) is not one.
+    if not url or not url.startswith("/uploads/avatars/"):
+        return False
+    return Path(url.lstrip("/")).resolve().parent == (UPLOAD_ROOT / "avatars").resolve()
+
+def _unlink(path: Path, keep_if_newer_than: float) -> bool:
+    # False when the file was kept (touched within the grace period)
+    try:
+        if path.stat().st_mtime > keep_if_newer_than:
+            return False
+        path.unlink()
+    except FileNotFoundError:
+        pass
+    return True
+
+async def remove_upload(url: Optional[str]) -> None:
+    # Delete the file behind an /uploads/... URL that nothing references any more.
+    # Blobs touched within the grace period are kept: a concurrent upload of the same
+    # content may have found the file and be about to reference it (jobs/gc_blobs sweeps later).
+    if not url or not url.startswith("/uploads/"):
+        return
+    path = Path(url.lstrip("/"))
+    if UPLOAD_ROOT.resolve() not in path.resolve().parents:
+        return
+    # Only a legacy avatar belongs to a single user and can go at once
+    grace = 0 if is_legacy_avatar(url) else settings.blob_delete_grace_seconds
+    # A kept blob keeps its variants: a re-upload deduplicated onto it schedules none
+    if await anyio.to_thread.run_sync(_unlink, path, time.time() - grace):
+        await anyio.to_thread.run_sync(image_variants.remove_variants, url)
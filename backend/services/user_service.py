@@ -1,19 +1,167 @@
+import json
+import anyio
+from typing import Iterator, List, Optional, Tuple
 from fastapi import HTTPException
 from sqlalchemy.orm import Session
 from crud import user as user_crud
-import schemas
+from crud import blob as blob_crud
+from crud import content_version
+from services import image_variants, uploads
+from core.security import invalidate_principal
+from core.config import settings
+from database import DbSession, SessionLocal, retry_on_locked, run_db
+from core.etag import latest, make_etag
+import models, schemas
 
-def create_user_with_validation(db: Session, user: schemas.UserCreate):
+async def create_user_with_validation(db: DbSession, user: schemas.UserCreate):
     
     # Check username
-    db_user_by_name = user_crud.get_user_by_name(db, user.username)
+    db_user_by_name = await run_db(db, user_crud.get_user_by_name, user.username)
     if db_user_by_name:
         raise HTTPException(status_code=400, detail="Username already registered")
     
     # Check email
-    db_user_by_email = user_crud.get_user_by_email(db, user.email)
+    db_user_by_email = await run_db(db, user_crud.get_user_by_email, user.email)
     if db_user_by_email:
         raise HTTPException(status_code=400, detail="Email already registered")
     
     # Create user
-    return user_crud.create_user(db, user)
\ No newline at end of file
+    db_user = await user_crud.create_user(db, user)
+    return await anyio.to_thread.run_sync(user_data, db_user)
+
+def user_data(user: models.User) -> dict:
+    # A user as the User schema expects it, avatar variants resolved
+    return {
+        "id": user.id,
+        "username": user.username,
+        "email": user.email,
+        "avatar_url": user.avatar_url,
+        "avatar_srcset": image_variants.srcset(user.avatar_url),  # type: ignore
+    }
+
+def get_users(db: Session, skip: int = 0, limit: int = 100) -> List[dict]:
+    return [user_data(user) for user in user_crud.get_users(db, skip=skip, limit=limit)]
+
+def _with_srcsets(items: List[dict]) -> List[dict]:
+    # Resolve the image variants of the post/reply dicts built by crud/user.py
+    for item in items:
+        item["image_srcset"] = image_variants.srcset(item["image_url"])
+        item["owner"]["avatar_srcset"] = image_variants.srcset(item["owner"]["avatar_url"])
+        _with_srcsets(item.get("replies", []))
+    return items
+
+def get_user_profile(db: Session, user_id: int, current_user: Optional[models.User]) -> dict:
+    user = user_crud.get_user(db, user_id=user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    posts = _with_srcsets(user_crud.get_user_posts(db, user_id=user_id, current_user=current_user) or [])
+    comments = _with_srcsets(user_crud.get_user_replies(db, user_id=user_id, current_user=current_user) or [])
+
+    return {
+        **user_data(user),
+        "posts": posts,
+        "comments": comments,
+        "posts_count": len(posts),
+        "comments_count": len(comments)
+    }
+
+@retry_on_locked
+def update_profile(db: Session, current_user: models.User, user_update: schemas.UserUpdate) -> bool:
+    # Apply a profile update; returns True if the email (the token subject) changed
+    if user_update.username:
+        if user_crud.check_is_username_taken(db, user_update.username):
+            raise HTTPException(status_code=400, detail="Username already taken")
+        setattr(current_user, 'username', user_update.username)
+
+    # ✅ Update email if provided
+    old_email = current_user.email
+    email_changed = False
+    if user_update.email:
+        # Check if email is already registered
+        if user_crud.check_is_email_registered(db, user_update.email):
+            raise HTTPException(status_code=400, detail="Email already taken")
+        setattr(current_user, 'email', user_update.email)
+        email_changed = True
+    
+    # ✅ IMPORTANT: commit changes to the DB
+    content_version.bump_version(db, content_version.USERS)
+    db.commit()
+    invalidate_principal(old_email, current_user.email)  # type: ignore
+    db.refresh(current_user)
+    return email_changed
+
+@retry_on_locked
+def set_avatar_url(db: Session, current_user: models.User, avatar_url: Optional[str]) -> List[str]:
+    # Point the user at a new avatar (or none); returns the file URLs to unlink after commit
+    old_avatar_url = current_user.avatar_url
+    blob_crud.acquire(db, avatar_url)
+    released = blob_crud.release(db, old_avatar_url)  # type: ignore
+    if uploads.is_legacy_avatar(old_avatar_url):  # type: ignore
+        released.append(old_avatar_url)  # type: ignore  # pre-blob avatars were never shared
+    setattr(current_user, 'avatar_url', avatar_url)
+    content_version.bump_version(db, content_version.USERS)
+    db.commit()
+    invalidate_principal(current_user.email)  # type: ignore
+    db.refresh(current_user)
+    return released
+
+def get_profile_validators(db: Session, user_id: int, viewer_id: Optional[int]):
+    # (etag, last_modified) of GET /users/{user_id}: the profile lists posts, replies and likes
+    # of many users, so it follows the global versions rather than per-row timestamps
+    versions = content_version.get_versions(db, content_version.POSTS, content_version.USERS, content_version.VARIANTS)
+    image_variants.observe_version(versions[content_version.VARIANTS][0])
+    etag = make_etag("profile", user_id, viewer_id, *(version for version, _ in versions.values()))
+    return etag, latest(*(updated_at for _, updated_at in versions.values()))
+
+# Data export (GET /users/{user_id}/export): NDJSON, one object per line, in three sections:
+# the user, then their posts and replies by id, then their likes by id. Every line has
+# "kind" and "id"; after=<kind>:<id> of the last line received resumes right after it.
+EXPORT_MEDIA_TYPE = "application/x-ndjson"
+_EXPORT_SECTIONS = {"user": 0, "post": 1, "reply": 1, "like": 2}
+
+def parse_export_cursor(after: Optional[str]) -> Tuple[int, int]:
+    # (section, id) to resume after; (0, 0) starts from the beginning
+    if not after:
+        return 0, 0
+    kind, _, raw_id = after.partition(":")
+    if kind not in _EXPORT_SECTIONS or not raw_id.isdigit():
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if kind == "user":
+        return 1, 0
+    return _EXPORT_SECTIONS[kind], int(raw_id)
+
+def _ndjson(rows: List[dict]) -> bytes:
+    return "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows).encode("utf-8")
+
+def _isoformat(value) -> Optional[str]:
+    return value.isoformat() if value is not None else None
+
+def iter_user_export(user_id: int, section: int = 0, after_id: int = 0) -> Iterator[bytes]:
+    # Yields one chunk per batch of rows, so memory stays flat however large the account.
+    # It runs while the response streams, after the request's own session is released,
+    # so it opens (and always closes) a session of its own.
+    db = SessionLocal()
+    try:
+        if section <= 0:
+            user = user_crud.get_user(db, user_id)
+            if user is None:
+                return
+            yield _ndjson([{
+                "kind": "user", "id": user.id, "username": user.username,
+                "email": user.email, "avatar_url": user.avatar_url,
+            }])
+        if section <= 1:
+            for batch in user_crud.iter_user_posts(db, user_id, after_id if section == 1 else 0, settings.export_batch_size):
+                yield _ndjson([{
+                    "kind": "reply" if row.parent_id is not None else "post", "id": row.id,
+                    "parent_id": row.parent_id, "text": row.text, "image_url": row.image_url,
+                    "timestamp": _isoformat(row.timestamp),
+                    "likes_count": row.likes_count, "replies_count": row.replies_count,
+                } for row in batch])
+        for batch in user_crud.iter_user_likes(db, user_id, after_id if section == 2 else 0, settings.export_batch_size):
+            yield _ndjson([{
+                "kind": "like", "id": row.id, "post_id": row.post_id, "timestamp": _isoformat(row.timestamp),
+            } for row in batch])
+    finally:
+        db.close()
@@ -3,14 +3,23 @@ import time
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
 from sqlalchemy.orm import sessionmaker
 
+# The app's own engine (used by the lifespan hook) points at the test database too
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+os.environ["DATABASE_URL"] = SQLALCHEMY_DATABASE_URL
+
 from main import app
 from database import Base
 from dependencies import get_db
+from core import query_tracker
+from core.security import principal_cache
+from services import timeline
+from migrations import runner as migrations
 
 # Тестова база даних
-SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
 test_engine = create_engine(
     SQLALCHEMY_DATABASE_URL, 
     connect_args={"check_same_thread": False}
@@ -36,7 +45,7 @@ def setup_test_database():
             except:
                 pass
     
-    Base.metadata.create_all(bind=test_engine)
+    migrations.upgrade(test_engine)
     yield
     test_engine.dispose()
 
@@ -51,8 +60,30 @@ def clear_database():
         db.commit()
     finally:
         db.close()
+    principal_cache.clear()
+    if timeline.backend is not None:
+        timeline.backend.clear()
     yield
 
+@pytest.fixture
+def db_session():
+    """Сесія до тестової БД для перевірок напряму через crud"""
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+@pytest.fixture
+def query_budget():
+    """Обмеження кількості SQL-запитів для блоку коду (і перевірка на N+1):
+
+        with query_budget(8):
+            client.get("/posts/")
+    """
+    query_tracker.instrument_engine(test_engine)
+    return query_tracker.query_budget
+
 @pytest.fixture
 def client():
     """Fixture для TestClient"""
@@ -68,6 +99,23 @@ def client():
     with TestClient(app) as test_client:
         yield test_client
 
+@pytest.fixture
+def async_client():
+    """TestClient, у якому запити отримують AsyncSession (режим DATABASE_ASYNC)"""
+    async_engine = create_async_engine("sqlite+aiosqlite:///./test.db", poolclass=NullPool)
+    AsyncTestingSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+    async def override_get_db():
+        async with AsyncTestingSessionLocal() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = override_get_db
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+    app.dependency_overrides.clear()
+
 @pytest.fixture
 def auth_token(client):
     """Helper fixture для отримання токену"""
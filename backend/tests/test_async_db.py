@@ -0,0 +1,40 @@
+def test_api_flow_with_async_session(async_client):
+    """Основні ендпоінти працюють з AsyncSession"""
+    client = async_client
+    assert client.post(
+        "/auth/register",
+        json={"username": "asyncuser", "email": "async@test.com", "password": "async12345"}
+    ).status_code == 200
+    token = client.post(
+        "/auth/login",
+        json={"email": "async@test.com", "password": "async12345"}
+    ).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    post = client.post("/posts/", data={"text": "Async post"}, headers=headers)
+    assert post.status_code == 201
+    assert post.json()["owner"]["username"] == "asyncuser"
+    post_id = post.json()["id"]
+
+    reply = client.post(f"/posts/{post_id}/replies", data={"text": "Async reply"}, headers=headers)
+    assert reply.status_code == 201
+
+    assert client.post(f"/posts/{post_id}/like", headers=headers).json() == {"is_liked_by_user": True, "likes_count": 1}
+
+    feed = client.get("/posts/", headers=headers).json()
+    assert feed[0]["is_liked_by_user"] is True
+    assert feed[0]["replies"][0]["text"] == "Async reply"
+
+    detail = client.get(f"/posts/{post_id}", headers=headers).json()
+    assert detail["replies_count"] == 1
+
+    updated = client.put(f"/posts/{post_id}", data={"text": "Edited"}, headers=headers)
+    assert updated.json()["text"] == "Edited"
+
+    user_id = client.get("/auth/me", headers=headers).json()["id"]
+    profile = client.get(f"/users/{user_id}", headers=headers).json()
+    assert profile["posts_count"] == 1
+
+    assert client.put("/users/me", json={"username": "asyncrenamed"}, headers=headers).status_code == 200
+    assert client.delete(f"/posts/{post_id}", headers=headers).status_code == 204
+    assert client.get(f"/posts/{post_id}").status_code == 404
@@ -70,4 +70,49 @@ def test_login_wrong_password(client):
             "password": "wrong123"
         }
     )
-    assert response.status_code == 400
\ No newline at end of file
+    assert response.status_code == 400
+
+def test_login_rehashes_when_cost_changes(client, db_session, monkeypatch):
+    """Тест прозорого перехешування пароля після зміни cost factor"""
+    import models
+    from core.config import settings
+    from core.passwords import hash_stats
+
+    monkeypatch.setattr(settings, "bcrypt_rounds", 4)
+    client.post(
+        "/auth/register",
+        json={"username": "rehash123", "email": "rehash123@test.com", "password": "rehash12345"}
+    )
+    user = db_session.query(models.User).filter(models.User.email == "rehash123@test.com").one()
+    assert user.hashed_password.startswith("$2b$04$")
+
+    hashed_before = hash_stats["count"]
+    monkeypatch.setattr(settings, "bcrypt_rounds", 5)
+    response = client.post("/auth/login", json={"email": "rehash123@test.com", "password": "rehash12345"})
+    assert response.status_code == 200
+    assert hash_stats["count"] == hashed_before + 2
+
+    db_session.refresh(user)
+    assert user.hashed_password.startswith("$2b$05$")
+
+def test_password_pool_recovers_from_dead_worker(monkeypatch):
+    """Після загибелі процесу bcrypt пул перезапускається, а не ламає всі логіни"""
+    import asyncio
+    import os
+    from concurrent.futures.process import BrokenProcessPool
+
+    import pytest
+    from core import passwords
+    from core.config import settings
+
+    monkeypatch.setattr(settings, "password_hash_workers", 1)
+    monkeypatch.setattr(settings, "bcrypt_rounds", 4)
+    passwords.shutdown_executor()
+    try:
+        with pytest.raises(BrokenProcessPool):
+            passwords._get_executor().submit(os._exit, 1).result()
+
+        hashed = asyncio.run(passwords.hash_password("secret123"))
+        assert asyncio.run(passwords.verify_password("secret123", hashed))
+    finally:
+        passwords.shutdown_executor()
@@ -0,0 +1,92 @@
+import json
+
+import pytest
+
+import models
+from core.config import settings
+from services import bulk_import
+
+def _ndjson(*records):
+    return "".join(json.dumps(record) + "\n" for record in records)
+
+def test_bulk_import_endpoint(client, monkeypatch):
+    """Імпорт NDJSON: перемаплення id, відповіді раніше за батьків, лічильники після імпорту"""
+    monkeypatch.setattr(settings, "bulk_import_token", "secret")
+    monkeypatch.setattr(settings, "bulk_import_batch_size", 2)
+    body = _ndjson(
+        {"kind": "user", "id": "u1", "username": "imported", "email": "imported@test.com", "password": "imported123"},
+        {"kind": "reply", "id": "r2", "owner_id": "u1", "parent_id": "r1", "text": "Nested reply"},
+        {"kind": "reply", "id": "r1", "owner_id": "u1", "parent_id": "p1", "text": "First reply"},
+        {"kind": "like", "user_id": "u1", "post_id": "p1"},
+        {"kind": "post", "id": "p1", "owner_id": "u1", "text": "Imported post", "timestamp": "2020-01-01T00:00:00"},
+        {"kind": "like", "user_id": "u1", "post_id": "p1"},
+    ) + "not json\n"
+
+    response = client.post("/admin/import", content=body, headers={"X-Import-Token": "secret"})
+    assert response.status_code == 200
+    stats = response.json()
+    assert (stats["users"], stats["posts"], stats["replies"], stats["likes"]) == (1, 1, 2, 1)
+    assert stats["skipped"] == 2  # дубльований лайк і некоректний рядок
+    assert stats["rows_per_second"] > 0
+
+    token = client.post("/auth/login", json={"email": "imported@test.com", "password": "imported123"}).json()["access_token"]
+    feed = client.get("/posts/", headers={"Authorization": f"Bearer {token}"}).json()
+    assert len(feed) == 1
+    post = feed[0]
+    assert post["text"] == "Imported post"
+    assert post["likes_count"] == 1 and post["is_liked_by_user"]
+    assert post["replies_count"] == 1
+    assert post["replies"][0]["text"] == "First reply"
+
+    replies = client.get(f"/posts/{post['replies'][0]['id']}/replies").json()
+    assert [reply["text"] for reply in replies] == ["Nested reply"]
+
+def test_bulk_import_requires_token(client, monkeypatch):
+    """Без BULK_IMPORT_TOKEN ендпоінту немає; з неправильним токеном - 401"""
+    monkeypatch.setattr(settings, "bulk_import_token", "")
+    assert client.post("/admin/import", content="").status_code == 404
+
+    monkeypatch.setattr(settings, "bulk_import_token", "secret")
+    assert client.post("/admin/import", content="", headers={"X-Import-Token": "wrong"}).status_code == 401
+
+def test_import_lines_merges_existing_users(client, auth_token, db_session):
+    """Користувач з наявним email зливається з існуючим акаунтом; імпортоване шукається"""
+    token = auth_token("existing", "existing@test.com", "existing123")
+    headers = {"Authorization": f"Bearer {token}"}
+    lines = _ndjson(
+        {"kind": "user", "id": 7, "username": "whatever", "email": "existing@test.com", "hashed_password": "$2b$12$x"},
+        {"kind": "post", "id": 1, "owner_id": 7, "text": "Historical zebra post"},
+        {"kind": "post", "id": 2, "owner_id": 99, "text": "Orphan"},
+    ).splitlines()
+
+    stats = bulk_import.import_lines(db_session, lines, batch_size=100)
+    assert (stats.users, stats.posts) == (0, 1)
+    assert stats.errors == ["line 3: unknown owner or parent"]
+
+    me = client.get("/auth/me", headers=headers).json()
+    profile = client.get(f"/users/{me['id']}").json()
+    assert [post["text"] for post in profile["posts"]] == ["Historical zebra post"]
+    assert [result["text"] for result in client.get("/posts/search", params={"q": "zebra"}).json()] == ["Historical zebra post"]
+
+def test_import_lines_rejects_bad_types_and_recounts_on_abort(client, db_session):
+    """Рядки з id чи текстом не того типу пропускаються; перерваний імпорт все одно перераховує лічильники"""
+    lines = _ndjson(
+        {"kind": "user", "id": "u1", "username": "typed", "email": "typed@test.com", "hashed_password": "$2b$12$x"},
+        {"kind": "post", "id": {"nested": 1}, "owner_id": "u1", "text": "Unhashable id"},
+        {"kind": "post", "id": "p0", "owner_id": True, "text": "Boolean owner"},
+        {"kind": "post", "id": "p2", "owner_id": "u1", "text": ["not", "text"]},
+        {"kind": "post", "id": "p1", "owner_id": "u1", "text": "Survives the abort"},
+        {"kind": "reply", "id": "r1", "owner_id": "u1", "parent_id": "p1", "text": "Counted reply"},
+    ).splitlines()
+
+    def aborted():
+        yield from lines
+        raise RuntimeError("connection lost")
+
+    progress = []
+    with pytest.raises(RuntimeError):
+        bulk_import.import_lines(db_session, aborted(), batch_size=len(lines), progress=progress.append)
+    stats = progress[-1]
+    assert (stats.users, stats.posts, stats.replies, stats.skipped) == (1, 1, 1, 3)
+    post = db_session.query(models.Post).filter(models.Post.text == "Survives the abort").one()
+    assert post.replies_count == 1
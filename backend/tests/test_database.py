@@ -0,0 +1,84 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+import models
+from crud import content_version
+from database import apply_sqlite_pragmas, retry_on_locked
+
+def test_sqlite_pragmas_applied_on_connect(tmp_path):
+    """SQLite-з'єднання отримують WAL та busy_timeout"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'pragmas.db'}")
+    apply_sqlite_pragmas(engine)
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+    engine.dispose()
+
+def test_retry_on_locked_retries_then_gives_up():
+    """Запис повторюється при 'database is locked', але не безкінечно"""
+    class FakeSession:
+        rollbacks = 0
+        def rollback(self):
+            self.rollbacks += 1
+
+    calls = []
+
+    @retry_on_locked
+    def flaky_write(db, fail_times):
+        calls.append(1)
+        if len(calls) <= fail_times:
+            raise OperationalError("INSERT", {}, Exception("database is locked"))
+        return "ok"
+
+    db = FakeSession()
+    assert flaky_write(db, 2) == "ok"
+    assert db.rollbacks == 2
+
+    calls.clear()
+    with pytest.raises(OperationalError):
+        flaky_write(db, 100)
+    assert len(calls) == 4
+
+def test_retry_on_locked_does_not_sleep_on_event_loop(monkeypatch):
+    """В async-режимі (цикл подій) повтор запису не блокує потік сном"""
+    class FakeSession:
+        def rollback(self):
+            pass
+
+    sleeps = []
+    monkeypatch.setattr(time, "sleep", sleeps.append)
+    calls = []
+
+    @retry_on_locked
+    def flaky_write(db):
+        calls.append(1)
+        if len(calls) <= 2:
+            raise OperationalError("INSERT", {}, Exception("database is locked"))
+        return "ok"
+
+    async def on_loop():
+        return flaky_write(FakeSession())
+
+    assert asyncio.run(on_loop()) == "ok"
+    assert sleeps == []
+
+    calls.clear()
+    assert flaky_write(FakeSession()) == "ok"
+    assert len(sleeps) == 2
+
+def test_bump_version_tolerates_concurrent_first_write(db_session):
+    """Перший запис версії не падає, якщо рядок уже створив інший запит"""
+    content_version.bump_version(db_session, content_version.POSTS)
+    db_session.commit()
+    assert content_version.get_versions(db_session, content_version.POSTS)[content_version.POSTS][0] == 1
+
+    # The row another first writer committed in the meantime is left alone
+    db_session.execute(content_version._insert_ignore(db_session, content_version.POSTS, datetime.now(timezone.utc)))
+    content_version.bump_version(db_session, content_version.POSTS)
+    db_session.commit()
+    assert db_session.get(models.AppState, content_version.POSTS).version == 2
@@ -32,4 +32,95 @@ def test_add_comment(client, auth_token):
         headers={"Authorization": f"Bearer {token}"}
     )
     assert response.status_code == 201
-    assert response.json()["text"] == "Test comment"
\ No newline at end of file
+    assert response.json()["text"] == "Test comment"
+
+def test_counters_follow_likes_and_replies(client, auth_token):
+    """Test denormalized likes_count and replies_count"""
+    token = auth_token("counteruser", "counter@test.com", "counter12345")
+    headers = {"Authorization": f"Bearer {token}"}
+
+    post_id = client.post("/posts/", data={"text": "Counted post"}, headers=headers).json()["id"]
+    reply_id = client.post(f"/posts/{post_id}/replies", data={"text": "Reply"}, headers=headers).json()["id"]
+
+    liked = client.post(f"/posts/{post_id}/like", headers=headers).json()
+    assert liked == {"is_liked_by_user": True, "likes_count": 1}
+
+    post = client.get(f"/posts/{post_id}").json()
+    assert post["likes_count"] == 1
+    assert post["replies_count"] == 1
+
+    unliked = client.post(f"/posts/{post_id}/like", headers=headers).json()
+    assert unliked == {"is_liked_by_user": False, "likes_count": 0}
+
+    client.delete(f"/posts/{reply_id}", headers=headers)
+    assert client.get(f"/posts/{post_id}").json()["replies_count"] == 0
+
+def test_recount_post_counters(client, auth_token, db_session):
+    """Test the counter repair job"""
+    import models
+    from crud import post as post_crud
+
+    token = auth_token("recountuser", "recount@test.com", "recount12345")
+    headers = {"Authorization": f"Bearer {token}"}
+    post_id = client.post("/posts/", data={"text": "Drifted post"}, headers=headers).json()["id"]
+    client.post(f"/posts/{post_id}/replies", data={"text": "Reply"}, headers=headers)
+    client.post(f"/posts/{post_id}/like", headers=headers)
+
+    db_session.query(models.Post).filter(models.Post.id == post_id).update({"likes_count": 42, "replies_count": 7})
+    db_session.commit()
+
+    post_crud.recount_post_counters(db_session)
+
+    db_post = db_session.get(models.Post, post_id)
+    db_session.refresh(db_post)
+    assert db_post.likes_count == 1
+    assert db_post.replies_count == 1
+
+def test_is_liked_by_user_in_feed_and_detail(client, auth_token):
+    """Test the liked-by-viewer overlay for posts and replies"""
+    author_token = auth_token("likedauthor", "likedauthor@test.com", "author12345")
+    viewer_token = auth_token("likedviewer", "likedviewer@test.com", "viewer12345")
+    author_headers = {"Authorization": f"Bearer {author_token}"}
+    viewer_headers = {"Authorization": f"Bearer {viewer_token}"}
+
+    post_id = client.post("/posts/", data={"text": "Post"}, headers=author_headers).json()["id"]
+    reply_id = client.post(f"/posts/{post_id}/replies", data={"text": "Reply"}, headers=author_headers).json()["id"]
+    client.post(f"/posts/{reply_id}/like", headers=viewer_headers)
+
+    for headers, expected in ((viewer_headers, True), (author_headers, False), ({}, False)):
+        feed_post = client.get("/posts/", headers=headers).json()[0]
+        detail = client.get(f"/posts/{post_id}", headers=headers).json()
+        assert feed_post["is_liked_by_user"] is False
+        assert feed_post["replies"][0]["is_liked_by_user"] is expected
+        assert detail["replies"][0]["is_liked_by_user"] is expected
+        assert detail["replies"][0]["likes_count"] == 1
+
+def test_feed_reply_previews_and_replies_pagination(client, auth_token):
+    """Test that the feed only previews replies and the rest is paged"""
+    token = auth_token("threaduser", "thread@test.com", "thread12345")
+    headers = {"Authorization": f"Bearer {token}"}
+    post_id = client.post("/posts/", data={"text": "Busy thread"}, headers=headers).json()["id"]
+    reply_ids = [
+        client.post(f"/posts/{post_id}/replies", data={"text": f"Reply {i}"}, headers=headers).json()["id"]
+        for i in range(7)
+    ]
+
+    feed_post = client.get("/posts/").json()[0]
+    assert feed_post["replies_count"] == 7
+    assert [reply["id"] for reply in feed_post["replies"]] == reply_ids[:3]
+
+    seen = []
+    params = {"limit": 3}
+    while True:
+        page = client.get(f"/posts/{post_id}/replies", params=params)
+        assert page.status_code == 200
+        seen.extend(reply["id"] for reply in page.json())
+        if "X-Next-Cursor" not in page.headers:
+            break
+        params["cursor"] = page.headers["X-Next-Cursor"]
+    assert seen == reply_ids
+
+def test_get_replies_of_nonexistent_post(client):
+    """Test paging replies of a missing post"""
+    response = client.get("/posts/9999/replies")
+    assert response.status_code == 404
@@ -0,0 +1,57 @@
+import subprocess
+import sys
+from pathlib import Path
+
+from prometheus_client import REGISTRY
+
+from core import metrics
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+def _sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+def test_metrics_record_routes_and_queries(client, auth_token, db_session):
+    """Метрики рахують запити за шаблоном маршруту, SQL-запити на запит і байти завантажень"""
+    metrics.instrument_engine(db_session.get_bind())  # the test engine, as main.lifespan does for the app's
+
+    token = auth_token("metricsuser", "metrics@test.com", "metrics12345")
+    headers = {"Authorization": f"Bearer {token}"}
+    post_id = client.post("/posts/", data={"text": "Measured"}, headers=headers).json()["id"]
+
+    requests_before = _sample("http_requests_total", method="GET", route="/posts/{post_id}", status="200")
+    queries_before = _sample("http_request_db_queries_sum", route="/posts/{post_id}")
+    client.get(f"/posts/{post_id}")
+    client.get(f"/posts/{post_id}")
+    client.get("/no/such/path")
+
+    assert _sample("http_requests_total", method="GET", route="/posts/{post_id}", status="200") == requests_before + 2
+    assert _sample("http_request_db_queries_sum", route="/posts/{post_id}") > queries_before
+    assert _sample("http_requests_total", method="GET", route="unmatched", status="404") >= 1
+    assert _sample("http_requests_in_progress", method="GET") == 0
+    assert _sample("db_pool_checkout_seconds_count") > 0
+
+    bytes_before = _sample("upload_bytes_total")
+    png = b"\x89PNG\r\n\x1a\n" + b"\x00" * 100
+    client.post("/posts/", data={"text": "With image"}, files={"image": ("a.png", png, "image/png")}, headers=headers)
+    assert _sample("upload_bytes_total") == bytes_before + len(png)
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert 'http_requests_total{method="GET",route="/posts/{post_id}",status="200"}' in response.text
+
+def test_metrics_aggregate_across_workers(tmp_path):
+    """У multiprocess-режимі /metrics підсумовує значення всіх воркерів"""
+    env = {"PROMETHEUS_MULTIPROC_DIR": str(tmp_path), "PATH": ""}
+    worker = "from core import metrics; metrics.UPLOAD_BYTES.inc(10); metrics.IN_PROGRESS.labels('GET').inc()"
+    for _ in range(3):
+        subprocess.run([sys.executable, "-c", worker], cwd=BACKEND_DIR, env=env, check=True)
+    exited = "import os; from core import metrics; metrics.IN_PROGRESS.labels('GET').inc(); metrics.worker_exited()"
+    subprocess.run([sys.executable, "-c", exited], cwd=BACKEND_DIR, env=env, check=True)
+
+    render = "from core import metrics; print(metrics.render()[0].decode())"
+    output = subprocess.run([sys.executable, "-c", render], cwd=BACKEND_DIR, env=env, check=True,
+                            capture_output=True, text=True).stdout
+    assert "upload_bytes_total 30.0" in output
+    # the worker that shut down cleanly no longer counts towards the live gauge
+    assert 'http_requests_in_progress{method="GET"} 3.0' in output
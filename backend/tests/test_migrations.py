@@ -0,0 +1,42 @@
+from sqlalchemy import create_engine, inspect, text
+
+from migrations import runner
+
+# Schema as the old create_all at startup made it: no counters, no updated_at,
+# no app_state/blobs/search tables, and the btree on posts.text
+_LEGACY_SCHEMA = [
+    "CREATE TABLE users (id INTEGER PRIMARY KEY, username VARCHAR, email VARCHAR, hashed_password VARCHAR NOT NULL, avatar_url VARCHAR)",
+    "CREATE TABLE posts (id INTEGER PRIMARY KEY, text VARCHAR, image_url VARCHAR, timestamp DATETIME, "
+    "owner_id INTEGER NOT NULL REFERENCES users(id), parent_id INTEGER REFERENCES posts(id))",
+    "CREATE INDEX ix_posts_text ON posts (text)",
+    "CREATE TABLE likes (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, post_id INTEGER NOT NULL, timestamp DATETIME, "
+    "CONSTRAINT _user_post_like_uc UNIQUE (user_id, post_id))",
+    "INSERT INTO users (id, username, email, hashed_password) VALUES (1, 'old', 'old@test.com', 'x')",
+    "INSERT INTO posts (id, text, owner_id) VALUES (1, 'legacy coffee post', 1)",
+    "INSERT INTO posts (id, text, owner_id, parent_id) VALUES (2, 'legacy reply', 1, 1)",
+    "INSERT INTO likes (id, user_id, post_id) VALUES (1, 1, 1)",
+]
+
+def test_upgrade_legacy_database(tmp_path):
+    """Міграції доводять стару БД до поточної схеми і повторно нічого не роблять"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as connection:
+        for statement in _LEGACY_SCHEMA:
+            connection.exec_driver_sql(statement)
+
+    assert runner.upgrade(engine) == runner.available_versions()
+    assert runner.upgrade(engine) == []
+
+    schema = inspect(engine)
+    assert {"app_state", "blobs", "schema_migrations"} <= set(schema.get_table_names())
+    post_indexes = {index["name"] for index in schema.get_indexes("posts")}
+    assert {"ix_posts_parent_timestamp_id", "ix_posts_owner_parent_timestamp"} <= post_indexes
+    assert "ix_posts_text" not in post_indexes
+    assert "ix_likes_post_id" in {index["name"] for index in schema.get_indexes("likes")}
+
+    with engine.connect() as connection:
+        counters = connection.execute(text("SELECT likes_count, replies_count FROM posts WHERE id = 1")).one()
+        assert tuple(counters) == (1, 1)
+        # Existing posts were backfilled into the search index
+        assert connection.execute(text("SELECT rowid FROM posts_fts WHERE posts_fts MATCH 'coffee'")).scalars().all() == [1]
+    engine.dispose()
@@ -1,3 +1,7 @@
+import pytest
+
+from core.config import settings
+
 def test_get_posts(client):
     """Тест отримання списку постів"""
     response = client.get("/posts/")
@@ -103,4 +107,144 @@ def test_delete_other_user_post(client, auth_token):
 def test_get_nonexistent_post(client):
     """Test getting a nonexistent post"""
     response = client.get("/posts/9999")
-    assert response.status_code == 404
\ No newline at end of file
+    assert response.status_code == 404
+
+def test_get_posts_cursor_pagination(client, auth_token):
+    """Test keyset pagination of the feed"""
+    token = auth_token("cursoruser", "cursor@test.com", "cursor12345")
+    for i in range(5):
+        client.post(
+            "/posts/",
+            data={"text": f"Cursor post {i}"},
+            headers={"Authorization": f"Bearer {token}"}
+        )
+
+    first_page = client.get("/posts/", params={"limit": 2})
+    assert first_page.status_code == 200
+    cursor = first_page.headers["X-Next-Cursor"]
+
+    seen = [post["id"] for post in first_page.json()]
+    while cursor:
+        page = client.get("/posts/", params={"limit": 2, "cursor": cursor})
+        assert page.status_code == 200
+        seen.extend(post["id"] for post in page.json())
+        cursor = page.headers.get("X-Next-Cursor")
+
+    assert len(seen) == 5
+    assert len(set(seen)) == 5
+    assert seen == sorted(seen, reverse=True)
+
+def test_get_posts_invalid_cursor(client):
+    """Test that a malformed cursor is rejected"""
+    response = client.get("/posts/", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+def test_conditional_get_feed_and_detail(client, auth_token):
+    """Test ETag/If-None-Match on the feed and post detail"""
+    token = auth_token("etaguser", "etag@test.com", "etag12345")
+    headers = {"Authorization": f"Bearer {token}"}
+    post_id = client.post("/posts/", data={"text": "Cached post"}, headers=headers).json()["id"]
+    reply_id = client.post(f"/posts/{post_id}/replies", data={"text": "Reply"}, headers=headers).json()["id"]
+
+    for path in ("/posts/", f"/posts/{post_id}"):
+        first = client.get(path, headers=headers)
+        etag = first.headers["ETag"]
+        assert "Last-Modified" in first.headers
+
+        cached = client.get(path, headers={**headers, "If-None-Match": etag})
+        assert cached.status_code == 304
+        assert cached.content == b""
+
+        # Anonymous viewers see a different is_liked_by_user, so they get another tag
+        assert client.get(path, headers={"If-None-Match": etag}).status_code == 200
+
+        client.post(f"/posts/{reply_id}/like", headers=headers)
+        changed = client.get(path, headers={**headers, "If-None-Match": etag})
+        assert changed.status_code == 200
+        assert changed.headers["ETag"] != etag
+
+def test_conditional_get_profile(client, auth_token):
+    """Test ETag on the user profile"""
+    token = auth_token("etagprofile", "etagprofile@test.com", "etag12345")
+    headers = {"Authorization": f"Bearer {token}"}
+    user_id = client.get("/auth/me", headers=headers).json()["id"]
+
+    etag = client.get(f"/users/{user_id}").headers["ETag"]
+    assert client.get(f"/users/{user_id}", headers={"If-None-Match": etag}).status_code == 304
+
+    client.put("/users/me", json={"username": "etagrenamed"}, headers=headers)
+    renamed = client.get(f"/users/{user_id}", headers={"If-None-Match": etag})
+    assert renamed.status_code == 200
+    assert renamed.json()["username"] == "etagrenamed"
+
+def test_feed_served_from_timeline_cache(client, auth_token, query_budget):
+    """Test that the first feed pages follow creates and deletes through the timeline cache"""
+    token = auth_token("timelineuser", "timeline@test.com", "timeline12345")
+    headers = {"Authorization": f"Bearer {token}"}
+    ids = [client.post("/posts/", data={"text": f"Timeline {i}"}, headers=headers).json()["id"] for i in range(4)]
+    client.post(f"/posts/{ids[0]}/replies", data={"text": "Not in the timeline"}, headers=headers)
+
+    assert [post["id"] for post in client.get("/posts/").json()] == ids[::-1]
+
+    client.delete(f"/posts/{ids[2]}", headers=headers)
+    newest = client.post("/posts/", data={"text": "Newest"}, headers=headers).json()["id"]
+
+    with query_budget(4) as recorder:
+        feed = client.get("/posts/", params={"limit": 3}).json()
+    assert [post["id"] for post in feed] == [newest, ids[3], ids[1]]
+    # The cached page is hydrated by primary key, not by the ORDER BY timestamp query
+    assert not any("ORDER BY posts.timestamp DESC" in query.statement for query in recorder.queries)
+
+def test_search_posts(client, auth_token):
+    """Test ranked full-text search with cursor pagination"""
+    token = auth_token("searchuser", "search@test.com", "search12345")
+    headers = {"Authorization": f"Bearer {token}"}
+    post_id = client.post("/posts/", data={"text": "Coffee brewing tips"}, headers=headers).json()["id"]
+    reply_id = client.post(f"/posts/{post_id}/replies", data={"text": "Coffee coffee, always coffee"}, headers=headers).json()["id"]
+    client.post("/posts/", data={"text": "Tea is fine too"}, headers=headers)
+    edited_id = client.post("/posts/", data={"text": "Nothing here"}, headers=headers).json()["id"]
+    client.put(f"/posts/{edited_id}", data={"text": "Cold brew coffee"}, headers=headers)
+
+    first = client.get("/posts/search", params={"q": "coffee", "limit": 2})
+    assert first.status_code == 200
+    hits = first.json()
+    # The reply mentions coffee most often, so it ranks first
+    assert hits[0]["id"] == reply_id and hits[0]["parent_id"] == post_id
+    rest = client.get("/posts/search", params={"q": "coffee", "limit": 2, "cursor": first.headers["X-Next-Cursor"]}).json()
+    assert sorted(hit["id"] for hit in hits + rest) == sorted([post_id, reply_id, edited_id])
+
+    # Deleting the thread removes the post and its reply from the index
+    client.delete(f"/posts/{post_id}", headers=headers)
+    assert [hit["id"] for hit in client.get("/posts/search", params={"q": "coffee"}).json()] == [edited_id]
+
+    # FTS syntax in user input is treated as plain words
+    assert client.get("/posts/search", params={"q": 'brew" OR NEAR(*'}).status_code == 200
+    assert client.get("/posts/search", params={"q": "coffee", "cursor": "bad"}).status_code == 400
+
+@pytest.mark.parametrize("strategy", ["selectin", "joined", "subquery"])
+def test_loading_strategies_return_same_payload(client, auth_token, query_budget, monkeypatch, strategy):
+    """Кожна стратегія eager loading дає ту саму відповідь з обмеженою кількістю запитів"""
+    token = auth_token("loaderuser", "loader@test.com", "loader12345")
+    headers = {"Authorization": f"Bearer {token}"}
+    post_ids = [client.post("/posts/", data={"text": f"Thread {i}"}, headers=headers).json()["id"] for i in range(3)]
+    for post_id in post_ids:
+        for i in range(4):
+            client.post(f"/posts/{post_id}/replies", data={"text": f"Reply {i}"}, headers=headers)
+    client.post(f"/posts/{post_ids[0]}/like", headers=headers)
+
+    def fetch():
+        # Validators, page and owners, reply previews, likes (the feed once more to rebuild
+        # the timeline cache): independent of the thread sizes
+        with query_budget(6):
+            feed = client.get("/posts/", headers=headers).json()
+        with query_budget(5):
+            detail = client.get(f"/posts/{post_ids[0]}", headers=headers).json()
+        return feed, detail
+
+    monkeypatch.setattr(settings, "loading_strategy", "selectin")
+    expected_feed, expected_detail = fetch()
+    monkeypatch.setattr(settings, "loading_strategy", strategy)
+    feed, detail = fetch()
+
+    assert feed == expected_feed and detail == expected_detail
+    assert len(detail["replies"]) == 4 and detail["is_liked_by_user"]
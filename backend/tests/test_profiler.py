@@ -0,0 +1,69 @@
+import json
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import models
+from core import profiler
+from core.config import settings
+from core.middleware import ProfilingMiddleware
+from database import run_db
+
+def _busy_listing(db):
+    # CPU work the sampler should catch, then one query for the timeline
+    deadline = time.perf_counter() + 0.05
+    while time.perf_counter() < deadline:
+        sum(range(1000))
+    return db.query(models.Post).count()
+
+def test_profiles_only_requests_with_token(db_session, tmp_path, monkeypatch):
+    """Профілюється лише запит із правильним токеном: звіт містить стеки та SQL"""
+    monkeypatch.setattr(settings, "profiling_dir", str(tmp_path))
+    profiler.instrument_engine(db_session.get_bind())
+    app = FastAPI()
+    app.add_middleware(ProfilingMiddleware, token="secret", interval_ms=1)
+
+    @app.get("/slow")
+    async def slow():
+        return {"posts": await run_db(db_session, _busy_listing)}
+
+    with TestClient(app) as test_client:
+        assert "x-profile-id" not in test_client.get("/slow").headers
+        assert "x-profile-id" not in test_client.get("/slow", headers={"X-Profile-Token": "wrong"}).headers
+        assert list(tmp_path.iterdir()) == []
+
+        response = test_client.get("/slow", headers={"X-Profile-Token": "secret"})
+    assert response.status_code == 200
+    profile_id = response.headers["x-profile-id"]
+
+    report = json.loads((tmp_path / f"{profile_id}.json").read_text())
+    assert report["path"] == "/slow" and report["status"] == 200
+    assert report["samples"] > 0
+    assert report["sql_count"] == 1 and "FROM posts" in report["sql"][0]["statement"]
+    folded = (tmp_path / f"{profile_id}.folded").read_text()
+    assert folded == report["folded"]
+    assert "tests/test_profiler.py:_busy_listing" in folded
+    stack, count = folded.splitlines()[0].rsplit(" ", 1)
+    assert int(count) > 0 and ";" in stack
+
+def test_fetch_profile_report(client, tmp_path, monkeypatch):
+    """Звіт віддається за X-Profile-Id лише з токеном; без налаштованого токена ендпоінта немає"""
+    monkeypatch.setattr(settings, "profiling_dir", str(tmp_path))
+    profile = profiler.RequestProfile("GET", "/posts/", 0.001)
+    profile.start()
+    profile.stop()
+    profiler.save(profile, 200)
+
+    assert client.get(f"/admin/profiles/{profile.id}").status_code == 404
+
+    monkeypatch.setattr(settings, "profiling_token", "secret")
+    headers = {"X-Profile-Token": "secret"}
+    assert client.get(f"/admin/profiles/{profile.id}", headers={"X-Profile-Token": "wrong"}).status_code == 401
+    assert client.get("/admin/profiles/..%2Fsecret", headers=headers).status_code == 404
+
+    response = client.get(f"/admin/profiles/{profile.id}", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["id"] == profile.id
+    folded = client.get(f"/admin/profiles/{profile.id}", params={"format": "folded"}, headers=headers)
+    assert folded.status_code == 200 and folded.headers["content-type"].startswith("text/plain")
@@ -0,0 +1,61 @@
+import re
+
+import pytest
+from sqlalchemy import event
+
+from conftest import test_engine
+
+# Tables whose full scans would grow with the data; subqueries, CTEs and posts_fts are fine
+_TABLES = {"posts", "likes", "users", "app_state", "blobs"}
+_FULL_SCAN = re.compile(r"^SCAN (\w+)(?! VIRTUAL TABLE)")
+
+@pytest.fixture
+def recorded_selects():
+    statements = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "WITH")) and not executemany:
+            statements.append((statement, parameters))
+
+    event.listen(test_engine, "before_cursor_execute", _record)
+    yield statements
+    event.remove(test_engine, "before_cursor_execute", _record)
+
+def _full_scans(statement, parameters):
+    with test_engine.connect() as connection:
+        plan = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+    return [row[3] for row in plan if (m := _FULL_SCAN.match(row[3])) and m.group(1) in _TABLES]
+
+def test_hot_queries_use_indexes(client, auth_token, recorded_selects):
+    """Гарячі запити crud/ не сканують таблиці повністю"""
+    token = auth_token("planuser", "plan@test.com", "plan12345")
+    other = auth_token("planother", "planother@test.com", "plan12345")
+    headers = {"Authorization": f"Bearer {token}"}
+    other_headers = {"Authorization": f"Bearer {other}"}
+
+    posts = [client.post("/posts/", data={"text": f"Plan post {i}"}, headers=headers).json() for i in range(3)]
+    post_ids = [post["id"] for post in posts]
+    reply_id = client.post(f"/posts/{post_ids[0]}/replies", data={"text": "Plan reply"}, headers=other_headers).json()["id"]
+    client.post(f"/posts/{post_ids[0]}/like", headers=other_headers)
+    client.post(f"/posts/{reply_id}/like", headers=headers)
+    user_id = posts[0]["owner"]["id"]
+
+    recorded_selects.clear()
+    cursor = client.get("/posts/", params={"limit": 2}, headers=headers).headers["X-Next-Cursor"]
+    client.get("/posts/", params={"limit": 2, "cursor": cursor}, headers=headers)
+    client.get("/posts/", params={"skip": 1, "limit": 1000}, headers=headers)
+    client.get(f"/posts/{post_ids[0]}", headers=headers)
+    client.get(f"/posts/{post_ids[0]}/replies", params={"limit": 1}, headers=headers)
+    client.get(f"/posts/{post_ids[0]}/likes", headers=headers)
+    client.get(f"/users/{user_id}", headers=headers)
+    client.get("/posts/search", params={"q": "plan"}, headers=headers)
+    client.post(f"/posts/{post_ids[1]}/like", headers=other_headers)
+    client.delete(f"/posts/{post_ids[0]}", headers=headers)
+
+    assert recorded_selects
+    offenders = {}
+    for statement, parameters in recorded_selects:
+        scans = _full_scans(statement, parameters)
+        if scans:
+            offenders[" ".join(statement.split())] = scans
+    assert not offenders, offenders
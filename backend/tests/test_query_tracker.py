@@ -0,0 +1,77 @@
+import logging
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import models
+from core import query_tracker
+from core.middleware import QueryTrackerMiddleware
+
+def _load_posts_one_by_one(db, ids):
+    posts = []
+    for post_id in ids:
+        posts.append(db.query(models.Post).filter(models.Post.id == post_id).first())
+    return posts
+
+def test_statement_shape_ignores_values():
+    """Однакові запити з різними значеннями та довжиною IN-списку мають одну форму"""
+    a = query_tracker.statement_shape("SELECT * FROM posts WHERE id IN (?, ?, ?) LIMIT 10")
+    b = query_tracker.statement_shape("SELECT *\n  FROM posts WHERE id IN (?) LIMIT 20")
+    assert a == b == "SELECT * FROM posts WHERE id IN (?) LIMIT ?"
+
+def test_query_budget_flags_n_plus_one(query_budget, db_session):
+    """Повторюваний запит валить тест і вказує на код, що його виконав"""
+    with pytest.raises(query_tracker.QueryBudgetExceeded) as error:
+        with query_budget(100):
+            _load_posts_one_by_one(db_session, range(1, 7))
+    assert "N+1: 6 executions" in str(error.value)
+    assert "tests/test_query_tracker.py" in str(error.value)
+    assert "_load_posts_one_by_one" in str(error.value)
+
+    with pytest.raises(query_tracker.QueryBudgetExceeded, match="3 queries, budget 2"):
+        with query_budget(2):
+            _load_posts_one_by_one(db_session, range(1, 4))
+
+def test_query_budget_as_decorator(query_budget, db_session):
+    """query_budget можна використовувати як декоратор"""
+    @query_budget(1)
+    def one_query():
+        return db_session.query(models.Post).all()
+
+    assert one_query() == []
+
+    @query_budget(1)
+    def two_queries():
+        db_session.query(models.Post).all()
+        db_session.query(models.User).all()
+
+    with pytest.raises(query_tracker.QueryBudgetExceeded):
+        two_queries()
+
+def test_dev_middleware_logs_call_site(db_session, caplog):
+    """У dev-режимі запит з N+1 дає попередження з місцем виклику"""
+    query_tracker.instrument_engine(db_session.get_bind())
+    app = FastAPI()
+    app.add_middleware(QueryTrackerMiddleware)
+
+    @app.get("/n-plus-one")
+    def n_plus_one():
+        _load_posts_one_by_one(db_session, range(1, 7))
+        return {}
+
+    @app.get("/fine")
+    def fine():
+        db_session.query(models.Post).all()
+        return {}
+
+    with caplog.at_level(logging.WARNING, logger="core.query_tracker"):
+        with TestClient(app) as test_client:
+            test_client.get("/fine")
+            assert caplog.records == []
+            test_client.get("/n-plus-one")
+
+    assert len(caplog.records) == 1
+    message = caplog.records[0].getMessage()
+    assert "GET /n-plus-one" in message
+    assert "tests/test_query_tracker.py" in message and "_load_posts_one_by_one" in message
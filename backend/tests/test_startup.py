@@ -0,0 +1,32 @@
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# The import and startup times are measured by benchmarks/startup_time.py, not here:
+# wall-clock budgets are flaky on loaded CI runners
+_PROBE = """
+import main
+from fastapi.testclient import TestClient
+with TestClient(main.app) as client:
+    print(client.get("/health/ready").status_code)
+"""
+
+def test_import_has_no_side_effects(tmp_path):
+    """Імпорт main не чіпає БД і диск; міграції та каталоги створює lifespan"""
+    env = {"PATH": "", "PYTHONPATH": str(BACKEND_DIR), "DATABASE_URL": f"sqlite:///{tmp_path / 'app.db'}"}
+    import_only = subprocess.run([sys.executable, "-c", "import main"], cwd=tmp_path, env=env, capture_output=True, text=True)
+    assert import_only.returncode == 0, import_only.stderr
+    assert import_only.stdout == ""
+    assert list(tmp_path.iterdir()) == []
+
+    probe = subprocess.run([sys.executable, "-c", _PROBE], cwd=tmp_path, env=env, capture_output=True, text=True)
+    assert probe.returncode == 0, probe.stderr
+    assert probe.stdout.strip().splitlines()[-1] == "200"
+    assert (tmp_path / "app.db").exists() and (tmp_path / "uploads" / "blobs").is_dir()
+
+def test_readiness(client):
+    """Після старту lifespan readiness-проба повертає 200"""
+    assert client.get("/health/live").json() == {"status": "ok"}
+    assert client.get("/health/ready").status_code == 200
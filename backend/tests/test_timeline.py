@@ -0,0 +1,65 @@
+import fakeredis
+
+from services import timeline
+from services.timeline import MemoryTimelineBackend, RedisTimelineBackend
+
+def _backends():
+    return [MemoryTimelineBackend(3), RedisTimelineBackend(3, "", client=fakeredis.FakeRedis())]
+
+def test_timeline_backend_push_and_remove():
+    """Бекенди застосовують зміни лише на один крок версії вперед"""
+    for backend in _backends():
+        backend.store(1, [5, 4], True)
+        backend.push(6, 2)
+        assert backend.load() == (2, [6, 5, 4], True)
+
+        # The list is capped at its size and stops being the whole timeline
+        backend.push(7, 3)
+        assert backend.load() == (3, [7, 6, 5], False)
+
+        backend.remove(6, 4)
+        assert backend.load() == (4, [7, 5], False)
+
+def test_timeline_backend_resets_on_version_gap():
+    """Пропущена версія (запис іншого воркера) скидає кеш"""
+    for backend in _backends():
+        backend.store(1, [2, 1], True)
+        backend.push(3, 5)
+        assert backend.load() is None
+
+def test_feed_survives_redis_outage(client, auth_token, monkeypatch):
+    """Недоступний Redis - це промах кешу: стрічка читається з БД, пост створюється один раз"""
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(timeline, "backend", RedisTimelineBackend(20, "", client=fakeredis.FakeRedis(server=server)))
+    server.connected = False
+    headers = {"Authorization": f"Bearer {auth_token()}"}
+
+    created = client.post("/posts/", data={"text": "During outage"}, headers=headers)
+    assert created.status_code == 201
+    feed = client.get("/posts/", headers=headers)
+    assert feed.status_code == 200
+    assert [post["id"] for post in feed.json()] == [created.json()["id"]]
+    assert client.delete(f"/posts/{created.json()['id']}", headers=headers).status_code in (200, 204)
+    assert client.get("/posts/", headers=headers).json() == []
+
+def test_post_pushed_under_its_own_version(client, auth_token, db_session, monkeypatch):
+    """Пост додається в кеш під версією власної транзакції, а не під пізнішою чужою"""
+    from crud import content_version
+    from crud import post as post_crud
+    headers = {"Authorization": f"Bearer {auth_token()}"}
+    first = client.post("/posts/", data={"text": "First"}, headers=headers).json()
+    client.get("/posts/", headers=headers)  # warm the cache at the first post's version
+
+    create_post = post_crud.create_post
+    def create_then_other_writer(*args, **kwargs):
+        # Another worker commits a timeline change between our commit and our push
+        result = create_post(*args, **kwargs)
+        content_version.bump_version(db_session, content_version.TIMELINE)
+        db_session.commit()
+        return result
+    monkeypatch.setattr(post_crud, "create_post", create_then_other_writer)
+
+    second = client.post("/posts/", data={"text": "Second"}, headers=headers).json()
+    version, ids, _ = timeline.backend.load()
+    assert ids == [second["id"], first["id"]]
+    assert version == content_version.get_versions(db_session, content_version.TIMELINE)[content_version.TIMELINE][0] - 1
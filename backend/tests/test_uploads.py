@@ -0,0 +1,253 @@
+import hashlib
+import io
+import threading
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from core.config import settings
+from core.middleware import BodySizeLimitMiddleware
+from services import image_variants, uploads
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 100
+GIF = b"GIF89a" + b"\x00" * 100
+
+@pytest.fixture(autouse=True)
+def variants_in_thread(monkeypatch):
+    # Run variant jobs in a thread instead of a process pool, and finish them per test
+    monkeypatch.setattr(settings, "image_variant_workers", 0)
+    yield
+    image_variants.shutdown_executor(wait=True)
+
+def test_post_image_saved_by_content_type(client, auth_token, tmp_path, monkeypatch):
+    """Тип зображення визначається за magic bytes, а не за іменем файлу"""
+    monkeypatch.chdir(tmp_path)
+    headers = {"Authorization": f"Bearer {auth_token()}"}
+
+    response = client.post("/posts/", data={"text": "With image"}, files={"image": ("photo.jpg", PNG, "image/jpeg")}, headers=headers)
+    assert response.status_code == 201
+    image_url = response.json()["image_url"]
+    assert image_url.startswith("/uploads/") and image_url.endswith(".png")
+    assert (tmp_path / image_url.lstrip("/")).read_bytes() == PNG
+
+    fake = client.post("/posts/", data={"text": "Not an image"}, files={"image": ("script.png", b"<?php echo 1;", "image/png")}, headers=headers)
+    assert fake.status_code == 400
+
+def test_upload_size_limit(client, auth_token, tmp_path, monkeypatch):
+    """Завеликий файл відхиляється з 413 і не залишає файлів на диску"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(settings, "upload_max_bytes", 1024)
+    headers = {"Authorization": f"Bearer {auth_token()}"}
+
+    response = client.post("/posts/", data={"text": "Big"}, files={"image": ("big.png", PNG + b"\x00" * 200_000, "image/png")}, headers=headers)
+    assert response.status_code == 413
+    assert not any(path.is_file() for path in Path("uploads").rglob("*"))
+
+def test_body_size_limit_response_has_cors_headers(client, auth_token):
+    """413 від обмеження тіла запиту містить CORS-заголовки, щоб браузер побачив помилку"""
+    headers = {"Authorization": f"Bearer {auth_token()}", "Origin": "http://localhost:5173"}
+    big = PNG + b"\x00" * (settings.request_max_body_bytes + 1)
+
+    response = client.post("/posts/", data={"text": "Big"}, files={"image": ("big.png", big, "image/png")}, headers=headers)
+    assert response.status_code == 413
+    assert response.headers["access-control-allow-origin"] == "http://localhost:5173"
+
+def test_body_size_limit_middleware():
+    """Тіло запиту більше за ліміт обривається ще до розбору форми"""
+    limited = FastAPI()
+    limited.add_middleware(BodySizeLimitMiddleware, max_body_bytes=1000)
+
+    @limited.post("/echo")
+    async def echo(request: Request):
+        return {"size": len(await request.body())}
+
+    client = TestClient(limited)
+    assert client.post("/echo", content=b"x" * 1000).json() == {"size": 1000}
+    assert client.post("/echo", content=b"x" * 5000).status_code == 413
+
+    def chunks():
+        for _ in range(5):
+            yield b"x" * 500
+    # No Content-Length: the limit is enforced as the chunks arrive
+    assert client.post("/echo", content=chunks()).status_code == 413
+
+def test_place_blob_survives_concurrent_gc(tmp_path, monkeypatch):
+    """Якщо GC видалив blob під час завантаження, нова копія зберігається замість 500"""
+    final = tmp_path / "blobs" / "ab.png"
+    final.parent.mkdir()
+    final.write_bytes(PNG)
+    temp = tmp_path / "upload.tmp"
+    temp.write_bytes(PNG)
+    assert uploads._place_blob(temp, final) is False
+    assert not temp.exists()
+
+    def gc_then_utime(path):
+        path.unlink()
+        raise FileNotFoundError(path)
+    monkeypatch.setattr(uploads.os, "utime", gc_then_utime)
+    temp.write_bytes(PNG)
+    assert uploads._place_blob(temp, final) is True
+    assert final.read_bytes() == PNG and not temp.exists()
+
+def test_replace_avatar_removes_old_file(client, auth_token, tmp_path, monkeypatch):
+    """Новий аватар зберігається, старий файл видаляється"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(settings, "blob_delete_grace_seconds", 0)
+    headers = {"Authorization": f"Bearer {auth_token()}"}
+
+    first = client.post("/users/me/avatar", files={"file": ("a.png", PNG, "image/png")}, headers=headers).json()["avatar_url"]
+    second = client.post("/users/me/avatar", files={"file": ("b.gif", GIF, "image/gif")}, headers=headers).json()["avatar_url"]
+    assert second.startswith("/uploads/blobs/") and second.endswith(".gif")
+    assert not (tmp_path / first.lstrip("/")).exists()
+    assert (tmp_path / second.lstrip("/")).exists()
+
+    assert client.delete("/users/me/avatar", headers=headers).status_code == 200
+    assert not (tmp_path / second.lstrip("/")).exists()
+
+def test_avatar_url_cannot_reach_shared_blobs(client, auth_token, tmp_path, monkeypatch):
+    """Клієнт не може задати avatar_url і через нього видалити чужий спільний blob"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(settings, "blob_delete_grace_seconds", 0)
+    headers = {"Authorization": f"Bearer {auth_token()}"}
+    url = client.post("/posts/", data={"text": "Shared"}, files={"image": ("a.png", PNG, "image/png")}, headers=headers).json()["image_url"]
+
+    sneaky = "/uploads/avatars/../" + url[len("/uploads/"):]
+    user = client.post("/auth/register", json={"username": "sneaky", "email": "sneaky@test.com", "password": "sneaky12345", "avatar_url": sneaky})
+    assert user.status_code == 200 and user.json()["avatar_url"] is None
+    assert not uploads.is_legacy_avatar(sneaky)
+    assert uploads.is_legacy_avatar("/uploads/avatars/old.png")
+
+    sneaky_token = client.post("/auth/login", json={"email": "sneaky@test.com", "password": "sneaky12345"}).json()["access_token"]
+    client.post("/users/me/avatar", files={"file": ("b.gif", GIF, "image/gif")}, headers={"Authorization": f"Bearer {sneaky_token}"})
+    assert (tmp_path / url.lstrip("/")).exists()
+
+def test_identical_uploads_share_one_blob(client, auth_token, tmp_path, monkeypatch):
+    """Однаковий вміст зберігається один раз і видаляється лише без посилань"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(settings, "blob_delete_grace_seconds", 0)
+    headers = {"Authorization": f"Bearer {auth_token()}"}
+
+    def upload(path, name, **extra):
+        return client.post(path, files={"image": (name, PNG, "image/png")}, headers=headers, **extra).json()
+
+    post = upload("/posts/", "a.png", data={"text": "First"})
+    reply = upload(f"/posts/{post['id']}/replies", "b.png", data={"text": "Same picture"})
+    other = upload("/posts/", "c.png", data={"text": "Again"})
+    avatar = client.post("/users/me/avatar", files={"file": ("d.png", PNG, "image/png")}, headers=headers).json()["avatar_url"]
+
+    url = post["image_url"]
+    assert reply["image_url"] == other["image_url"] == avatar == url
+    blob = tmp_path / url.lstrip("/")
+    assert len([path for path in (tmp_path / "uploads/blobs").rglob("*") if path.is_file()]) == 1
+
+    # Deleting the thread drops two references, the other post and the avatar keep the file
+    client.delete(f"/posts/{post['id']}", headers=headers)
+    assert blob.exists()
+    client.delete("/users/me/avatar", headers=headers)
+    assert blob.exists()
+    client.delete(f"/posts/{other['id']}", headers=headers)
+    assert not blob.exists()
+
+def test_image_variants_generated_in_background(client, auth_token, tmp_path, monkeypatch):
+    """Після завантаження генеруються зменшені WebP-варіанти, а API повертає srcset"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(settings, "image_variant_widths", "96,480")
+    monkeypatch.setattr(settings, "image_variant_formats", "webp")
+    headers = {"Authorization": f"Bearer {auth_token()}"}
+
+    source = io.BytesIO()
+    Image.new("RGB", (200, 100), "red").save(source, format="PNG")
+    post = client.post("/posts/", data={"text": "Photo"}, files={"image": ("photo.png", source.getvalue(), "image/png")}, headers=headers).json()
+    image_variants.shutdown_executor(wait=True)  # let the queued job finish
+
+    srcset = client.get(f"/posts/{post['id']}").json()["image_srcset"]
+    variant_url = srcset["image/webp"].split()[0]
+    assert srcset["image/webp"] == f"{variant_url} 96w"  # 480 would upscale the 200px original
+    with Image.open(tmp_path / variant_url.lstrip("/")) as variant:
+        assert variant.format == "WEBP" and variant.size == (96, 48)
+
+def test_etag_changes_when_variants_finish(client, auth_token, tmp_path, monkeypatch):
+    """Готові варіанти змінюють ETag, тож клієнт не лишається з порожнім srcset"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(settings, "image_variant_widths", "96")
+    monkeypatch.setattr(settings, "image_variant_formats", "webp")
+    headers = {"Authorization": f"Bearer {auth_token()}"}
+    release = threading.Event()
+    generate_variants = image_variants.generate_variants
+    monkeypatch.setattr(image_variants, "generate_variants", lambda *args: release.wait() and generate_variants(*args))
+
+    source = io.BytesIO()
+    Image.new("RGB", (200, 100), "green").save(source, format="PNG")
+    post = client.post("/posts/", data={"text": "Photo"}, files={"image": ("photo.png", source.getvalue(), "image/png")}, headers=headers).json()
+    pending = {path: client.get(path) for path in (f"/posts/{post['id']}", "/posts/")}
+    assert pending[f"/posts/{post['id']}"].json()["image_srcset"] == {}
+
+    release.set()
+    image_variants.shutdown_executor(wait=True)
+    for path, response in pending.items():
+        fresh = client.get(path, headers={"If-None-Match": response.headers["etag"]})
+        assert fresh.status_code == 200
+    assert "image/webp" in client.get(f"/posts/{post['id']}").json()["image_srcset"]
+
+def test_kept_blob_keeps_its_variants(client, auth_token, tmp_path, monkeypatch):
+    """Blob, збережений через grace period, не втрачає варіантів для повторного завантаження"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(settings, "image_variant_widths", "96")
+    monkeypatch.setattr(settings, "image_variant_formats", "webp")
+    headers = {"Authorization": f"Bearer {auth_token()}"}
+
+    source = io.BytesIO()
+    Image.new("RGB", (200, 100), "blue").save(source, format="PNG")
+    post = client.post("/posts/", data={"text": "Photo"}, files={"image": ("photo.png", source.getvalue(), "image/png")}, headers=headers).json()
+    image_variants.shutdown_executor(wait=True)
+    client.delete(f"/posts/{post['id']}", headers=headers)
+
+    again = client.post("/posts/", data={"text": "Again"}, files={"image": ("again.png", source.getvalue(), "image/png")}, headers=headers).json()
+    assert again["image_url"] == post["image_url"]
+    assert "image/webp" in again["image_srcset"]
+
+def test_srcset_remembers_missing_variants(tmp_path, monkeypatch):
+    """Відсутні варіанти кешуються, тож серіалізація не читає диск для кожного зображення"""
+    monkeypatch.chdir(tmp_path)
+    loads = []
+    load_manifest = image_variants._load_manifest
+    monkeypatch.setattr(image_variants, "_load_manifest", lambda url: loads.append(url) or load_manifest(url))
+
+    url = "/uploads/posts/pending.png"
+    assert image_variants.srcset(url) == {}
+    assert image_variants.srcset(url) == {}
+    assert loads == [url]
+
+def test_serve_uploads_cache_headers(client, auth_token, tmp_path, monkeypatch):
+    """Blob-файли віддаються як immutable зі strong ETag, підтримують Range і 304"""
+    monkeypatch.chdir(tmp_path)
+    headers = {"Authorization": f"Bearer {auth_token()}"}
+    url = client.post("/posts/", data={"text": "Served"}, files={"image": ("a.png", PNG, "image/png")}, headers=headers).json()["image_url"]
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.content == PNG
+    assert response.headers["content-type"] == "image/png"
+    assert "immutable" in response.headers["cache-control"]
+    etag = response.headers["etag"]
+    assert etag == f'"{hashlib.sha256(PNG).hexdigest()}"'
+
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+    partial = client.get(url, headers={"Range": "bytes=0-7"})
+    assert partial.status_code == 206
+    assert partial.content == PNG[:8]
+
+    (tmp_path / "uploads" / "legacy.png").write_bytes(PNG)
+    legacy = client.get("/uploads/legacy.png")
+    assert legacy.status_code == 200 and legacy.headers["cache-control"] == "public, no-cache"
+
+    for hidden in ("/uploads/blobs/.incoming/x.part", "/uploads/../test.db", "/uploads/missing.png"):
+        assert client.get(hidden).status_code == 404
+
+    monkeypatch.setattr(settings, "upload_serve_mode", "x-accel-redirect")
+    accel = client.get(url)
+    assert accel.headers["x-accel-redirect"] == "/protected-uploads" + url.removeprefix("/uploads")
+    assert accel.content == b""
@@ -15,4 +15,109 @@ def test_get_user_profile(client):
     data = response.json()
     assert data["username"] == "profileuser123"
     assert "posts" in data
-    assert "comments" in data
\ No newline at end of file
+    assert "comments" in data
+
+def test_user_profile_query_count_is_constant(client, auth_token, query_budget):
+    """Профіль будується фіксованою кількістю запитів, незалежно від кількості постів"""
+    author_token = auth_token("profileauthor", "author@test.com", "author12345")
+    viewer_token = auth_token("profileviewer", "viewer@test.com", "viewer12345")
+    author_headers = {"Authorization": f"Bearer {author_token}"}
+    viewer_headers = {"Authorization": f"Bearer {viewer_token}"}
+    author_id = client.get("/auth/me", headers=author_headers).json()["id"]
+
+    def add_posts(count):
+        for i in range(count):
+            post_id = client.post("/posts/", data={"text": f"Post {i}"}, headers=author_headers).json()["id"]
+            reply_id = client.post(f"/posts/{post_id}/replies", data={"text": "Reply"}, headers=viewer_headers).json()["id"]
+            client.post(f"/posts/{post_id}/replies", data={"text": "Own reply"}, headers=author_headers)
+            client.post(f"/posts/{post_id}/like", headers=viewer_headers)
+            client.post(f"/posts/{reply_id}/like", headers=viewer_headers)
+
+    def profile_queries():
+        with query_budget(8) as recorder:
+            response = client.get(f"/users/{author_id}", headers=viewer_headers)
+        assert response.status_code == 200
+        return response.json(), recorder.count
+
+    add_posts(2)
+    data, small_count = profile_queries()
+    assert data["posts_count"] == 2
+    assert data["comments_count"] == 2
+    assert all(post["is_liked_by_user"] for post in data["posts"])
+    assert all(post["likes_count"] == 1 for post in data["posts"])
+
+    add_posts(8)
+    data, large_count = profile_queries()
+    assert data["posts_count"] == 10
+    assert large_count == small_count
+
+def test_authenticated_user_is_cached(client, auth_token, query_budget):
+    """Повторний запит з тим самим токеном не звертається до таблиці users"""
+    from core.security import principal_cache
+
+    token = auth_token("cacheduser", "cached@test.com", "cached12345")
+    headers = {"Authorization": f"Bearer {token}"}
+
+    client.get("/auth/me", headers=headers)
+    with query_budget(0):
+        response = client.get("/auth/me", headers=headers)
+
+    assert response.status_code == 200
+    assert response.json()["username"] == "cacheduser"
+    assert principal_cache.stats()["hits"] >= 1
+
+def test_profile_update_invalidates_cached_user(client, auth_token):
+    """Оновлення профілю скидає кешованого користувача"""
+    token = auth_token("beforeupdate", "update@test.com", "update12345")
+    headers = {"Authorization": f"Bearer {token}"}
+    client.get("/auth/me", headers=headers)
+
+    response = client.put("/users/me", json={"username": "afterupdate"}, headers=headers)
+    assert response.status_code == 200
+
+    assert client.get("/auth/me", headers=headers).json()["username"] == "afterupdate"
+
+def test_export_streams_ndjson_and_resumes(client, auth_token, monkeypatch):
+    """Експорт віддає NDJSON частинами і продовжується з останнього отриманого рядка"""
+    import json
+    from core.config import settings
+
+    monkeypatch.setattr(settings, "export_batch_size", 2)
+    token = auth_token("exporter", "export@test.com", "export12345")
+    headers = {"Authorization": f"Bearer {token}"}
+    user_id = client.get("/auth/me", headers=headers).json()["id"]
+
+    for i in range(3):
+        post_id = client.post("/posts/", data={"text": f"Post {i}"}, headers=headers).json()["id"]
+        client.post(f"/posts/{post_id}/replies", data={"text": f"Reply {i}"}, headers=headers)
+        client.post(f"/posts/{post_id}/like", headers=headers)
+
+    response = client.get(f"/users/{user_id}/export", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["kind"] for line in lines] == ["user"] + ["post", "reply"] * 3 + ["like"] * 3
+    assert lines[0]["username"] == "exporter"
+    assert lines[2]["parent_id"] == lines[1]["id"]
+
+    # Обірване завантаження: продовжуємо після 4-го рядка (reply)
+    last = lines[3]
+    resumed = client.get(f"/users/{user_id}/export", params={"after": f"{last['kind']}:{last['id']}"}, headers=headers)
+    assert [json.loads(line) for line in resumed.text.splitlines()] == lines[4:]
+
+    last = lines[-2]
+    resumed = client.get(f"/users/{user_id}/export", params={"after": f"like:{last['id']}"}, headers=headers)
+    assert [json.loads(line) for line in resumed.text.splitlines()] == lines[-1:]
+
+def test_export_is_owner_only(client, auth_token):
+    """Експортувати можна лише власні дані; некоректний курсор дає 400"""
+    owner_token = auth_token("exportowner", "owner@test.com", "owner12345")
+    other_token = auth_token("exportother", "other@test.com", "other12345")
+    owner_headers = {"Authorization": f"Bearer {owner_token}"}
+    owner_id = client.get("/auth/me", headers=owner_headers).json()["id"]
+
+    response = client.get(f"/users/{owner_id}/export", headers={"Authorization": f"Bearer {other_token}"})
+    assert response.status_code == 403
+
+    response = client.get(f"/users/{owner_id}/export", params={"after": "bogus"}, headers=owner_headers)
+    assert response.status_code == 400
@@ -1,3 +1,4 @@
+import { Link } from 'react-router-dom';
 import { formatDate } from '../utils/dateFormatter';
 import { getAvatarUrl } from '../utils/avatarColor';
 
@@ -39,6 +40,12 @@ const CommentSection = ({
                 </div>
             ))}
 
+            {post.replies_count > (post.replies?.length || 0) && (
+                <Link to={`/post/${post.id}`} className="view-all-comments">
+                    View all {post.replies_count} comments
+                </Link>
+            )}
+
             {isAuthenticated && (
                 <div className="add-comment">
                     <input
@@ -5,6 +5,11 @@ import { Link, useNavigate } from 'react-router-dom';
 import { useEffect, useRef } from 'react';
 import '../styles/PostCard.css';
 
+const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
+
+// Prefix every URL of a srcset ("url 96w, url 480w") with the API origin
+const withApiUrl = (srcset) => srcset.split(', ').map((entry) => `${API_URL}${entry}`).join(', ');
+
 const PostCard = ({
   post,
   currentUserId,
@@ -166,13 +171,19 @@ const PostCard = ({
       {
         post.image_url && (
           <div className='post-image'>
-            <img
-              src={`${import.meta.env.VITE_API_URL || 'http://localhost:8000'}${post.image_url}`}
-              alt="Post visual content"
-              onClick={(e) => {
-                e.stopPropagation();
-              }}
-            />
+            <picture>
+              {Object.entries(post.image_srcset || {}).map(([type, srcset]) => (
+                <source key={type} type={type} srcSet={withApiUrl(srcset)} sizes="(max-width: 640px) 100vw, 600px" />
+              ))}
+              <img
+                src={`${API_URL}${post.image_url}`}
+                alt="Post visual content"
+                loading="lazy"
+                onClick={(e) => {
+                  e.stopPropagation();
+                }}
+              />
+            </picture>
           </div>
         )
       }
@@ -201,7 +212,7 @@ const PostCard = ({
           <svg viewBox="0 0 24 24" fill="currentColor">
             <path d="M20 2H4c-1.1 0-2 .9-2 2v18l4-4h14c1.1 0 2-.9 2-2V4c0-1.1-.9-2-2-2z" />
           </svg>
-          <span>{post.replies?.length || 0}</span>
+          <span>{post.replies_count ?? post.replies?.length ?? 0}</span>
         </button>
       </div>
 